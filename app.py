@@ -27,7 +27,9 @@ from telegram import api as tg_api
 from core.holdings import get_wallet_snapshot
 from core.augment import augment_with_discovered_tokens
 from core.discovery import discover_tokens_for_wallet
-from core.pricing import get_spot_usd
+from core.pricing import get_spot_usd, prefetch_spot_usd
+from core import singleflight
+from core.circuit_breaker import CircuitBreaker
 
 getcontext().prec = 36
 
@@ -90,35 +92,8 @@ class _LogThrottler:
             return True
         return False
 
-class _CircuitBreaker:
-    """
-    Opens when too many recent 5xx/429s occur on a base.
-    Closes automatically after 'open_sec'.
-    """
-    def __init__(self, max_failures: int, open_sec: int):
-        self.max_failures = max_failures
-        self.open_sec = open_sec
-        self.fail_count = 0
-        self.open_until = 0.0
-
-    def allow(self) -> bool:
-        return time.time() >= self.open_until
-
-    def record_success(self) -> None:
-        self.fail_count = 0
-        self.open_until = 0.0
-
-    def record_failure(self, status_code: Optional[int] = None) -> None:
-        # count only hard/soft rate faults
-        if status_code is None or status_code >= 500 or status_code == 429:
-            self.fail_count += 1
-            if self.fail_count >= self.max_failures:
-                self.open_until = time.time() + self.open_sec
-                # keep one failure so we don’t re-open immediately after cool down
-                self.fail_count = 1
-
 _LOG_THR = _LogThrottler()
-_CB_BY_BASE: Dict[str, _CircuitBreaker] = {}
+_CB_BY_BASE: Dict[str, CircuitBreaker] = {}
 
 # --------------------------------------------------
 # Telegram send helpers (with safe split)
@@ -316,10 +291,10 @@ def _explorer_bases() -> List[str]:
     logging.info("Explorer bases: %s", bases)
     return bases
 
-def _cb_for(base: str) -> _CircuitBreaker:
+def _cb_for(base: str) -> CircuitBreaker:
     cb = _CB_BY_BASE.get(base)
     if not cb:
-        cb = _CircuitBreaker(_CB_MAX_FAIL, _CB_OPEN_SEC)
+        cb = CircuitBreaker(_CB_MAX_FAIL, _CB_OPEN_SEC)
         _CB_BY_BASE[base] = cb
     return cb
 
@@ -329,7 +304,12 @@ def _explorer_call_any(module: str, action: str, params: Dict[str, Any]) -> Any:
       <base>/?module=account&action=tokentx&...
     Circuit-breakers per base + throttled warnings.
     Returns parsed JSON ('result' if present) or None.
+    Identical concurrent calls share one request (core.singleflight).
     """
+    key = ("explorer", module, action, tuple(sorted((k, str(v)) for k, v in (params or {}).items())))
+    return singleflight.do(key, lambda: _explorer_call_once(module, action, params))
+
+def _explorer_call_once(module: str, action: str, params: Dict[str, Any]) -> Any:
     headers = {"Accept": "application/json"}
     p = dict(params or {})
     if CRONOS_EXPLORER_API_KEY:
@@ -427,6 +407,7 @@ def _holdings_auto(wallet: str) -> Tuple[List[Dict[str, Any]], str]:
             snap = _normalize_snapshot_for_formatter(snap)
 
             assets = [_asset_as_dict(a) for a in (snap.get("assets") or [])]
+            prefetch_spot_usd(a.get("address") for a in assets if _to_dec(a.get("price_usd", 0)) <= 0)
             for a in assets:
                 if _to_dec(a.get("price_usd", 0)) <= 0:
                     a["price_usd"] = _to_dec(get_spot_usd(str(a.get("symbol","")), token_address=a.get("address")))
@@ -463,6 +444,7 @@ def _holdings_auto(wallet: str) -> Tuple[List[Dict[str, Any]], str]:
         px = _to_dec(get_spot_usd("CRO", token_address=None)) or Decimal("0")
         assets.append({"symbol": "CRO", "amount": cro_bal, "price_usd": px, "value_usd": cro_bal * px})
 
+    prefetch_spot_usd(contract for (contract, _sym, _dec), qty in agg.items() if qty > 0)
     for (contract, sym, _dec), qty in agg.items():
         if qty <= 0:
             continue
@@ -906,7 +888,7 @@ def _handle_help() -> str:
         "ℹ️ Βοήθεια\n"
         "• /holdings — compact MTM (φιλτραρισμένο) + PnL αν υπάρχει snapshot\n"
         "• /scan — ωμή λίστα tokens που βρέθηκαν (amount + address)\n"
-        "• /rescan — ξανά σκανάρισμα & παρουσίαση σαν το /holdings\n"
+        "• /rescan [full] — ξανά σκανάρισμα (full: από την αρχή του lookback) & παρουσίαση σαν το /holdings\n"
         "• /snapshot — αποθήκευση snapshot με timestamp\n"
         "• /snapshots — λίστα διαθέσιμων snapshots\n"
         "• /pnl [ημέρα ή stamp] — PnL vs snapshot (π.χ. /pnl 2025-10-11 ή /pnl 2025-10-11_0930)\n"
@@ -945,11 +927,11 @@ def _enrich_with_prices(tokens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         out.append(d)
     return out
 
-def _handle_rescan(wallet_address: str) -> str:
+def _handle_rescan(wallet_address: str, full: bool = False) -> str:
     if not wallet_address:
         return "⚠️ Δεν έχει οριστεί WALLET_ADDRESS στο περιβάλλον."
     try:
-        toks = discover_tokens_for_wallet(wallet_address)
+        toks = discover_tokens_for_wallet(wallet_address, full_rescan=full)
     except Exception:
         toks = []
     if not toks:
@@ -1055,7 +1037,8 @@ def _dispatch_command(text: str) -> str:
     if cmd == "/scan":
         return _handle_scan(WALLET_ADDRESS)
     if cmd == "/rescan":
-        return _handle_rescan(WALLET_ADDRESS)
+        full = len(parts) >= 2 and parts[1].lower() == "full"
+        return _handle_rescan(WALLET_ADDRESS, full=full)
     if cmd == "/holdings":
         return _handle_holdings(WALLET_ADDRESS)
     if cmd == "/snapshot":
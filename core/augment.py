@@ -4,7 +4,7 @@ from decimal import Decimal, InvalidOperation
 from typing import Dict, Any, List, Set, Optional
 
 from core.discovery import discover_tokens_for_wallet
-from core.pricing import get_spot_usd
+from core.pricing import get_spot_usd, prefetch_spot_usd
 
 def _to_dec(x: Any) -> Optional[Decimal]:
     if isinstance(x, Decimal):
@@ -36,6 +36,7 @@ def augment_with_discovered_tokens(snapshot: Dict[str, Any], wallet_address: str
 
     discovered = discover_tokens_for_wallet(wallet_address)
     added_any = False
+    prefetch_spot_usd(t.get("address") for t in discovered)  # ένα bulk call ανά 30 tokens
 
     for t in discovered:
         sym = str(t.get("symbol", "")).upper() or (t.get("address", "")[:6]).upper()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+core/block_follower.py — new-block follower with local logsBloom pre-filtering.
+
+Each poll fetches only the headers of blocks produced since the last poll
+(one JSON-RPC batch of eth_getBlockByNumber(n, false)) and tests every
+header's 2048-bit `logsBloom` for both the ERC-20 Transfer topic and the
+wallet's 32-byte padded address. A bloom never gives false negatives, so
+blocks that fail the test cannot hold a wallet Transfer and are skipped;
+only the (rare) candidate blocks cost an eth_getLogs.
+
+A candidate whose eth_getLogs fails is kept in `retry_blocks` and returned
+again by the next poll, so a transient RPC error never skips a block.
+
+Native CRO transfers emit no logs and are invisible to the bloom: callers
+keep polling those on their timer.
+
+keccak comes from eth_hash (installed with web3). Without it the follower
+still works, but every block counts as a candidate.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from core import logscan
+from core.jsonrpc import RpcError
+
+logger = logging.getLogger("core.block_follower")
+
+FOLLOW_MAX_BLOCKS = max(1, int(os.getenv("FOLLOW_MAX_BLOCKS", "200") or 200))
+
+try:
+    from eth_hash.auto import keccak as _keccak  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    _keccak = None
+
+
+def bloom_bits(value: bytes) -> List[int]:
+    """The three bloom bit indexes (0..2047) set for `value` (yellow paper M3:2048)."""
+    if _keccak is None:
+        raise RuntimeError("keccak unavailable")
+    h = _keccak(value)
+    return [((h[i] << 8) | h[i + 1]) & 2047 for i in (0, 2, 4)]
+
+
+def bloom_contains(bloom: Any, bits: Sequence[int]) -> bool:
+    """True if every bit is set in the 256-byte bloom (hex string or bytes)."""
+    if isinstance(bloom, str):
+        h = bloom[2:] if bloom[:2] in ("0x", "0X") else bloom
+        raw = bytes.fromhex(h) if h else b""
+    else:
+        raw = bytes(bloom or b"")
+    if len(raw) != 256:
+        return True  # malformed/missing bloom: do not filter
+    for b in bits:
+        if not raw[255 - b // 8] & (1 << (b % 8)):
+            return False
+    return True
+
+
+def _topic_bytes(hex_topic: str) -> bytes:
+    return bytes.fromhex(hex_topic[2:] if hex_topic.startswith("0x") else hex_topic)
+
+
+class BlockFollower:
+    """Tails new block headers and yields the blocks that may hold a wallet Transfer."""
+
+    def __init__(self, client: Any, wallet: str, start_block: Optional[int] = None):
+        self.client = client
+        self.wallet = (wallet or "").lower()
+        self.last_block = start_block
+        self.headers_fetched = 0
+        self.candidates_seen = 0
+        self.retry_blocks: List[int] = []  # candidates whose eth_getLogs failed
+        try:
+            self._bits = [
+                bloom_bits(_topic_bytes(logscan.TRANSFER_TOPIC)),
+                bloom_bits(_topic_bytes(logscan.wallet_topic(self.wallet))),
+            ]
+        except Exception as e:
+            logger.warning("logsBloom filtering disabled: %s", e)
+            self._bits = []
+
+    def matches(self, bloom: Any) -> bool:
+        return all(bloom_contains(bloom, bits) for bits in self._bits)
+
+    def poll(self) -> List[int]:
+        """
+        Check headers since the last poll; return candidate block numbers,
+        led by any `retry_blocks`. The first poll only anchors at the current
+        head. At most FOLLOW_MAX_BLOCKS headers are read per poll; a longer
+        backlog is worked off over the next polls.
+        """
+        head = int(self.client.block_number())
+        if self.last_block is None:
+            self.last_block = head
+            return []
+        retry = list(self.retry_blocks)
+        start = self.last_block + 1
+        end = min(head, self.last_block + FOLLOW_MAX_BLOCKS)
+        if end < start:
+            self.retry_blocks = []
+            return retry
+        numbers = list(range(start, end + 1))
+        headers = self.client.batch([("eth_getBlockByNumber", [hex(n), False]) for n in numbers])
+        self.headers_fetched += len(numbers)
+        out: List[int] = []
+        for n, hdr in zip(numbers, headers):
+            if isinstance(hdr, RpcError) or not isinstance(hdr, dict):
+                break  # stop at the first unreadable header; it is retried next poll
+            if self.matches(hdr.get("logsBloom")):
+                out.append(n)
+            self.last_block = n
+        self.candidates_seen += len(out)
+        self.retry_blocks = []
+        return retry + out
+
+    def transfer_logs(self, blocks: Sequence[int]) -> List[Dict[str, Any]]:
+        """
+        Wallet Transfer logs (from or to) in the given blocks; one batch of
+        eth_getLogs. Blocks with a failed call (or all of them, when the
+        batch raises) go to `retry_blocks`.
+        """
+        calls = []
+        for n in blocks:
+            for topics in logscan.transfer_topic_sets(self.wallet):
+                calls.append(("eth_getLogs", [{"fromBlock": hex(n), "toBlock": hex(n), "topics": topics}]))
+        out: List[Dict[str, Any]] = []
+        failed: List[int] = []
+        try:
+            results = self.client.batch(calls) if calls else []
+        except Exception:
+            self.retry_blocks.extend(n for n in blocks if n not in self.retry_blocks)
+            raise
+        for (_, params), res in zip(calls, results):
+            if isinstance(res, RpcError):
+                n = int(params[0]["fromBlock"], 16)
+                logger.debug("eth_getLogs block %s failed: %s", n, res)
+                if n not in failed:
+                    failed.append(n)
+                continue
+            out.extend(res or [])
+        self.retry_blocks.extend(n for n in failed if n not in self.retry_blocks)
+        return out
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+core/cache.py — bounded, thread-safe TTL + LRU cache.
+
+    c = TTLCache(maxsize=4096, ttl=600, negative_ttl=120)
+    c.set(key, value)          # positive entry, lives `ttl` seconds
+    c.set(key, None)           # failure ("negative") entry, lives `negative_ttl`
+    hit, value = c.lookup(key) # hit=True also for a cached failure
+    c.peek(key)                # like lookup, without LRU/counter side effects
+    c.get(key, default)        # value, or default on a miss / cached failure
+    c.add(key, value)          # set only if absent; True if inserted (cooldowns)
+
+Every entry has its own expiry (`ttl=` per call overrides the default;
+`ttl=None` on the cache means no expiry). When `maxsize` is reached the
+least recently used entry is evicted. A value counts as a failure when
+`is_negative(value)` is true (default: `value is None`), so callers cache
+"this token has no price" for a shorter time than real prices.
+
+Counters in `stats()`: hits, negative_hits, misses, evictions, expirations.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_NO_EXPIRY = float("inf")
+
+
+def _default_is_negative(value: Any) -> bool:
+    return value is None
+
+
+class TTLCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        *,
+        is_negative: Callable[[Any], bool] = _default_is_negative,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.is_negative = is_negative
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    # ---------- internals (lock held) ----------
+    def _expiry(self, value: Any, ttl: Optional[float]) -> float:
+        if ttl is None:
+            ttl = self.negative_ttl if self.is_negative(value) else self.ttl
+        return _NO_EXPIRY if ttl is None else self.clock() + float(ttl)
+
+    def _live(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] <= self.clock():
+            del self._data[key]
+            self._stats["expirations"] += 1
+            return None
+        return item
+
+    def _put(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        self._data[key] = (value, self._expiry(value, ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    # ---------- API ----------
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """(True, value) for a live entry (including cached failures), else (False, None)."""
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return False, None
+            self._data.move_to_end(key)
+            self._stats["negative_hits" if self.is_negative(item[0]) else "hits"] += 1
+            return True, item[0]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Live value (failures included) without touching LRU order or counters."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= self.clock():
+                return default
+            return item[0]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        hit, value = self.lookup(key)
+        if not hit or self.is_negative(value):
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def add(self, key: Hashable, value: Any = True, ttl: Optional[float] = None) -> bool:
+        """Insert only if no live entry exists; returns True when inserted."""
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._put(key, value, ttl)
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._live(key) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of live (key, value) pairs, least recently used first."""
+        with self._lock:
+            now = self.clock()
+            return [(k, v) for k, (v, exp) in self._data.items() if exp > now]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, size=len(self._data), maxsize=self.maxsize)
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+core/candles.py — persistent OHLCV candles built from every price we observe.
+
+Tracked-pair polls (main.update_price_history) and every price the price
+service fetches (core.price_service `on_price`) go through `record()`, which
+updates 1m, 5m and 1h candles for that key at the same time.
+
+On disk each (resolution, key) is one append-only file of fixed 48-byte
+records `<q5d` (bucket start, open, high, low, close, volume) under
+DATA_DIR/candles/<res>/<key>.bin. A finished candle is appended when the
+first sample of the next bucket arrives. Open candles are appended as they
+stand by `flush()` (every CANDLE_FLUSH_SEC and at shutdown). A later record
+with the same bucket start replaces an earlier one, so a restart resumes
+the open candle from its last flushed state. Records are sorted by start,
+so `candles()` binary-searches the file; a sample older than the last
+record on disk is dropped rather than appended out of order.
+
+Downsampling by age: `compact()` (every 6h) rewrites each file without
+duplicates and without candles older than the resolution's retention (1m:
+2 days, 5m: 14 days, 1h: CANDLE_1H_DAYS, default 365). A query without
+`res` uses the finest resolution that still covers its start.
+
+Flushing and compaction run on a daemon maintenance thread (`maintain()`),
+never on the thread calling `record()`.
+
+Env: CANDLES_ENABLED (1/0), CANDLE_FLUSH_SEC, CANDLE_1H_DAYS, DATA_DIR.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger("core.candles")
+
+CANDLES_ENABLED = os.getenv("CANDLES_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off", "")
+CANDLE_FLUSH_SEC = float(os.getenv("CANDLE_FLUSH_SEC", "300") or 300)
+CANDLE_1H_DAYS = float(os.getenv("CANDLE_1H_DAYS", "365") or 365)
+COMPACT_EVERY = 6 * 3600
+
+RESOLUTIONS: Dict[str, int] = {"1m": 60, "5m": 300, "1h": 3600}
+RETENTION: Dict[str, Optional[float]] = {"1m": 2 * 86400, "5m": 14 * 86400, "1h": CANDLE_1H_DAYS * 86400}
+
+_REC = struct.Struct("<q5d")
+RECORD_SIZE = _REC.size  # 48
+
+
+class Candle(NamedTuple):
+    ts: int  # bucket start (unix seconds)
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def _file_name(key: str) -> str:
+    return re.sub(r"[^a-z0-9._-]", "_", key.strip().lower()) + ".bin"
+
+
+def _dedupe(recs: List[Candle]) -> List[Candle]:
+    """Records sorted by ts; for equal ts the later one wins."""
+    out: List[Candle] = []
+    for c in recs:
+        if out and out[-1].ts == c.ts:
+            out[-1] = c
+        else:
+            out.append(c)
+    return out
+
+
+class CandleStore:
+    def __init__(
+        self,
+        root: str,
+        *,
+        resolutions: Optional[Dict[str, int]] = None,
+        retention: Optional[Dict[str, Optional[float]]] = None,
+        flush_every: float = CANDLE_FLUSH_SEC,
+        background: bool = True,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.root = root
+        self.resolutions = dict(resolutions or RESOLUTIONS)
+        self.retention = dict(RETENTION if retention is None else retention)
+        self.flush_every = float(flush_every)
+        self.background = background
+        self.clock = clock
+        self._open: Dict[Tuple[str, str], List[float]] = {}  # (key, res) -> [ts, o, h, l, c, v]
+        self._dirty: set = set()
+        self._checked: set = set()
+        self._lock = threading.RLock()
+        self._last_flush = clock()
+        self._last_compact = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- files ----------
+    def _path(self, key: str, res: str) -> str:
+        return os.path.join(self.root, res, _file_name(key))
+
+    def _append(self, key: str, res: str, c: List[float]) -> None:
+        path = self._path(key, res)
+        try:
+            if path not in self._checked:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if os.path.exists(path):
+                    size = os.path.getsize(path)
+                    if size % RECORD_SIZE:  # torn write from a crash
+                        with open(path, "r+b") as f:
+                            f.truncate(size - size % RECORD_SIZE)
+                self._checked.add(path)
+            with open(path, "ab") as f:
+                f.write(_REC.pack(int(c[0]), *c[1:]))
+        except OSError as e:
+            logger.debug("candle append %s failed: %s", path, e)
+
+    def _read(self, key: str, res: str, start: float, end: float) -> List[Candle]:
+        path = self._path(key, res)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return []
+        with f:
+            n = os.fstat(f.fileno()).st_size // RECORD_SIZE
+            lo, hi = 0, n
+            while lo < hi:  # first record with ts >= start
+                mid = (lo + hi) // 2
+                f.seek(mid * RECORD_SIZE)
+                if _REC.unpack(f.read(RECORD_SIZE))[0] < start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            f.seek(lo * RECORD_SIZE)
+            out: List[Candle] = []
+            for i in range(lo, n):
+                c = Candle(*_REC.unpack(f.read(RECORD_SIZE)))
+                if c.ts > end:
+                    break
+                out.append(c)
+        return _dedupe(out)
+
+    def _last_on_disk(self, key: str, res: str) -> Optional[Candle]:
+        path = self._path(key, res)
+        try:
+            with open(path, "rb") as f:
+                n = os.fstat(f.fileno()).st_size // RECORD_SIZE
+                if not n:
+                    return None
+                f.seek((n - 1) * RECORD_SIZE)
+                return Candle(*_REC.unpack(f.read(RECORD_SIZE)))
+        except OSError:
+            return None
+
+    # ---------- writing ----------
+    def record(self, key: str, price: float, ts: Optional[float] = None, volume: float = 0.0) -> None:
+        """Fold one observation into the open 1m/5m/1h candles of `key`."""
+        key = (key or "").strip().lower()
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            return
+        if not key or not price > 0:
+            return
+        ts = self.clock() if ts is None else float(ts)
+        vol = float(volume or 0.0)
+        with self._lock:
+            for res, span in self.resolutions.items():
+                bucket = int(ts // span * span)
+                slot = (key, res)
+                c = self._open.get(slot)
+                if c is None:
+                    last = self._last_on_disk(key, res)
+                    if last and bucket < last.ts:
+                        continue  # older than what is on disk: the file must stay sorted
+                    if last and last.ts == bucket:
+                        c = self._open[slot] = list(last)
+                if c is not None and bucket < c[0]:
+                    continue  # late sample for a candle already closed
+                if c is not None and bucket > c[0]:
+                    if slot in self._dirty:  # otherwise the last flush already wrote it as is
+                        self._append(key, res, c)
+                        self._dirty.discard(slot)
+                    c = None
+                if c is None:
+                    self._open[slot] = [bucket, price, price, price, price, vol]
+                else:
+                    c[2] = max(c[2], price)
+                    c[3] = min(c[3], price)
+                    c[4] = price
+                    c[5] += vol
+                self._dirty.add(slot)
+        self._ensure_thread()
+
+    def flush(self) -> int:
+        """Append the open candles changed since the last flush; returns records written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for key, res in dirty:
+                c = self._open.get((key, res))
+                if c:
+                    self._append(key, res, c)
+            self._last_flush = self.clock()
+            return len(dirty)
+
+    def maintain(self) -> None:
+        """One maintenance pass: flush when due, compact every COMPACT_EVERY."""
+        now = self.clock()
+        if now - self._last_flush >= self.flush_every:
+            self.flush()
+        if now - self._last_compact >= COMPACT_EVERY:
+            self.compact()
+
+    def _ensure_thread(self) -> None:
+        if not self.background or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="candle-maintenance", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(max(1.0, min(self.flush_every, 60.0)))
+            try:
+                self.maintain()
+            except Exception as e:
+                logger.debug("candle maintenance failed: %s", e)
+
+    def forget(self, key: str) -> None:
+        """Flush and drop the open candles of `key` (e.g. an untracked pair)."""
+        key = (key or "").strip().lower()
+        with self._lock:
+            for res in self.resolutions:
+                c = self._open.pop((key, res), None)
+                if c and (key, res) in self._dirty:
+                    self._append(key, res, c)
+                self._dirty.discard((key, res))
+
+    def compact(self) -> int:
+        """Rewrite files without superseded or expired records; returns records dropped."""
+        dropped = 0
+        now = self.clock()
+        self._last_compact = now
+        for res, span in self.resolutions.items():
+            d = os.path.join(self.root, res)
+            keep = self.retention.get(res)
+            try:
+                names = os.listdir(d)
+            except OSError:
+                continue
+            for name in names:
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(d, name)
+                with self._lock:  # one file at a time, so record() waits for at most one rewrite
+                    try:
+                        with open(path, "rb") as f:
+                            raw = f.read()
+                        n = len(raw) // RECORD_SIZE
+                        orig = [Candle(*_REC.unpack_from(raw, i * RECORD_SIZE)) for i in range(n)]
+                        recs = _dedupe(sorted(orig, key=lambda c: c.ts))  # stable: the later record still wins
+                        if keep is not None:
+                            recs = [c for c in recs if c.ts + span > now - keep]
+                        if recs == orig and len(raw) == n * RECORD_SIZE:
+                            continue
+                        dropped += n - len(recs)
+                        if not recs:
+                            os.remove(path)
+                            continue
+                        tmp = path + ".tmp"
+                        with open(tmp, "wb") as f:
+                            f.write(b"".join(_REC.pack(*c) for c in recs))
+                        os.replace(tmp, path)
+                    except OSError as e:
+                        logger.debug("candle compact %s failed: %s", path, e)
+        return dropped
+
+    # ---------- reading ----------
+    def pick_resolution(self, start: float, now: Optional[float] = None) -> str:
+        """Finest resolution whose retention still covers `start`."""
+        age = (self.clock() if now is None else now) - start
+        by_span = sorted(self.resolutions, key=self.resolutions.get)
+        for res in by_span:
+            keep = self.retention.get(res)
+            if keep is None or age <= keep:
+                return res
+        return by_span[-1]
+
+    def candles(self, key: str, start: float, end: Optional[float] = None, res: Optional[str] = None) -> List[Candle]:
+        """Candles of `key` overlapping [start, end], oldest first; includes the open one."""
+        key = (key or "").strip().lower()
+        end = self.clock() if end is None else float(end)
+        res = res or self.pick_resolution(start)
+        span = self.resolutions[res]
+        first = int(start // span * span)
+        with self._lock:
+            out = self._read(key, res, first, end)
+            c = self._open.get((key, res))
+            if c and first <= c[0] <= end:
+                cur = Candle(int(c[0]), *c[1:])
+                if out and out[-1].ts == cur.ts:
+                    out[-1] = cur
+                else:
+                    out.append(cur)
+        return out
+
+    def recent_price(self, key: str, max_age: float = 3600.0) -> Optional[float]:
+        """Close of the newest 1m candle (or coarser) no older than `max_age`."""
+        now = self.clock()
+        for res in sorted(self.resolutions, key=self.resolutions.get):
+            got = self.candles(key, now - max_age, now, res)
+            if got:
+                return got[-1].close
+        return None
+
+    def change_pct(self, key: str, since: float, now: Optional[float] = None) -> Optional[float]:
+        """Move from the open of the first candle at/after `since` to the latest close."""
+        got = self.candles(key, since, now)
+        if not got or not got[0].open:
+            return None
+        return (got[-1].close - got[0].open) / got[0].open * 100.0
+
+
+_default: Optional[CandleStore] = None
+_default_lock = threading.Lock()
+
+
+def get_store() -> Optional[CandleStore]:
+    """Process-wide store under DATA_DIR/candles; None when CANDLES_ENABLED is off."""
+    global _default
+    if not CANDLES_ENABLED:
+        return None
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = CandleStore(os.path.join(os.getenv("DATA_DIR", "/app/data"), "candles"))
+    return _default
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+core/circuit_breaker.py — per-endpoint circuit breaker.
+
+Shared by app.py (one breaker per HTTP API base) and core.rpc_client (one
+per RPC endpoint). The breaker opens after `max_failures` counted failures
+and closes on its own after `open_sec`; one success resets it.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+
+class CircuitBreaker:
+    """
+    Opens when too many recent transport failures, 5xx or 429 responses occur.
+    Closes automatically after 'open_sec'.
+    """
+
+    def __init__(self, max_failures: int, open_sec: int):
+        self.max_failures = max_failures
+        self.open_sec = open_sec
+        self.fail_count = 0
+        self.open_until = 0.0
+
+    def allow(self) -> bool:
+        return time.time() >= self.open_until
+
+    def record_success(self) -> None:
+        self.fail_count = 0
+        self.open_until = 0.0
+
+    def record_failure(self, status_code: Optional[int] = None) -> None:
+        # count only transport errors (no status) and hard/soft rate faults
+        if status_code is None or status_code >= 500 or status_code == 429:
+            self.fail_count += 1
+            if self.fail_count >= self.max_failures:
+                self.open_until = time.time() + self.open_sec
+                # keep one failure so we don't re-open immediately after cool down
+                self.fail_count = 1
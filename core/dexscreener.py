@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+core/dexscreener.py — bulk Dexscreener token pricing.
+
+`best_prices(addresses)` prices many tokens with Dexscreener's multi-token
+endpoint, `/latest/dex/tokens/{a1,a2,...}` (up to DEXSCREENER_CHUNK
+addresses per call), instead of up to three lookups per token.
+
+Pair selection follows main._pick_best_price: Cronos pairs only, positive
+priceUsd, highest USD liquidity wins. A pair's `priceUsd` is the price of
+its *base* token, so pairs are attributed to the token they list as
+baseToken; a token only ever seen as a quote token gets no price here and
+callers fall back to their per-token path.
+
+`fetch_pairs_multi(chain, pairs)` does the same for pair addresses
+(`/latest/dex/pairs/{chain}/{p1,p2,...}`), for the tracked-pair monitor.
+
+Single-token lookups (`token_pairs`, `price_for_symbol`, `price_cro`) keep
+main.get_price_usd's original search order and are what
+core.price_service resolves cache misses with.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.http import get_json
+
+logger = logging.getLogger("core.dexscreener")
+
+DEX_TOKENS_URL = "https://api.dexscreener.com/latest/dex/tokens"
+DEX_SEARCH_URL = "https://api.dexscreener.com/latest/dex/search"
+DEX_PAIRS_URL = "https://api.dexscreener.com/latest/dex/pairs"
+DEXSCREENER_CHUNK = max(1, min(30, int(os.getenv("DEXSCREENER_CHUNK", "30") or 30)))
+CHAIN = "cronos"
+
+
+def pick_best_pair(pairs: Optional[Iterable[Dict[str, Any]]], chain: str = CHAIN) -> Optional[Dict[str, Any]]:
+    """Highest-liquidity pair on `chain` with a positive priceUsd."""
+    best, best_liq = None, -1.0
+    for p in pairs or []:
+        try:
+            if str(p.get("chainId", "")).lower() != chain:
+                continue
+            liq = float((p.get("liquidity") or {}).get("usd") or 0)
+            price = float(p.get("priceUsd") or 0)
+            if price <= 0:
+                continue
+            if liq > best_liq:
+                best_liq, best = liq, p
+        except Exception:
+            continue
+    return best
+
+
+def pick_best_price(pairs: Optional[Iterable[Dict[str, Any]]], chain: str = CHAIN) -> Optional[float]:
+    best = pick_best_pair(pairs, chain)
+    return float(best["priceUsd"]) if best else None
+
+
+def _norm_addrs(addresses: Iterable[str]) -> List[str]:
+    out: List[str] = []
+    seen = set()
+    for a in addresses or []:
+        la = (a or "").strip().lower()
+        if la.startswith("0x") and len(la) == 42 and la not in seen:
+            seen.add(la)
+            out.append(la)
+    return out
+
+
+def fetch_pairs_bulk(addresses: Iterable[str], chunk: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """{token_lower: [pairs listing it as baseToken]} for every requested address."""
+    addrs = _norm_addrs(addresses)
+    size = max(1, min(30, int(chunk or DEXSCREENER_CHUNK)))
+    out: Dict[str, List[Dict[str, Any]]] = {a: [] for a in addrs}
+    for i in range(0, len(addrs), size):
+        part = addrs[i:i + size]
+        data = get_json(f"{DEX_TOKENS_URL}/{','.join(part)}", timeout=12, retries=2) or {}
+        pairs = data.get("pairs") or []
+        logger.debug("dexscreener bulk %s tokens -> %s pairs", len(part), len(pairs))
+        for p in pairs:
+            try:
+                base = str((p.get("baseToken") or {}).get("address") or "").lower()
+            except Exception:
+                continue
+            if base in out:
+                out[base].append(p)
+    return out
+
+
+def best_prices(addresses: Iterable[str], chain: str = CHAIN) -> Dict[str, Optional[float]]:
+    """{token_lower: best USD price or None}, one HTTP call per DEXSCREENER_CHUNK tokens."""
+    return {a: pick_best_price(pairs, chain) for a, pairs in fetch_pairs_bulk(addresses).items()}
+
+
+def fetch_pairs_multi(chain: str, pair_addresses: Iterable[str], chunk: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    {pair_lower: pair} for the requested pair addresses, one HTTP call per
+    DEXSCREENER_CHUNK pairs. Pairs missing from the answer (unknown pair,
+    failed chunk) are simply absent; callers fetch those one by one.
+    """
+    addrs = _norm_addrs(pair_addresses)
+    size = max(1, min(30, int(chunk or DEXSCREENER_CHUNK)))
+    out: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(addrs), size):
+        part = addrs[i:i + size]
+        data = get_json(f"{DEX_PAIRS_URL}/{chain}/{','.join(part)}", timeout=12, retries=2) or {}
+        pairs = data.get("pairs") or ([data["pair"]] if isinstance(data.get("pair"), dict) else [])
+        for p in pairs:
+            try:
+                addr = str(p.get("pairAddress") or "").lower()
+            except Exception:
+                continue
+            if addr in part:
+                out[addr] = p
+    return out
+
+
+# ---------- single-token lookups ----------
+def search_pairs(query: str) -> List[Dict[str, Any]]:
+    data = get_json(DEX_SEARCH_URL, params={"q": query}, timeout=10) or {}
+    return data.get("pairs") or []
+
+
+def token_pairs(addr: str) -> List[Dict[str, Any]]:
+    """Pairs for one token: /tokens/cronos/{addr}, then /tokens/{addr}, then search."""
+    data = get_json(f"{DEX_TOKENS_URL}/{CHAIN}/{addr}", timeout=10) or {}
+    pairs = data.get("pairs") or []
+    if not pairs:
+        data = get_json(f"{DEX_TOKENS_URL}/{addr}", timeout=10) or {}
+        pairs = data.get("pairs") or []
+    if not pairs:
+        pairs = search_pairs(addr)
+    return pairs
+
+
+def price_for_address(addr: str) -> Optional[float]:
+    return pick_best_price(token_pairs(addr))
+
+
+def price_cro() -> Optional[float]:
+    for q in ("wcro usdt", "cro usdt", "wcro usdc", "cro usdc", "cro busd", "cro dai"):
+        try:
+            p = pick_best_price(search_pairs(q))
+        except Exception:
+            p = None
+        if p and p > 0:
+            return p
+    return None
+
+
+def price_for_symbol(symbol: str) -> Optional[float]:
+    s = (symbol or "").strip().lower()
+    if not s:
+        return None
+    for q in (s, f"{s} usdt", f"{s} wcro"):
+        p = pick_best_price(search_pairs(q))
+        if p:
+            return p
+    return None
@@ -4,19 +4,21 @@ from __future__ import annotations
 
 import os
 import re
-import math
 import logging
 from decimal import Decimal
 from typing import Optional, List, Dict, Any, Set
 
 import requests
 
+from core import logscan, multicall, transfer_index
+from core.jsonrpc import RpcError
+from core.rpc_client import get_client
+
 logger = logging.getLogger("core.discovery")
 
 # ---------- RPC endpoint ----------
 CRONOS_RPC_URL = (os.getenv("CRONOS_RPC_URL") or os.getenv("RPC_URL") or "").strip() \
                  or "https://cronos-evm-rpc.publicnode.com"
-REQ_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "15"))
 
 # ---------- Config από ΥΠΑΡΧΟΝΤΑ envs ----------
 def _int_env(*names: str, default: int = 0) -> int:
@@ -37,92 +39,34 @@ def _int_env(*names: str, default: int = 0) -> int:
 LOOKBACK_BLOCKS = _int_env("LOG_SCAN_BLOCKS", "DISCOVERY_LOOKBACK", default=500000)
 CHUNK_SIZE      = _int_env("LOG_SCAN_CHUNK",  "DISCOVERY_CHUNK",  default=4000)
 
-# ---------- ABI selectors ----------
-SEL_SYMBOL   = "0x95d89b41"
-SEL_DECIMALS = "0x313ce567"
-SEL_BALANCE  = "0x70a08231"
-
 # ERC20 Transfer topic
-TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a6c4b5fbb"
+TRANSFER_TOPIC = logscan.TRANSFER_TOPIC
+
+# ---------- Low-level RPC (pooled session, JSON-RPC batches via core.jsonrpc) ----------
+def _rpc(method: str, params: List[Any]) -> Any:
+    return get_client(CRONOS_RPC_URL).call(method, params)
 
-# ---------- Low-level RPC ----------
-def _rpc(payload: Dict[str, Any]) -> Any:
-    r = requests.post(CRONOS_RPC_URL, json=payload, timeout=REQ_TIMEOUT)
-    r.raise_for_status()
-    j = r.json()
-    if "error" in j:
-        raise RuntimeError(j["error"])
-    return j["result"]
+def _rpc_batch(calls: List[Any]) -> List[Any]:
+    """[(method, params), ...] -> [result | RpcError, ...] σε ένα (ή λίγα) HTTP requests."""
+    return get_client(CRONOS_RPC_URL).batch(calls)
 
 def _eth_block_number() -> int:
-    res = _rpc({"jsonrpc":"2.0","id":1,"method":"eth_blockNumber","params":[]})
+    res = _rpc("eth_blockNumber", [])
     return int(res, 16)
 
 def _hex(n: int) -> str:
     return hex(n)
 
-def _eth_get_logs_range(from_block_hex: str, to_block_hex: str, topics: List[Any]) -> List[Dict[str, Any]]:
-    try:
-        params = {"fromBlock": from_block_hex, "toBlock": to_block_hex, "topics": topics}
-        return _rpc({"jsonrpc":"2.0","id":1,"method":"eth_getLogs","params":[params]})
-    except Exception as e:
-        logger.debug("eth_getLogs failed %s-%s: %s", from_block_hex, to_block_hex, e)
-        return []
-
 def _eth_call(to: str, data: str) -> Optional[str]:
     try:
-        return _rpc({"jsonrpc":"2.0","id":1,"method":"eth_call","params":[{"to": to, "data": data},"latest"]})
+        return _rpc("eth_call", [{"to": to, "data": data}, "latest"])
     except Exception:
         return None
 
-# ---------- ERC-20 helpers ----------
-def _addr_topic(wallet: str) -> str:
-    return "0x" + wallet.lower().replace("0x","").rjust(64, "0")
-
-def _decode_uint256(hexstr: str) -> int:
-    if not hexstr: 
-        return 0
-    return int(hexstr, 16)
-
-def _decode_string(hexstr: str) -> Optional[str]:
-    if not hexstr:
-        return None
-    # try fixed bytes-like
-    try:
-        raw = bytes.fromhex(hexstr.replace("0x",""))
-        s = raw.rstrip(b"\x00").decode("utf-8", errors="ignore")
-        if s:
-            return s
-    except Exception:
-        pass
-    # try dynamic ABI string
-    try:
-        data = hexstr[2:] if hexstr.startswith("0x") else hexstr
-        if len(data) >= 128:
-            strlen = int(data[64:128], 16)
-            start  = 128
-            end    = 128 + strlen*2
-            raw    = bytes.fromhex(data[start:end])
-            return raw.decode("utf-8", errors="ignore") or None
-    except Exception:
-        pass
-    return None
-
-def _call_symbol(addr: str) -> Optional[str]:
-    out = _eth_call(addr, SEL_SYMBOL)
-    return _decode_string(out) if out else None
-
-def _call_decimals(addr: str) -> int:
-    out = _eth_call(addr, SEL_DECIMALS)
-    try:
-        return int(out, 16) if out else 18
-    except Exception:
-        return 18
-
-def _call_balance_of(addr: str, wallet: str) -> int:
-    w = wallet.lower().replace("0x","").rjust(64, "0")
-    out = _eth_call(addr, SEL_BALANCE + w)
-    return _decode_uint256(out) if out else 0
+def _eth_call_many(calls: List[Any]) -> List[Optional[str]]:
+    """Batch πολλών eth_call· αποτυχημένα items γυρνάνε None στη θέση τους."""
+    res = _rpc_batch([("eth_call", [{"to": to, "data": data}, "latest"]) for to, data in calls])
+    return [None if isinstance(r, RpcError) else r for r in res]
 
 # ---------- Seeds από TOKENS ----------
 _ADDR_RE = re.compile(r"0x[a-fA-F0-9]{40}")
@@ -193,31 +137,49 @@ def _discover_via_blockscout_tokenlist(wallet: str) -> List[Dict[str, Any]]:
     if not rows:
         return []
 
-    out: List[Dict[str, Any]] = []
+    parsed: List[Dict[str, Any]] = []
     for row in rows:
         addr = (row.get("contractAddress") or row.get("contractaddress") or "").lower()
         if not addr.startswith("0x") or len(addr) != 42:
             continue
-
-        raw_bal_s = row.get("balance")
-        dec_s     = row.get("decimals")
-        sym       = (row.get("symbol") or "").strip()
-
-        # Συμπλήρωσε/διόρθωσε από on-chain όπου λείπει/χαλάει
-        dec = _to_pos_int(dec_s) or _call_decimals(addr)
+        raw_bal: Optional[int]
         try:
-            raw_bal = int(str(raw_bal_s)) if raw_bal_s is not None else _call_balance_of(addr, wallet)
+            raw_bal = int(str(row.get("balance"))) if row.get("balance") is not None else None
         except Exception:
-            raw_bal = _call_balance_of(addr, wallet)
+            raw_bal = None
+        parsed.append({
+            "address": addr,
+            "raw_bal": raw_bal,
+            "decimals": _to_pos_int(row.get("decimals")) or None,
+            "symbol": (row.get("symbol") or "").strip(),
+        })
+
+    # Συμπλήρωσε/διόρθωσε από on-chain όπου λείπει/χαλάει — όλα μαζί σε ένα batch
+    need = [p for p in parsed if p["raw_bal"] is None or p["decimals"] is None or not p["symbol"]]
+    if need:
+        try:
+            chain = multicall.read_erc20_batch(
+                [p["address"] for p in need], wallet, _eth_call, eth_call_many=_eth_call_many
+            )
+        except Exception as e:
+            logger.debug("blockscout on-chain fill failed: %s", e)
+            chain = {}
+        for p in need:
+            c = chain.get(p["address"]) or {}
+            if p["raw_bal"] is None:
+                p["raw_bal"] = c.get("balance") or 0
+            if p["decimals"] is None:
+                p["decimals"] = c.get("decimals") or 18
+            if not p["symbol"]:
+                p["symbol"] = c.get("symbol") or p["address"][:6]
 
-        if raw_bal <= 0:
+    out: List[Dict[str, Any]] = []
+    for p in parsed:
+        if (p["raw_bal"] or 0) <= 0:
             continue
-
-        if not sym:
-            sym = _call_symbol(addr) or addr[:6]
-
-        amount = Decimal(raw_bal) / (Decimal(10) ** Decimal(dec))
-        out.append({"address": addr, "symbol": sym, "decimals": dec, "amount": amount})
+        dec = p["decimals"]
+        amount = Decimal(p["raw_bal"]) / (Decimal(10) ** Decimal(dec))
+        out.append({"address": p["address"], "symbol": p["symbol"], "decimals": dec, "amount": amount})
     return out
 
 # ---------- Logs discovery (chunked) ----------
@@ -229,57 +191,43 @@ def _uniq(seq: List[str]) -> List[str]:
             seen.add(lx); out.append(lx)
     return out
 
-def _scan_chunks(wallet: str, from_block: int, to_block: int) -> List[str]:
-    """
-    Chunked scan:
-    topic0=Transfer, topic1=from=wallet
-    topic0=Transfer, topic2=to=wallet
-    """
-    addrs: List[str] = []
-    total = max(to_block - from_block + 1, 0)
-    chunks = max(math.ceil(total / CHUNK_SIZE), 1)
-
-    addr_topic = _addr_topic(wallet)
-    t_from = [addr_topic]
-    t_to   = [addr_topic]
-
-    for i in range(chunks):
-        start = from_block + i*CHUNK_SIZE
-        end   = min(start + CHUNK_SIZE - 1, to_block)
-        if start > end:
-            break
-        frm_hex = _hex(start); to_hex = _hex(end)
-
-        logs1 = _eth_get_logs_range(frm_hex, to_hex, [TRANSFER_TOPIC, t_from, None])
-        logs2 = _eth_get_logs_range(frm_hex, to_hex, [TRANSFER_TOPIC, None, t_to])
-
-        for l in (logs1 + logs2):
-            addr = l.get("address")
-            if addr:
-                addrs.append(addr)
-    return _uniq(addrs)
+def _get_logs(flt: Dict[str, Any]) -> List[Dict[str, Any]]:
+    q = dict(flt, fromBlock=_hex(flt["fromBlock"]), toBlock=_hex(flt["toBlock"]))
+    return _rpc("eth_getLogs", [q]) or []
 
-def _read_token(addr: str, wallet: str) -> Optional[Dict[str, Any]]:
+def _read_tokens(addrs: List[str], wallet: str) -> List[Dict[str, Any]]:
+    """balanceOf/decimals/symbol για πολλά contracts σε ένα multicall (core.multicall)."""
     try:
-        bal = _call_balance_of(addr, wallet)
+        rows = multicall.read_erc20_batch(addrs, wallet, _eth_call, eth_call_many=_eth_call_many)
+    except Exception as e:
+        logger.debug("read tokens batch failed: %s", e)
+        return []
+    out: List[Dict[str, Any]] = []
+    for addr, row in rows.items():
+        bal = row.get("balance") or 0
         if bal <= 0:
-            return None
-        dec = _call_decimals(addr)
-        sym = _call_symbol(addr) or addr[:6]
+            continue
+        dec = row.get("decimals")
+        if dec is None:
+            dec = 18
+        sym = row.get("symbol") or addr[:6]
         amount = Decimal(bal) / (Decimal(10) ** Decimal(dec))
-        return {"address": addr.lower(), "symbol": sym, "decimals": dec, "amount": amount}
-    except Exception as e:
-        logger.debug("read token failed %s: %s", addr, e)
-        return None
+        out.append({"address": addr.lower(), "symbol": sym, "decimals": dec, "amount": amount})
+    return out
+
+def _read_token(addr: str, wallet: str) -> Optional[Dict[str, Any]]:
+    rows = _read_tokens([addr], wallet)
+    return rows[0] if rows else None
 
 # ========== (C) Κύρια συνάρτηση: Blockscout πρώτα, μετά logs, μετά seeds ==========
-def discover_tokens_for_wallet(wallet_address: str, lookback_blocks: int = None) -> List[Dict[str, Any]]:
+def discover_tokens_for_wallet(wallet_address: str, lookback_blocks: int = None, full_rescan: bool = False) -> List[Dict[str, Any]]:
     """
     Επιστρέφει tokens (symbol,address,decimals,amount) με balance>0.
     Προτεραιότητα:
       1) Blockscout account.tokenlist (πλήρης λίστα tokens που κατέχει το wallet)
       2) chunked logs (LOG_SCAN_BLOCKS / LOG_SCAN_CHUNK) για fallback/εμπλουτισμό
       3) seeds από TOKENS (αν έχεις ορίσει contracts)
+    Το logs scan είναι incremental (core.transfer_index)· full_rescan=True το ξανατρέχει από την αρχή.
     """
     wallet = wallet_address.lower()
 
@@ -290,8 +238,9 @@ def discover_tokens_for_wallet(wallet_address: str, lookback_blocks: int = None)
     # 2) Fallback: logs scan για ό,τι δεν γύρισε το API
     latest = _eth_block_number()
     lookback = int(lookback_blocks) if lookback_blocks is not None else LOOKBACK_BLOCKS
-    start = max(latest - lookback, 0)
-    candidates = _scan_chunks(wallet, start, latest)
+    index = transfer_index.get_index()
+    index.sync(wallet, _get_logs, latest, lookback, chunk=CHUNK_SIZE, full=full_rescan)
+    candidates = sorted(index.contracts(wallet))
 
     # 3) Seeds από TOKENS env (αν υπάρχουν)
     try:
@@ -301,13 +250,10 @@ def discover_tokens_for_wallet(wallet_address: str, lookback_blocks: int = None)
     except Exception:
         pass
 
-    # Εμπλούτισε tokens με ό,τι βρέθηκε από logs/seeds που δεν υπήρχε ήδη
-    for addr in _uniq(candidates):
-        if addr in found_addrs:
-            continue
-        t = _read_token(addr, wallet)
-        if t:
-            tokens.append(t)
-            found_addrs.add(addr)
+    # Εμπλούτισε tokens με ό,τι βρέθηκε από logs/seeds που δεν υπήρχε ήδη (ένα batch)
+    missing = [a for a in _uniq(candidates) if a not in found_addrs]
+    for t in _read_tokens(missing, wallet):
+        tokens.append(t)
+        found_addrs.add(t["address"])
 
     return tokens
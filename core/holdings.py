@@ -137,10 +137,10 @@ class AssetSnap:
         }
 
 
-def _discover_erc20_contracts_from_logs(blocks_back: int = 120_000, chunk: int = 3_000, max_contracts: int = 200) -> list[str]:
+def _discover_erc20_contracts_from_logs(blocks_back: int = 120_000, chunk: int = 3_000, max_contracts: int = 200, full: bool = False) -> list[str]:
     """
-    Scan recent blocks in chunks for ERC-20 Transfer events where our wallet is sender or receiver.
-    Correctly encodes address topics (32-byte padded). Falls back to topic0-only + client-side filter.
+    Scan blocks for ERC-20 Transfer events where our wallet is sender or receiver (core.logscan).
+    Only blocks not yet in the local Transfer-log index (core.transfer_index) are fetched unless `full`.
     """
     rpc_url = os.getenv("CRONOS_RPC_URL") or os.getenv("CRONOSRPCURL")
     wallet = os.getenv("WALLET_ADDRESS") or os.getenv("WALLETADDRESS")
@@ -149,75 +149,19 @@ def _discover_erc20_contracts_from_logs(blocks_back: int = 120_000, chunk: int =
         return []
     try:
         from web3 import Web3  # type: ignore
-        w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 15}))
-        if not w3.is_connected():
+        from core import rpc_client, transfer_index
+        client = rpc_client.get_client(rpc_url)
+        if not client.healthy():
             _dbg("discover: RPC not connected")
             return []
         acct_cs = Web3.to_checksum_address(wallet)
-        acct_topic = _topic_pad_addr(acct_cs)
-        topic0 = Web3.keccak(text="Transfer(address,address,uint256)").hex()
-        latest = int(w3.eth.block_number)
-        earliest = max(0, latest - int(blocks_back))
-        found: set[str] = set()
-
-        def scan_range(fb: int, tb: int) -> None:
-            nonlocal found
-            fb_h, tb_h = hex(fb), hex(tb)
-            # to = wallet
-            try:
-                logs_to = w3.eth.get_logs({"fromBlock": fb_h, "toBlock": tb_h, "topics": [topic0, None, acct_topic]})
-            except Exception as e:
-                _dbg(f"discover: get_logs(to) {fb}-{tb} error={e!r}")
-                logs_to = []
-            # from = wallet
-            try:
-                logs_from = w3.eth.get_logs({"fromBlock": fb_h, "toBlock": tb_h, "topics": [topic0, acct_topic, None]})
-            except Exception as e:
-                _dbg(f"discover: get_logs(from) {fb}-{tb} error={e!r}")
-                logs_from = []
-            for lg in (logs_to or []) + (logs_from or []):
-                try:
-                    c = Web3.to_checksum_address(lg["address"])
-                    found.add(c)
-                    if len(found) >= max_contracts:
-                        return
-                except Exception:
-                    continue
-            # Fallback: topic0-only + client-side filter (parse topics[1]/[2])
-            if len(found) < max_contracts:
-                try:
-                    logs_any = w3.eth.get_logs({"fromBlock": fb_h, "toBlock": tb_h, "topics": [topic0]})
-                except Exception as e:
-                    _dbg(f"discover: get_logs(any) {fb}-{tb} error={e!r}")
-                    logs_any = []
-                topic_pad = acct_topic[2:]  # strip 0x, 64 hex chars with addr at rightmost 40
-                for lg in logs_any or []:
-                    try:
-                        tps = lg.get("topics") or []
-                        if len(tps) >= 3:
-                            t1 = (tps[1] or "").lower()
-                            t2 = (tps[2] or "").lower()
-                            if t1.endswith(topic_pad[24:]) or t2.endswith(topic_pad[24:]):  # match by last 40 hex chars
-                                c = Web3.to_checksum_address(lg["address"])
-                                found.add(c)
-                                if len(found) >= max_contracts:
-                                    return
-                    except Exception:
-                        continue
-
-        # Chunked backward scan
-        _dbg(f"discover: latest={latest} earliest={earliest} chunk={chunk}")
-        for tb in range(latest, earliest, -chunk):
-            fb = max(earliest, tb - (chunk - 1))
-            scan_range(fb, tb)
-            _dbg(f"discover: scanned {fb}-{tb}, contracts={len(found)}")
-            if len(found) >= 1 and (tb < latest - 2*chunk):
-                # We have some hits; we can stop early to reduce load
-                break
-            # polite small delay to avoid provider rate limits
-            time.sleep(0.1)
-
-        out = sorted(found)
+        latest = client.block_number()
+
+        index = transfer_index.get_index()
+        added = index.sync(acct_cs, client.get_logs, latest, int(blocks_back), chunk=chunk, full=full)
+        known = index.contracts(acct_cs)
+        _dbg(f"discover: indexed {added} new transfers up to block {latest}")
+        out = sorted(Web3.to_checksum_address(c) for c in known)[:max_contracts]
         _dbg(f"discover: total contracts={len(out)}")
         return out
     except Exception as e:
@@ -228,8 +172,9 @@ def _discover_erc20_contracts_from_logs(blocks_back: int = 120_000, chunk: int =
 
 def _fetch_erc20_balances_for_contracts(contracts: list[str]) -> list[Dict[str, Any]]:
     """
-    For a list of token contract addresses, query balanceOf(wallet) and decimals(), and compose balance rows.
-    Symbol resolution is best-effort using pricing.get_symbol or contract symbol() if available; falls back to address.
+    For a list of token contract addresses, query balanceOf(wallet), decimals() and symbol() in one
+    multicall batch (core.multicall), and compose balance rows.
+    Symbol resolution is best-effort using contract symbol() or pricing.get_symbol_for_address; falls back to address.
     """
     rpc_url = os.getenv("CRONOS_RPC_URL") or os.getenv("CRONOSRPCURL")
     wallet = os.getenv("WALLET_ADDRESS") or os.getenv("WALLETADDRESS")
@@ -237,48 +182,32 @@ def _fetch_erc20_balances_for_contracts(contracts: list[str]) -> list[Dict[str,
         return []
     try:
         from web3 import Web3  # type: ignore
+        from core import rpc_client
     except Exception:
         return []
     try:
-        w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 15}))
-        if not w3.is_connected():
+        client = rpc_client.get_client(rpc_url)
+        if not client.healthy():
             return []
-        acct = Web3.to_checksum_address(wallet)
-        acct_bytes = bytes.fromhex(acct[2:].rjust(64, "0"))
-        sel_balance = Web3.keccak(text="balanceOf(address)")[:4]
-        sel_dec = Web3.keccak(text="decimals()")[:4]
-        sel_sym = Web3.keccak(text="symbol()")[:4]
+        rows = client.read_erc20_batch(contracts, wallet)
+        _dbg(f"erc20 batch: contracts={len(rows)}")
         out: list[Dict[str, Any]] = []
-        for ca in contracts:
+        for ca, row in rows.items():
             try:
                 addr = Web3.to_checksum_address(ca)
-                data = sel_balance + acct_bytes
-                raw = w3.eth.call({"to": addr, "data": "0x" + data.hex()})
-                raw_bytes = bytes(raw) if raw else b""
-                bal = int.from_bytes(raw_bytes, "big") if raw_bytes else 0
+                bal = row.get("balance") or 0
                 if bal <= 0:
                     continue
 
-                dec_raw = w3.eth.call({"to": addr, "data": "0x" + sel_dec.hex()}) or b""
-                dec_bytes = bytes(dec_raw)
-                decimals = int.from_bytes(dec_bytes, "big") if dec_bytes else 18
-                if decimals < 0 or decimals > 36:
+                decimals = row.get("decimals")
+                if decimals is None:
                     decimals = 18
 
                 qty = Decimal(bal) / (Decimal(10) ** Decimal(decimals))
                 if qty <= Decimal("0"):
                     continue
 
-                symbol = None
-                try:
-                    sym_raw = w3.eth.call({"to": addr, "data": "0x" + sel_sym.hex()}) or b""
-                    sym_bytes = bytes(sym_raw).rstrip(b"\x00")
-                    if sym_bytes:
-                        symbol_candidate = sym_bytes.decode("utf-8", "ignore").strip()
-                        if symbol_candidate:
-                            symbol = symbol_candidate
-                except Exception:
-                    pass
+                symbol = row.get("symbol")
 
                 if not symbol and pricing is not None and hasattr(pricing, "get_symbol_for_address"):
                     try:
@@ -405,12 +334,12 @@ def _fallback_native_cro_balance() -> Optional[Dict[str, Any]]:
     if not rpc_url or not wallet:
         return None
     try:
-        from web3 import Web3  # type: ignore
+        from core import rpc_client
 
-        w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 10}))
-        if not w3.is_connected():
+        client = rpc_client.get_client(rpc_url)
+        if not client.healthy():
             return None
-        wei = w3.eth.get_balance(Web3.to_checksum_address(wallet))
+        wei = client.get_balance(wallet)
         cro = Decimal(wei) / Decimal(10**18)
         # Ignore dust-level noise; treat < 1e-12 as zero
         if cro.compare(Decimal("0.000000000001")) <= 0:
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+core/jsonrpc.py — JSON-RPC transport over a pooled keep-alive session.
+
+- rpc_call(url, method, params)   -> result (raises RpcError on error object)
+- rpc_batch(url, [(method, params), ...]) -> [result | RpcError, ...]
+
+Batches are sent as one JSON-RPC array per HTTP request, split into
+RPC_BATCH_MAX-sized chunks. A chunk the provider refuses as a whole
+(HTTP 413, non-array reply, "batch too large") is halved and retried, so
+callers never see the provider's batch limit. Each item's error is mapped
+back to its own slot; one bad eth_call does not fail its neighbours.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("core.jsonrpc")
+
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "15"))
+RPC_BATCH_MAX = max(1, int(os.getenv("RPC_BATCH_MAX", "50") or 50))
+RPC_POOL_SIZE = max(1, int(os.getenv("RPC_POOL_SIZE", "16") or 16))
+
+Call = Tuple[str, Sequence[Any]]
+
+
+class RpcError(RuntimeError):
+    """JSON-RPC error object (or missing response) for a single call."""
+
+    def __init__(self, message: str, code: Optional[int] = None, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+    @classmethod
+    def from_obj(cls, err: Any) -> "RpcError":
+        if isinstance(err, dict):
+            return cls(str(err.get("message") or err), err.get("code"), err.get("data"))
+        return cls(str(err))
+
+
+class BatchRejected(RuntimeError):
+    """The provider refused a batch as a whole (size limit, batching disabled)."""
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide keep-alive session used for JSON-RPC posts."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=RPC_POOL_SIZE, pool_maxsize=RPC_POOL_SIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers.update({"Content-Type": "application/json"})
+                _session = s
+    return _session
+
+
+def _post(url: str, payload: Any, timeout: float) -> Any:
+    r = get_session().post(url, json=payload, timeout=timeout)
+    if r.status_code == 413:
+        raise BatchRejected("413 payload too large")
+    r.raise_for_status()
+    return r.json()
+
+
+def rpc_call(url: str, method: str, params: Sequence[Any] = (), timeout: Optional[float] = None) -> Any:
+    """Single JSON-RPC call; returns `result` or raises RpcError."""
+    j = _post(url, {"jsonrpc": "2.0", "id": 1, "method": method, "params": list(params)}, timeout or RPC_TIMEOUT)
+    if not isinstance(j, dict):
+        raise RpcError("malformed JSON-RPC response")
+    if "error" in j:
+        raise RpcError.from_obj(j["error"])
+    return j.get("result")
+
+
+def _looks_like_batch_limit(obj: Any) -> bool:
+    text = str(obj).lower()
+    return "batch" in text and any(w in text for w in ("limit", "large", "exceed", "too many", "not supported"))
+
+
+def _send_chunk(url: str, calls: Sequence[Call], timeout: float) -> List[Union[Any, RpcError]]:
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": list(params)}
+        for i, (method, params) in enumerate(calls)
+    ]
+    reply = _post(url, payload, timeout)
+    if not isinstance(reply, list):
+        err = reply.get("error") if isinstance(reply, dict) else reply
+        if len(calls) > 1 and _looks_like_batch_limit(err):
+            raise BatchRejected(str(err))
+        if len(calls) > 1:
+            raise BatchRejected(f"non-array batch reply: {str(err)[:120]}")
+        reply = [reply]
+    by_id: Dict[Any, Any] = {}
+    for item in reply:
+        if isinstance(item, dict):
+            by_id[item.get("id")] = item
+    out: List[Union[Any, RpcError]] = []
+    for i in range(len(calls)):
+        item = by_id.get(i)
+        if item is None:
+            out.append(RpcError("missing response in batch"))
+        elif "error" in item:
+            out.append(RpcError.from_obj(item["error"]))
+        else:
+            out.append(item.get("result"))
+    return out
+
+
+def _send_splitting(url: str, calls: Sequence[Call], timeout: float) -> List[Union[Any, RpcError]]:
+    try:
+        return _send_chunk(url, calls, timeout)
+    except BatchRejected as e:
+        if len(calls) <= 1:
+            return [RpcError(str(e))]
+        mid = len(calls) // 2
+        logger.debug("batch of %s rejected (%s); splitting", len(calls), e)
+        return _send_splitting(url, calls[:mid], timeout) + _send_splitting(url, calls[mid:], timeout)
+
+
+def rpc_batch(
+    url: str,
+    calls: Sequence[Call],
+    timeout: Optional[float] = None,
+    max_batch: Optional[int] = None,
+) -> List[Union[Any, RpcError]]:
+    """
+    Send [(method, params), ...] as JSON-RPC array(s); return results in input order.
+    Per-item failures come back as RpcError instances in their slot. Transport
+    failures (connection, HTTP 5xx) mark every call of the affected chunk.
+    """
+    size = max(1, int(max_batch or RPC_BATCH_MAX))
+    t = timeout or RPC_TIMEOUT
+    out: List[Union[Any, RpcError]] = []
+    for i in range(0, len(calls), size):
+        chunk = list(calls[i:i + size])
+        try:
+            out.extend(_send_splitting(url, chunk, t))
+        except Exception as e:
+            logger.debug("batch chunk %s-%s failed: %s", i, i + len(chunk), e)
+            out.extend(RpcError(f"transport error: {e}") for _ in chunk)
+    return out
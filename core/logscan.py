@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+core/logscan.py — parallel, adaptive-chunk eth_getLogs scanner.
+
+`scan_logs(get_logs, from_block, to_block, topic_sets)` covers a block range
+for one or more topic filters (e.g. Transfer from=wallet / to=wallet):
+
+- range queries run on a bounded worker pool (LOG_SCAN_WORKERS), every
+  (sub-range, topic filter) pair is its own task, so "from" and "to"
+  queries no longer wait on each other;
+- a provider limit error ("too many results", "range too large", ...)
+  bisects the range instead of dropping it;
+- sparse responses grow the chunk for the ranges not dispatched yet, a
+  limit hit shrinks it again;
+- other failures are retried with backoff (LOG_SCAN_RETRIES); what still
+  fails is reported in `ScanResult.gaps`, never silently skipped.
+
+Callers that checkpoint progress should only advance to
+`ScanResult.covered_until` (contiguous covered prefix), so a gap is picked
+up again by the next scan.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger("core.logscan")
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+LOG_SCAN_WORKERS = max(1, int(os.getenv("LOG_SCAN_WORKERS", "4") or 4))
+LOG_SCAN_RETRIES = max(0, int(os.getenv("LOG_SCAN_RETRIES", "2") or 2))
+LOG_SCAN_MAX_CHUNK = max(1, int(os.getenv("LOG_SCAN_MAX_CHUNK", "50000") or 50000))
+LOG_SCAN_SPARSE = 100  # fewer logs than this in a range → grow the chunk
+
+GetLogs = Callable[[Dict[str, Any]], List[Dict[str, Any]]]
+Topics = Sequence[Any]
+
+_LIMIT_HINTS = (
+    "too many",
+    "more than",
+    "range too large",
+    "range is too large",
+    "block range",
+    "exceed",
+    "limit",
+    "response size",
+    "query timeout",
+    "-32005",
+)
+
+
+def is_limit_error(err: Any) -> bool:
+    """True when a provider error means "ask for a smaller range"."""
+    code = getattr(err, "code", None)
+    if code == -32005:
+        return True
+    text = str(err).lower()
+    if "rate" in text or "429" in text:
+        return False  # throttling: retry the same range, do not bisect
+    return any(h in text for h in _LIMIT_HINTS)
+
+
+def wallet_topic(addr: str) -> str:
+    """32-byte padded topic for an address."""
+    return "0x" + (addr or "").lower().replace("0x", "").rjust(64, "0")
+
+
+def transfer_topic_sets(wallet: str) -> List[List[Any]]:
+    """Transfer topic filters for from=wallet and to=wallet."""
+    t = wallet_topic(wallet)
+    return [[TRANSFER_TOPIC, t], [TRANSFER_TOPIC, None, t]]
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    out: List[Tuple[int, int]] = []
+    for a, b in sorted(ranges):
+        if out and a <= out[-1][1] + 1:
+            out[-1] = (out[-1][0], max(out[-1][1], b))
+        else:
+            out.append((a, b))
+    return out
+
+
+@dataclass
+class ScanResult:
+    from_block: int
+    to_block: int
+    logs: List[Dict[str, Any]] = field(default_factory=list)
+    gaps: List[Tuple[int, int, str]] = field(default_factory=list)
+    covered: List[List[Tuple[int, int]]] = field(default_factory=list)  # merged ranges per topic set
+    requests: int = 0
+
+    @property
+    def complete(self) -> bool:
+        return not self.gaps
+
+    def _common(self) -> List[Tuple[int, int]]:
+        # blocks covered by every topic set
+        if not self.covered:
+            return []
+        common = self.covered[0]
+        for other in self.covered[1:]:
+            nxt: List[Tuple[int, int]] = []
+            for a, b in common:
+                for c, d in other:
+                    lo, hi = max(a, c), min(b, d)
+                    if lo <= hi:
+                        nxt.append((lo, hi))
+            common = _merge(nxt)
+        return common
+
+    @property
+    def covered_until(self) -> int:
+        """Last block of the contiguous covered prefix (from_block - 1 if none)."""
+        common = self._common()
+        if common and common[0][0] <= self.from_block:
+            return common[0][1]
+        return self.from_block - 1
+
+    @property
+    def covered_from(self) -> int:
+        """First block of the contiguous covered suffix (to_block + 1 if none)."""
+        common = self._common()
+        if common and common[-1][1] >= self.to_block:
+            return common[-1][0]
+        return self.to_block + 1
+
+    def addresses(self) -> Set[str]:
+        out: Set[str] = set()
+        for lg in self.logs:
+            addr = str(lg.get("address") or "").lower()
+            if addr.startswith("0x"):
+                out.add(addr)
+        return out
+
+
+class _Chunk:
+    """Shared adaptive chunk size (grows on sparse ranges, halves on limit hits)."""
+
+    def __init__(self, initial: int, max_chunk: int):
+        self.size = max(1, int(initial))
+        self.max = max(self.size, int(max_chunk))
+        self._lock = threading.Lock()
+
+    def sparse(self) -> None:
+        with self._lock:
+            self.size = min(self.max, self.size * 2)
+
+    def limited(self, span: int) -> None:
+        with self._lock:
+            self.size = max(1, min(self.size, span // 2))
+
+
+def scan_logs(
+    get_logs: GetLogs,
+    from_block: int,
+    to_block: int,
+    topic_sets: Sequence[Topics],
+    *,
+    address: Optional[Any] = None,
+    chunk: int = 2000,
+    max_chunk: Optional[int] = None,
+    workers: Optional[int] = None,
+    retries: Optional[int] = None,
+    retry_delay: float = 0.5,
+) -> ScanResult:
+    """
+    Fetch logs for [from_block, to_block] for every filter in `topic_sets`.
+    `get_logs(filter_dict)` takes an eth_getLogs filter (int block numbers)
+    and returns the log list or raises; the caller picks the transport.
+    """
+    res = ScanResult(int(from_block), int(to_block), covered=[[] for _ in topic_sets])
+    if to_block < from_block or not topic_sets:
+        return res
+    n_workers = max(1, int(workers or LOG_SCAN_WORKERS))
+    n_retries = LOG_SCAN_RETRIES if retries is None else max(0, int(retries))
+    size = _Chunk(chunk, max_chunk or LOG_SCAN_MAX_CHUNK)
+    # next block to dispatch, per topic set
+    cursor = [int(from_block)] * len(topic_sets)
+    pending: List[Tuple[int, int, int, int]] = []  # (topic_idx, from, to, attempt) to run first
+    covered: List[List[Tuple[int, int]]] = [[] for _ in topic_sets]
+
+    def _query(ti: int, fb: int, tb: int, attempt: int) -> List[Dict[str, Any]]:
+        if attempt:
+            time.sleep(retry_delay * (2 ** (attempt - 1)))  # backoff in the worker, not the dispatcher
+        flt: Dict[str, Any] = {"fromBlock": fb, "toBlock": tb, "topics": list(topic_sets[ti])}
+        if address is not None:
+            flt["address"] = address
+        return list(get_logs(flt) or [])
+
+    def _next_task() -> Optional[Tuple[int, int, int, int]]:
+        if pending:
+            return pending.pop()
+        open_sets = [i for i in range(len(topic_sets)) if cursor[i] <= to_block]
+        if not open_sets:
+            return None
+        ti = min(open_sets, key=lambda i: cursor[i])  # interleave filters over the same blocks
+        fb = cursor[ti]
+        tb = min(int(to_block), fb + size.size - 1)
+        cursor[ti] = tb + 1
+        return (ti, fb, tb, 0)
+
+    with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="logscan") as pool:
+        running: Dict[Future, Tuple[int, int, int, int]] = {}
+        while True:
+            while len(running) < n_workers:
+                task = _next_task()
+                if task is None:
+                    break
+                ti, fb, tb, attempt = task
+                running[pool.submit(_query, ti, fb, tb, attempt)] = task
+            if not running:
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                ti, fb, tb, attempt = running.pop(fut)
+                res.requests += 1
+                try:
+                    logs = fut.result()
+                except Exception as e:
+                    span = tb - fb + 1
+                    if is_limit_error(e) and span > 1:
+                        size.limited(span)
+                        mid = fb + span // 2 - 1
+                        logger.debug("getLogs %s-%s hit provider limit (%s); bisecting", fb, tb, e)
+                        pending.extend([(ti, mid + 1, tb, 0), (ti, fb, mid, 0)])
+                    elif attempt < n_retries:
+                        logger.debug("getLogs %s-%s failed (%s); retry %s", fb, tb, e, attempt + 1)
+                        pending.append((ti, fb, tb, attempt + 1))
+                    else:
+                        logger.warning("getLogs %s-%s gave up: %s", fb, tb, e)
+                        res.gaps.append((fb, tb, str(e)[:200]))
+                    continue
+                covered[ti].append((fb, tb))
+                res.logs.extend(logs)
+                if len(logs) < LOG_SCAN_SPARSE:
+                    size.sparse()
+
+    res.covered = [_merge(c) for c in covered]
+    res.gaps.sort()
+    return res
+
+
+def scan_transfer_contracts(
+    get_logs: GetLogs,
+    wallet: str,
+    from_block: int,
+    to_block: int,
+    **kwargs: Any,
+) -> ScanResult:
+    """Transfer logs from/to `wallet`; use `.addresses()` for the token contracts."""
+    return scan_logs(get_logs, from_block, to_block, transfer_topic_sets(wallet), **kwargs)
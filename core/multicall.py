@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+core/multicall.py — batched ERC-20 reads through Multicall3 (`aggregate3`).
+
+One `eth_call` to the Multicall3 contract resolves balanceOf/decimals/symbol
+for many contracts (plus the native CRO balance via `getEthBalance`), instead
+of one round trip per field per token.
+
+Notes
+-----
+- No network or web3 import at module import time; callers supply the
+  transport as `eth_call(to, data_hex) -> result_hex | None`.
+- MULTICALL_ADDRESS (env) defaults to the canonical Multicall3 deployment.
+  Set it to an empty string to disable aggregation; reads then fall back to
+  plain per-call `eth_call` (optionally `eth_call_many` for transports that
+  can batch them).
+- A failing aggregate (contract missing, provider error) falls back to the
+  per-call path for that batch, so results degrade but never disappear.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("core.multicall")
+
+MULTICALL3_DEFAULT = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL_ADDRESS = os.getenv("MULTICALL_ADDRESS", MULTICALL3_DEFAULT).strip()
+MULTICALL_BATCH = max(1, int(os.getenv("MULTICALL_BATCH", "150") or 150))
+
+EthCall = Callable[[str, str], Optional[str]]
+EthCallMany = Callable[[Sequence[Tuple[str, str]]], List[Optional[str]]]
+GetBalance = Callable[[str], Optional[int]]
+
+# ---------- ABI selectors ----------
+SEL_AGGREGATE3 = "82ad56cb"      # aggregate3((address,bool,bytes)[])
+SEL_GET_ETH_BALANCE = "4d2301cc"  # getEthBalance(address)
+SEL_BALANCE_OF = "70a08231"       # balanceOf(address)
+SEL_DECIMALS = "313ce567"         # decimals()
+SEL_SYMBOL = "95d89b41"           # symbol()
+
+
+# ---------- ABI helpers ----------
+def _strip0x(h: str) -> str:
+    return h[2:] if h[:2] in ("0x", "0X") else h
+
+
+def _word(n: int) -> str:
+    return format(n, "064x")
+
+
+def encode_address(addr: str) -> str:
+    """Return the 32-byte ABI word (hex, no 0x) for an address."""
+    return _strip0x(addr or "").lower().rjust(64, "0")
+
+
+def balance_of_data(owner: str) -> str:
+    return "0x" + SEL_BALANCE_OF + encode_address(owner)
+
+
+def encode_aggregate3(calls: Sequence[Tuple[str, str]]) -> str:
+    """
+    ABI-encode aggregate3 calldata for [(target, calldata_hex), ...].
+    Every call is sent with allowFailure=true.
+    """
+    n = len(calls)
+    heads: List[str] = []
+    tails: List[str] = []
+    offset = 32 * n
+    for target, data in calls:
+        payload = _strip0x(data or "")
+        blen = len(payload) // 2
+        padded = payload.ljust(((blen + 31) // 32) * 64, "0")
+        tup = encode_address(target) + _word(1) + _word(96) + _word(blen) + padded
+        heads.append(_word(offset))
+        tails.append(tup)
+        offset += len(tup) // 2
+    return "0x" + SEL_AGGREGATE3 + _word(32) + _word(n) + "".join(heads) + "".join(tails)
+
+
+def decode_aggregate3(result_hex: str) -> List[Tuple[bool, bytes]]:
+    """Decode aggregate3's `(bool success, bytes returnData)[]` result."""
+    raw = bytes.fromhex(_strip0x(result_hex or ""))
+    if len(raw) < 64:
+        raise ValueError("aggregate3 result too short")
+
+    def _u(pos: int) -> int:
+        return int.from_bytes(raw[pos:pos + 32], "big")
+
+    arr = _u(0)
+    n = _u(arr)
+    base = arr + 32
+    out: List[Tuple[bool, bytes]] = []
+    for i in range(n):
+        tup = base + _u(base + 32 * i)
+        ok = bool(_u(tup))
+        data_pos = tup + _u(tup + 32)
+        blen = _u(data_pos)
+        out.append((ok, raw[data_pos + 32:data_pos + 32 + blen]))
+    return out
+
+
+def decode_uint(data: Optional[bytes]) -> Optional[int]:
+    if not data or len(data) < 32:
+        return None
+    return int.from_bytes(data[:32], "big")
+
+
+def decode_string(data: Optional[bytes]) -> Optional[str]:
+    """Decode an ABI `string` return, tolerating legacy `bytes32` symbols."""
+    if not data:
+        return None
+    try:
+        if len(data) >= 64 and int.from_bytes(data[:32], "big") == 32:
+            strlen = int.from_bytes(data[32:64], "big")
+            if strlen <= len(data) - 64:
+                s = data[64:64 + strlen].decode("utf-8", "ignore").strip("\x00").strip()
+                return s or None
+        s = data[:32].rstrip(b"\x00").decode("utf-8", "ignore").strip()
+        return s if s and s.isprintable() else None
+    except Exception:
+        return None
+
+
+def _to_bytes(result_hex: Optional[str]) -> Optional[bytes]:
+    if result_hex is None:
+        return None
+    try:
+        return bytes.fromhex(_strip0x(str(result_hex)))
+    except ValueError:
+        return None
+
+
+# ---------- Execution ----------
+def _per_call(
+    calls: Sequence[Tuple[str, str]],
+    eth_call: EthCall,
+    eth_call_many: Optional[EthCallMany],
+) -> List[Optional[bytes]]:
+    if eth_call_many is not None:
+        try:
+            return [_to_bytes(r) for r in eth_call_many(calls)]
+        except Exception as e:
+            logger.debug("eth_call_many failed, looping: %s", e)
+    out: List[Optional[bytes]] = []
+    for target, data in calls:
+        try:
+            out.append(_to_bytes(eth_call(target, data)))
+        except Exception:
+            out.append(None)
+    return out
+
+
+def aggregate(
+    calls: Sequence[Tuple[str, str]],
+    eth_call: EthCall,
+    *,
+    eth_call_many: Optional[EthCallMany] = None,
+    multicall_address: Optional[str] = None,
+    batch_size: Optional[int] = None,
+) -> List[Optional[bytes]]:
+    """
+    Execute [(target, calldata_hex), ...] and return raw return data per call
+    (None for a failed call), in input order.
+    """
+    address = MULTICALL_ADDRESS if multicall_address is None else multicall_address
+    if not calls:
+        return []
+    if not address:
+        return _per_call(calls, eth_call, eth_call_many)
+
+    size = max(1, int(batch_size or MULTICALL_BATCH))
+    out: List[Optional[bytes]] = []
+    for i in range(0, len(calls), size):
+        part = calls[i:i + size]
+        try:
+            res = eth_call(address, encode_aggregate3(part))
+            if res is None:
+                raise RuntimeError("empty aggregate3 result")
+            decoded = decode_aggregate3(res)
+            if len(decoded) != len(part):
+                raise RuntimeError("aggregate3 result length mismatch")
+            out.extend(data if ok else None for ok, data in decoded)
+        except Exception as e:
+            logger.debug("aggregate3 batch %s-%s failed, per-call fallback: %s", i, i + len(part), e)
+            out.extend(_per_call(part, eth_call, eth_call_many))
+    return out
+
+
+def _norm_decimals(value: Optional[int]) -> Optional[int]:
+    if value is None:
+        return None
+    return value if 0 <= value <= 36 else 18
+
+
+def read_erc20_batch(
+    contracts: Iterable[str],
+    owner: Optional[str],
+    eth_call: EthCall,
+    *,
+    include_meta: bool = True,
+    known_meta: Iterable[str] = (),
+    include_native: bool = False,
+    get_balance: Optional[GetBalance] = None,
+    eth_call_many: Optional[EthCallMany] = None,
+    multicall_address: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Resolve balanceOf(owner) / decimals() / symbol() for many contracts at once.
+
+    Returns {contract_lower: {"balance": int|None, "decimals": int|None,
+    "symbol": str|None}}. Contracts listed in `known_meta` (already cached
+    by the caller) skip the decimals/symbol calls. With include_native=True
+    the key "CRO" holds {"balance": wei|None}; it rides inside the aggregate
+    via getEthBalance, or goes through `get_balance(owner)` on the per-call
+    path.
+    """
+    address = MULTICALL_ADDRESS if multicall_address is None else multicall_address
+    uniq: List[str] = []
+    seen = set()
+    for c in contracts or []:
+        lc = (c or "").strip().lower()
+        if lc.startswith("0x") and len(lc) == 42 and lc not in seen:
+            seen.add(lc)
+            uniq.append(lc)
+
+    skip_meta = {(k or "").lower() for k in known_meta or ()}
+    calls: List[Tuple[str, str]] = []
+    slots: List[Tuple[str, str]] = []
+    for c in uniq:
+        if owner:
+            calls.append((c, balance_of_data(owner)))
+            slots.append((c, "balance"))
+        if include_meta and c not in skip_meta:
+            calls.append((c, "0x" + SEL_DECIMALS))
+            slots.append((c, "decimals"))
+            calls.append((c, "0x" + SEL_SYMBOL))
+            slots.append((c, "symbol"))
+
+    native_via_multicall = bool(include_native and owner and address)
+    if native_via_multicall:
+        calls.append((address, "0x" + SEL_GET_ETH_BALANCE + encode_address(owner or "")))
+        slots.append(("CRO", "balance"))
+
+    results = aggregate(
+        calls,
+        eth_call,
+        eth_call_many=eth_call_many,
+        multicall_address=address,
+    )
+
+    out: Dict[str, Dict[str, Any]] = {c: {"balance": None, "decimals": None, "symbol": None} for c in uniq}
+    if include_native:
+        out["CRO"] = {"balance": None}
+    for (key, field), data in zip(slots, results):
+        if field == "symbol":
+            out[key][field] = decode_string(data)
+        elif field == "decimals":
+            out[key][field] = _norm_decimals(decode_uint(data))
+        else:
+            out[key][field] = decode_uint(data)
+
+    if include_native and owner and not native_via_multicall and get_balance is not None:
+        try:
+            out["CRO"]["balance"] = get_balance(owner)
+        except Exception:
+            out["CRO"]["balance"] = None
+    return out
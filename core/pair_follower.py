@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+core/pair_follower.py — event-driven price updates for tracked V2 pairs.
+
+Instead of asking Dexscreener about every tracked pair on a timer, each poll
+runs one eth_getLogs over the blocks produced since the last poll, with
+`address` set to all tracked pair contracts and topic0 set to
+Sync or Swap (core.logscan splits the range only if the node refuses it).
+
+- Sync(uint112 reserve0, uint112 reserve1) is emitted whenever a pair's
+  reserves change. The last Sync per pair in the range gives its current
+  reserves, so price = reserve_quote / reserve_base after decimals.
+- Swap marks a trade. The last Swap's tx hash feeds the "new trade" alert,
+  and its in+out amounts add up to the per-token volume of the range
+  (used to weight the rolling VWAP).
+
+Pairs with no events in the range do not appear in the result, so a quiet
+pair costs nothing beyond its share of the single log query. token0/token1
+and both decimals are read once per pair in one multicall and cached.
+
+The first poll only anchors at the chain head. At most FOLLOW_MAX_BLOCKS
+blocks are read per poll, and the cursor only advances over blocks the log
+scan covered.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core import logscan, multicall
+
+logger = logging.getLogger("core.pair_follower")
+
+SYNC_TOPIC = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+SWAP_TOPIC = "0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822"
+SEL_TOKEN0 = "0dfe1681"  # token0()
+SEL_TOKEN1 = "d21220a7"  # token1()
+
+FOLLOW_MAX_BLOCKS = max(1, int(os.getenv("FOLLOW_MAX_BLOCKS", "200") or 200))
+
+
+def _int(x: Any) -> int:
+    if isinstance(x, int):
+        return x
+    s = str(x or "0")
+    return int(s, 16) if s.startswith("0x") else int(s)
+
+
+@dataclass
+class PairUpdate:
+    pair: str
+    block: int
+    reserve0: Optional[int] = None  # None when the range held a Swap but no Sync
+    reserve1: Optional[int] = None
+    last_swap_tx: Optional[str] = None
+    swaps: int = 0
+    volume0: int = 0  # raw token0 amount swapped (in + out) over the range
+    volume1: int = 0
+
+
+@dataclass
+class PairInfo:
+    token0: str
+    token1: str
+    decimals0: int
+    decimals1: int
+
+    def price(self, base: str, reserve0: int, reserve1: int) -> Optional[float]:
+        """Price of `base` in units of the other token, from raw reserves."""
+        if reserve0 <= 0 or reserve1 <= 0:
+            return None
+        a0 = reserve0 / 10 ** self.decimals0
+        a1 = reserve1 / 10 ** self.decimals1
+        base = (base or "").lower()
+        if base == self.token0:
+            return a1 / a0
+        if base == self.token1:
+            return a0 / a1
+        return None
+
+    def base_volume(self, base: str, volume0: int, volume1: int) -> Optional[float]:
+        """Decimal-adjusted swap volume of `base`; None when nothing traded."""
+        base = (base or "").lower()
+        if base == self.token0:
+            return volume0 / 10 ** self.decimals0 if volume0 else None
+        if base == self.token1:
+            return volume1 / 10 ** self.decimals1 if volume1 else None
+        return None
+
+    def other(self, base: str) -> str:
+        return self.token1 if (base or "").lower() == self.token0 else self.token0
+
+
+def decode_sync(data: Any) -> Optional[Tuple[int, int]]:
+    h = str(data or "")
+    h = h[2:] if h.startswith("0x") else h
+    if len(h) < 128:
+        return None
+    return int(h[:64], 16), int(h[64:128], 16)
+
+
+def decode_swap(data: Any) -> Optional[Tuple[int, int]]:
+    """(token0 volume, token1 volume) of one Swap: amount0In + amount0Out, amount1In + amount1Out."""
+    h = str(data or "")
+    h = h[2:] if h.startswith("0x") else h
+    if len(h) < 256:
+        return None
+    a0in, a1in, a0out, a1out = (int(h[i:i + 64], 16) for i in range(0, 256, 64))
+    return a0in + a0out, a1in + a1out
+
+
+def fold_logs(logs: Iterable[Dict[str, Any]]) -> Dict[str, PairUpdate]:
+    """Last reserves and last swap per pair, in (block, logIndex) order."""
+    out: Dict[str, PairUpdate] = {}
+    for lg in sorted(logs, key=lambda x: (_int(x.get("blockNumber")), _int(x.get("logIndex")))):
+        topics = lg.get("topics") or []
+        if not topics:
+            continue
+        t0 = str(topics[0]).lower()
+        pair = str(lg.get("address") or "").lower()
+        n = _int(lg.get("blockNumber"))
+        upd = out.get(pair) or PairUpdate(pair=pair, block=n)
+        upd.block = n
+        if t0 == SYNC_TOPIC:
+            r = decode_sync(lg.get("data"))
+            if r:
+                upd.reserve0, upd.reserve1 = r
+        elif t0 == SWAP_TOPIC:
+            upd.swaps += 1
+            v = decode_swap(lg.get("data"))
+            if v:
+                upd.volume0 += v[0]
+                upd.volume1 += v[1]
+            upd.last_swap_tx = str(lg.get("transactionHash") or "").lower() or upd.last_swap_tx
+        else:
+            continue
+        out[pair] = upd
+    return out
+
+
+class PairFollower:
+    def __init__(self, client: Any, start_block: Optional[int] = None):
+        self.client = client
+        self.last_block = start_block
+        self._info: Dict[str, PairInfo] = {}
+        self.queries = 0
+
+    def poll(self, pairs: Iterable[str]) -> Dict[str, PairUpdate]:
+        """{pair_lower: PairUpdate} for tracked pairs with Sync/Swap events since the last poll."""
+        addrs = sorted({(p or "").lower() for p in pairs if p})
+        head = int(self.client.block_number())
+        if self.last_block is None:
+            self.last_block = head
+            return {}
+        start, end = self.last_block + 1, min(head, self.last_block + FOLLOW_MAX_BLOCKS)
+        if end < start:
+            return {}
+        if not addrs:
+            self.last_block = end
+            return {}
+        res = logscan.scan_logs(
+            self.client.get_logs, start, end, [[[SYNC_TOPIC, SWAP_TOPIC]]],
+            address=addrs, chunk=end - start + 1,
+        )
+        self.queries += res.requests
+        covered = res.covered_until
+        for fb, tb, err in res.gaps:
+            logger.debug("pair logs gap %s-%s: %s", fb, tb, err)
+        if covered < start:
+            return {}
+        self.last_block = covered
+        return fold_logs(lg for lg in res.logs if _int(lg.get("blockNumber")) <= covered)
+
+    def pair_info(self, pair: str) -> Optional[PairInfo]:
+        """token0/token1 and their decimals, read once (two small multicalls) and cached."""
+        pair = (pair or "").lower()
+        if pair in self._info:
+            return self._info[pair]
+        many = getattr(self.client, "eth_call_many", None)
+        t0, t1 = multicall.aggregate(
+            [(pair, "0x" + SEL_TOKEN0), (pair, "0x" + SEL_TOKEN1)], self.client.eth_call, eth_call_many=many
+        )
+        if not t0 or not t1 or len(t0) < 32 or len(t1) < 32:
+            return None
+        token0, token1 = "0x" + t0[12:32].hex(), "0x" + t1[12:32].hex()
+        d0, d1 = multicall.aggregate(
+            [(token0, "0x" + multicall.SEL_DECIMALS), (token1, "0x" + multicall.SEL_DECIMALS)],
+            self.client.eth_call, eth_call_many=many,
+        )
+        dec0, dec1 = multicall.decode_uint(d0), multicall.decode_uint(d1)
+        if dec0 is None or dec1 is None:
+            return None
+        info = PairInfo(token0, token1, dec0, dec1)
+        self._info[pair] = info
+        return info
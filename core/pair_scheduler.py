@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+core/pair_scheduler.py — adaptive per-pair poll intervals under a request budget.
+
+Every tracked pair has its own next-due time in a heap; the dex thread pops
+the pairs that are due, fetches them in one multi-pair sweep, reports what
+it saw with `observe()`, and sleeps until the next due time (`wait()`
+returns early when a pair is added or `wake()` is called).
+
+Interval per pair, from the last observation:
+- activity = max(alert proximity, volume share / 2), in [0, 1], where
+  alert proximity = max(|window move| / spike threshold,
+                        |tick move| / move threshold)
+  and volume share = h1 volume / DEX_ACTIVE_VOL_H1;
+- active pair:  interval = base * (1 - 0.8 * activity), not below min;
+- unchanged price and no h1 volume: the interval doubles with every idle
+  observation (base, 2*base, 4*base, ...) up to max;
+- a pair the API did not return backs off the same way.
+
+A token bucket caps HTTP requests at `budget` per minute. One request
+covers up to `chunk` pairs (Dexscreener's multi-pair endpoint). Due pairs
+beyond the budget stay queued and go first once the bucket refills. Extra
+requests a sweep makes (per-pair fallbacks) are taken from the same bucket
+with `spend()`; what it cannot afford is reported with `missed()`.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class PairScheduler:
+    def __init__(
+        self,
+        base_interval: float,
+        *,
+        min_interval: float = 10.0,
+        max_interval: float = 900.0,
+        budget_per_min: float = 60.0,
+        chunk: int = 30,
+        spike_threshold: float = 8.0,
+        move_threshold: float = 5.0,
+        active_vol_h1: float = 10000.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.base = max(1.0, float(base_interval))
+        self.min_interval = max(0.5, min(float(min_interval), self.base))
+        self.max_interval = max(float(max_interval), self.base)
+        self.budget = max(1.0, float(budget_per_min))
+        self.chunk = max(1, int(chunk))
+        self.spike_threshold = float(spike_threshold) or 1.0
+        self.move_threshold = float(move_threshold) or 1.0
+        self.active_vol_h1 = float(active_vol_h1) or 1.0
+        self.clock = clock
+        self._heap: List[Tuple[float, int, str]] = []
+        self._due: Dict[str, float] = {}
+        self._interval: Dict[str, float] = {}
+        self._idle: Dict[str, int] = {}
+        self._last_price: Dict[str, Optional[float]] = {}
+        self._seq = itertools.count()
+        self._tokens = self.budget
+        self._refill_at = clock()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    # ---------- membership ----------
+    def _push(self, slug: str, due: float) -> None:
+        self._due[slug] = due
+        heapq.heappush(self._heap, (due, next(self._seq), slug))
+
+    def add(self, slug: str) -> None:
+        """Track `slug`, due immediately (no-op if already tracked)."""
+        with self._lock:
+            if slug in self._interval:
+                return
+            self._interval[slug] = self.base
+            self._push(slug, self.clock())
+        self._wake.set()
+
+    def remove(self, slug: str) -> None:
+        with self._lock:
+            for d in (self._due, self._interval, self._idle, self._last_price):
+                d.pop(slug, None)  # its heap entry is skipped lazily
+
+    def sync(self, slugs: Iterable[str]) -> None:
+        want = set(slugs)
+        with self._lock:  # add() runs on other threads too
+            tracked = set(self._interval)
+        for s in tracked - want:
+            self.remove(s)
+        for s in sorted(want - tracked):
+            self.add(s)
+
+    def interval(self, slug: str) -> Optional[float]:
+        return self._interval.get(slug)
+
+    # ---------- budget ----------
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._refill_at)
+        self._tokens = min(self.budget, self._tokens + elapsed * self.budget / 60.0)
+        self._refill_at = now
+
+    def pop_due(self) -> List[str]:
+        """Pairs due now, as many as the request budget allows (oldest due first)."""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            cap = int(self._tokens) * self.chunk
+            out: List[str] = []
+            while self._heap and len(out) < cap:
+                due, _, slug = self._heap[0]
+                if self._due.get(slug) != due:
+                    heapq.heappop(self._heap)  # stale entry (rescheduled or removed)
+                    continue
+                if due > now:
+                    break
+                heapq.heappop(self._heap)
+                del self._due[slug]
+                out.append(slug)
+            self._tokens -= math.ceil(len(out) / self.chunk)
+            return out
+
+    def spend(self, requests: int) -> int:
+        """Take up to `requests` extra requests from the budget; returns how many were granted."""
+        with self._lock:
+            self._refill(self.clock())
+            granted = max(0, min(int(requests), int(self._tokens)))
+            self._tokens -= granted
+            return granted
+
+    def seconds_until_next(self) -> Optional[float]:
+        """Seconds until the next pair is due and affordable; None when nothing is tracked."""
+        with self._lock:
+            while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return None
+            now = self.clock()
+            self._refill(now)
+            wait = max(0.0, self._heap[0][0] - now)
+            if self._tokens < 1:
+                wait = max(wait, (1 - self._tokens) * 60.0 / self.budget)
+            return wait
+
+    def wait(self, default: float) -> None:
+        """Sleep until the next due pair (or `default` s when idle); add()/wake() cut it short."""
+        t = self.seconds_until_next()
+        self._wake.wait(default if t is None else t)
+        self._wake.clear()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    # ---------- feedback ----------
+    def _backoff(self, slug: str) -> float:
+        n = self._idle[slug] = self._idle.get(slug, 0) + 1
+        return min(self.max_interval, self.base * 2 ** n)
+
+    def observe(
+        self,
+        slug: str,
+        price: Optional[float],
+        vol_h1: Optional[float] = None,
+        move_pct: Optional[float] = None,
+        window_pct: Optional[float] = None,
+    ) -> float:
+        """Record a poll result for `slug` and schedule its next poll; returns the interval."""
+        with self._lock:
+            if slug not in self._interval:
+                return 0.0
+            prev = self._last_price.get(slug)
+            self._last_price[slug] = price
+            unchanged = price is None or (prev is not None and abs(price - prev) <= 1e-12 * max(abs(prev), 1.0))
+            if unchanged and not (vol_h1 and vol_h1 > 0):
+                iv = self._backoff(slug)
+            else:
+                self._idle[slug] = 0
+                proximity = max(
+                    abs(window_pct or 0.0) / self.spike_threshold,
+                    abs(move_pct or 0.0) / self.move_threshold,
+                )
+                volume = (vol_h1 or 0.0) / self.active_vol_h1
+                activity = min(1.0, max(proximity, 0.5 * min(1.0, volume)))
+                iv = max(self.min_interval, self.base * (1.0 - 0.8 * activity))
+            self._interval[slug] = iv
+            self._push(slug, self.clock() + iv)
+            return iv
+
+    def missed(self, slug: str) -> float:
+        """The pair was due but no data came back: back off like an idle pair."""
+        with self._lock:
+            if slug not in self._interval:
+                return 0.0
+            iv = self._interval[slug] = self._backoff(slug)
+            self._push(slug, self.clock() + iv)
+            return iv
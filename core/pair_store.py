@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+core/pair_store.py — compact per-pair state for the Dex monitor.
+
+A tracked pair used to be spread over several dicts (last price, last tx,
+price history, and the full Dexscreener pair JSON kept forever). Here a
+pair is one `PairState` with `__slots__`, holding only what the monitor
+reads from the Dexscreener payload (base symbol/address, h1 volume) plus its
+rolling price windows (core.rolling, array-backed).
+
+Pairs leave the store with `remove()` (e.g. /watch rm) or, unless pinned
+(seeded from DEX_PAIRS or added with /watch add), through `evict_stale()`
+once nothing has been heard from them for `stale_after` seconds.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from core.rolling import RollingStats
+
+PAIR_STALE_SEC = 6 * 3600
+
+
+class PairState:
+    __slots__ = ("slug", "symbol", "base_address", "vol_h1", "last_price", "last_tx", "last_seen", "pinned", "stats")
+
+    def __init__(self, slug: str, *, pinned: bool = False, now: Optional[float] = None):
+        self.slug = slug
+        self.symbol: Optional[str] = None
+        self.base_address: Optional[str] = None
+        self.vol_h1: Optional[float] = None
+        self.last_price: Optional[float] = None
+        self.last_tx: Optional[str] = None
+        self.last_seen = time.time() if now is None else now
+        self.pinned = pinned
+        self.stats = RollingStats()
+
+    def apply_meta(self, meta: Any) -> None:
+        """Keep the fields we use from a Dexscreener pair payload."""
+        if not isinstance(meta, dict):
+            return
+        bt = meta.get("baseToken") or {}
+        self.symbol = bt.get("symbol") or self.symbol
+        self.base_address = (bt.get("address") or "").lower() or self.base_address
+        try:
+            self.vol_h1 = float((meta.get("volume") or {}).get("h1") or 0)
+        except (TypeError, ValueError):
+            pass
+
+
+class PairStore:
+    def __init__(self, stale_after: float = PAIR_STALE_SEC, clock: Callable[[], float] = time.time):
+        self.stale_after = float(stale_after)
+        self.clock = clock
+        self._pairs: Dict[str, PairState] = {}
+        self._lock = threading.Lock()
+
+    def add(self, slug: str, meta: Any = None, *, pinned: bool = False) -> Optional[PairState]:
+        """New PairState for `slug`, or None if it is already tracked (then only `pinned` can be raised)."""
+        with self._lock:
+            st = self._pairs.get(slug)
+            if st is not None:
+                st.pinned = st.pinned or pinned
+                return None
+            st = self._pairs[slug] = PairState(slug, pinned=pinned, now=self.clock())
+        st.apply_meta(meta)
+        return st
+
+    def get(self, slug: str) -> Optional[PairState]:
+        return self._pairs.get(slug)
+
+    def remove(self, slug: str) -> bool:
+        with self._lock:
+            return self._pairs.pop(slug, None) is not None
+
+    def touch(self, slug: str) -> None:
+        st = self._pairs.get(slug)
+        if st is not None:
+            st.last_seen = self.clock()
+
+    def evict_stale(self) -> List[str]:
+        """Drop unpinned pairs not heard from for `stale_after` seconds; returns their slugs."""
+        cutoff = self.clock() - self.stale_after
+        with self._lock:
+            gone = [s for s, st in self._pairs.items() if not st.pinned and st.last_seen < cutoff]
+            for s in gone:
+                del self._pairs[s]
+        return gone
+
+    def __contains__(self, slug: object) -> bool:
+        return slug in self._pairs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._pairs))
+
+    def __len__(self) -> int:
+        return len(self._pairs)
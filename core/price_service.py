@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+core/price_service.py — one USD price cache for every caller, stale-while-revalidate.
+
+main.get_price_usd, core.pricing.get_spot_usd and the ledger-history
+fallback all resolve through `get_service()`:
+
+- fresh entry (younger than PRICE_FRESH_TTL)   -> returned as is;
+- stale entry (younger than PRICE_STALE_TTL)   -> returned immediately and a
+  background refresh is queued (deduplicated per key);
+- missing / expired                            -> resolved synchronously
+  (on-chain reserves via core.reserve_pricing, then Dexscreener /
+  CoinGecko), then the last ledger price as a fallback;
+- no price found                               -> remembered as a failure for
+  PRICE_NEGATIVE_TTL, so unpriceable spam tokens are not searched every call.
+
+Concurrent misses for one key share a single lookup (core.singleflight).
+
+Keys the bot holds or watches are registered with `track()`; a daemon thread
+re-prices them every PRICE_REFRESH_SEC (addresses from one reserves
+multicall, leftovers in one bulk Dexscreener call per 30 tokens), so their
+entries never get old enough to block a caller. A tracked key that is not
+touched again for PRICE_TRACK_TTL drops out of the refresh set.
+
+Every price fetched is passed to `on_price(key, price, ts)` (get_service()
+feeds core.candles), and `recent(key)` (the newest candle close) is tried
+before the last ledger price when nothing else prices a key.
+
+Entries, history and the tracked set are bounded core.cache.TTLCache
+instances (PRICE_CACHE_MAX keys each, LRU eviction).
+
+Keys: contract addresses lower-case, symbols lower-case with wrapper
+aliases folded (tcro/wcro -> cro).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from core import candles, dexscreener, reserve_pricing, singleflight
+from core.cache import TTLCache
+
+logger = logging.getLogger("core.price_service")
+
+PRICE_FRESH_TTL = float(os.getenv("PRICE_FRESH_TTL", "60") or 60)
+PRICE_STALE_TTL = float(os.getenv("PRICE_STALE_TTL", "900") or 900)
+PRICE_REFRESH_SEC = float(os.getenv("PRICE_REFRESH_SEC", "30") or 30)
+PRICE_TRACK_TTL = float(os.getenv("PRICE_TRACK_TTL", "3600") or 3600)
+PRICE_NEGATIVE_TTL = float(os.getenv("PRICE_NEGATIVE_TTL", "300") or 300)
+CANDLE_FALLBACK_AGE = float(os.getenv("CANDLE_FALLBACK_AGE", "21600") or 21600)  # newest candle close usable as a fallback
+PRICE_CACHE_MAX = max(16, int(os.getenv("PRICE_CACHE_MAX", "4096") or 4096))
+
+ALIASES = {
+    "tcro": "cro", "wcro": "cro", "w-cro": "cro", "wrappedcro": "cro",
+    "wrapped cro": "cro", "wcro-receipt": "cro",
+}
+
+Resolver = Callable[[str], Optional[float]]
+BulkResolver = Callable[[List[str]], Dict[str, Optional[float]]]
+
+
+def norm_key(symbol_or_addr: Any) -> str:
+    k = str(symbol_or_addr or "").strip().lower()
+    return ALIASES.get(k, k)
+
+
+def is_address(key: str) -> bool:
+    return key.startswith("0x") and len(key) == 42
+
+
+def _positive(p: Any) -> Optional[float]:
+    try:
+        p = float(p)
+    except (TypeError, ValueError):
+        return None
+    return p if p > 0 else None
+
+
+def _onchain(addrs: List[str]) -> Dict[str, Optional[float]]:
+    """Reserve-based prices (core.reserve_pricing); {} when disabled or the RPC read fails."""
+    pricer = reserve_pricing.get_pricer()
+    if pricer is None or not addrs:
+        return {}
+    try:
+        return pricer.prices(addrs)
+    except Exception as e:
+        logger.debug("on-chain pricing failed: %s", e)
+        return {}
+
+
+def default_bulk(addrs: List[str]) -> Dict[str, Optional[float]]:
+    """On-chain reserves for every address in one multicall; Dexscreener bulk for the rest."""
+    out = {a: p for a, p in _onchain(addrs).items() if _positive(p) is not None}
+    rest = [a for a in addrs if a not in out]
+    if rest:
+        out.update(dexscreener.best_prices(rest))
+    return out
+
+
+def default_resolver(key: str) -> Optional[float]:
+    """One lookup for a normalized key: on-chain reserves, then Dexscreener; CoinGecko for known symbols."""
+    from core import pricing  # lazy: core.pricing routes through this module
+
+    if is_address(key):
+        return _positive(_onchain([key]).get(key)) or dexscreener.price_for_address(key)
+    coin_id = pricing._cg_id_for_symbol(key)
+    if key == "cro":
+        p = _positive(_onchain([reserve_pricing.WCRO_ADDRESS]).get(reserve_pricing.WCRO_ADDRESS))
+        if p is None:
+            p = _positive(dexscreener.price_cro())
+        if p is None and coin_id:
+            p = _positive(pricing._cg_simple_price(coin_id))
+        return p
+    if coin_id:
+        p = _positive(pricing._cg_simple_price(coin_id))
+        if p is not None:
+            return p
+    return dexscreener.price_for_symbol(key)
+
+
+def _failed(entry: Tuple[Optional[float], float]) -> bool:
+    return entry[0] is None
+
+
+class PriceService:
+    def __init__(
+        self,
+        resolver: Optional[Resolver] = None,
+        bulk: Optional[BulkResolver] = None,
+        *,
+        fresh_ttl: float = PRICE_FRESH_TTL,
+        stale_ttl: float = PRICE_STALE_TTL,
+        negative_ttl: float = PRICE_NEGATIVE_TTL,
+        refresh_interval: float = PRICE_REFRESH_SEC,
+        track_ttl: float = PRICE_TRACK_TTL,
+        maxsize: int = PRICE_CACHE_MAX,
+        background: bool = True,
+        clock: Callable[[], float] = time.time,
+        on_price: Optional[Callable[[str, float, float], None]] = None,
+        recent: Optional[Callable[[str], Optional[float]]] = None,
+    ):
+        self.resolver = resolver or default_resolver
+        self.bulk = bulk or default_bulk
+        self.fresh_ttl = float(fresh_ttl)
+        self.stale_ttl = max(float(stale_ttl), self.fresh_ttl)
+        self.refresh_interval = float(refresh_interval)
+        self.background = background
+        self.clock = clock
+        self.on_price = on_price
+        self.recent = recent
+        # key -> (price or None, fetched_at)
+        self._entries = TTLCache(maxsize, self.stale_ttl, float(negative_ttl), is_negative=_failed, clock=clock)
+        self._history = TTLCache(maxsize, None, clock=clock)
+        self._tracked = TTLCache(maxsize, float(track_ttl), clock=clock)
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"fresh": 0, "stale": 0, "miss": 0, "failed": 0, "refreshed": 0}
+
+    # ---------- cache ----------
+    def _store(self, key: str, price: Optional[float], now: Optional[float] = None) -> None:
+        price, now = _positive(price), self.clock() if now is None else now
+        self._entries.set(key, (price, now))
+        if price is not None and self.on_price is not None:
+            try:
+                self.on_price(key, price, now)
+            except Exception as e:
+                logger.debug("on_price %s failed: %s", key, e)
+
+    def peek(self, symbol_or_addr: Any) -> Optional[float]:
+        """Cached price (fresh or stale) without any network call."""
+        return self._entries.peek(norm_key(symbol_or_addr), (None, 0.0))[0]
+
+    def get(self, symbol_or_addr: Any, symbol_hint: Optional[str] = None) -> Optional[float]:
+        key = norm_key(symbol_or_addr)
+        if not key:
+            return None
+        now = self.clock()
+        hit, entry = self._entries.lookup(key)
+        if hit:
+            price, ts = entry
+            if price is None:
+                self.stats["failed"] += 1
+                return self.history_price(key, symbol_hint)
+            if now - ts < self.fresh_ttl:
+                self.stats["fresh"] += 1
+                return price
+            self.stats["stale"] += 1
+            self._schedule([key])
+            return price
+        self.stats["miss"] += 1
+        price = self._resolve(key)
+        self._store(key, price, now)
+        return price if price is not None else self.history_price(key, symbol_hint)
+
+    def _resolve(self, key: str) -> Optional[float]:
+        """Resolver call shared by every thread asking for `key` at the same time."""
+        return singleflight.do(("price", id(self), key), lambda: self._resolve_once(key))
+
+    def _resolve_once(self, key: str) -> Optional[float]:
+        try:
+            return _positive(self.resolver(key))
+        except Exception as e:
+            logger.debug("price resolve %s failed: %s", key, e)
+            return None
+
+    def prefetch(self, addrs: Iterable[Any]) -> int:
+        """Bulk-price addresses without a fresh price or a cached failure; returns how many got one."""
+        now = self.clock()
+        todo: List[str] = []
+        for a in addrs or []:
+            k = norm_key(a)
+            if not is_address(k) or k in todo:
+                continue
+            entry = self._entries.peek(k)
+            if entry and (entry[0] is None or now - entry[1] < self.fresh_ttl):
+                continue
+            todo.append(k)
+        return len(self._bulk_store(todo))
+
+    def _bulk_store(self, addrs: List[str]) -> Set[str]:
+        """Store every positive bulk price; returns the keys that got one."""
+        if not addrs:
+            return set()
+        try:
+            prices = singleflight.do(("price_bulk", id(self), tuple(addrs)), lambda: self.bulk(addrs)) or {}
+        except Exception as e:
+            logger.debug("bulk price fetch failed: %s", e)
+            return set()
+        priced, now = set(), self.clock()
+        for a, p in prices.items():
+            if _positive(p) is not None:
+                self._store(a, p, now)
+                priced.add(a)
+        return priced
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {"service": dict(self.stats), "entries": self._entries.stats()}
+
+    # ---------- history fallback ----------
+    def record_history(self, key: Any, price: Any) -> None:
+        k, p = norm_key(key), _positive(price)
+        if k and p is not None:
+            self._history.set(k, p)
+
+    def history_price(self, key: Any, symbol_hint: Optional[str] = None) -> Optional[float]:
+        k = norm_key(key)
+        if self.recent is not None:
+            try:
+                p = _positive(self.recent(k))
+            except Exception:
+                p = None
+            if p is not None:
+                return p
+        if is_address(k):
+            p = self._history.get(k)
+            if p:
+                return p
+        return self._history.get(norm_key(symbol_hint or k))
+
+    # ---------- background refresh ----------
+    def track(self, keys: Iterable[Any]) -> None:
+        """Keep these keys warm for the next PRICE_TRACK_TTL seconds."""
+        for k in keys or []:
+            k = norm_key(k)
+            if k:
+                self._tracked.set(k, True)
+        self._ensure_thread()
+
+    def tracked(self) -> List[str]:
+        return sorted(k for k, _ in self._tracked.items())
+
+    def _schedule(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self._pending.update(keys)
+            self._wake.notify()
+        self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        if not self.background or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="price-refresh", daemon=True)
+            self._thread.start()
+
+    def due_keys(self) -> List[str]:
+        """Queued stale keys plus tracked keys older than one refresh interval.
+
+        A tracked key whose last lookup failed waits out PRICE_NEGATIVE_TTL
+        like any other caller instead of being retried every interval.
+        """
+        now = self.clock()
+        due = set()
+        for k in self.tracked():
+            price, ts = self._entries.peek(k, (0.0, 0.0))  # missing / expired: (0.0, 0.0), due
+            if price is not None and now - ts >= self.refresh_interval:
+                due.add(k)
+        with self._lock:
+            due |= self._pending
+            self._pending.clear()
+        return sorted(due)
+
+    def refresh(self, keys: Iterable[str]) -> int:
+        """Re-price keys now (addresses in bulk first); returns how many were stored."""
+        keys = list(keys)
+        priced = self._bulk_store([k for k in keys if is_address(k)])
+        got = len(priced)
+        for k in keys:
+            if k in priced:
+                continue
+            price = self._resolve(k)
+            if price is not None or self.peek(k) is None:
+                self._store(k, price)  # a failed refresh keeps the last good price
+            got += price is not None
+        self.stats["refreshed"] += got
+        return got
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._wake.wait(self.refresh_interval)
+            try:
+                keys = self.due_keys()
+                if keys:
+                    self.refresh(keys)
+            except Exception as e:
+                logger.debug("price refresh failed: %s", e)
+
+
+_default: Optional[PriceService] = None
+_default_lock = threading.Lock()
+
+
+def get_service() -> PriceService:
+    """Process-wide price service."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                store = candles.get_store()
+                _default = PriceService(
+                    on_price=store.record if store else None,
+                    recent=(lambda k: store.recent_price(k, CANDLE_FALLBACK_AGE)) if store else None,
+                )
+    return _default
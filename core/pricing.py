@@ -5,24 +5,23 @@ core/pricing.py — Spot USD pricing helpers for holdings snapshot.
 API used by core/holdings.py:
 - get_spot_usd(symbol: str, token_address: str | None = None) -> Decimal | None
 - (optional) get_symbol_for_address(address: str) -> str | None
+- prefetch_spot_usd(addresses) -> int   (bulk warm-up before pricing many tokens)
 
 Strategy:
 1) Normalize wrappers (tCRO/WCRO -> CRO).
-2) CoinGecko Simple Price (primary; symbol->id map).
-3) Fallback: Dexscreener by token_address (Cronos-friendly).
-4) In-process cache to limit calls.
+2) Symbols with a CoinGecko id (and CRO) are priced by symbol, anything else
+   by token_address (Dexscreener, Cronos-friendly).
+3) All lookups go through core.price_service: one shared cache with main.py,
+   stale values served immediately while a background refresh runs.
 """
 
 from __future__ import annotations
-import os
-import time
 from decimal import Decimal, InvalidOperation
-from typing import Optional, Dict, Any, List
+from typing import Optional, Iterable
 
 import requests
 
-_PRICE_CACHE: Dict[str, tuple[float, Decimal]] = {}
-_CACHE_TTL = float(os.getenv("PRICING_CACHE_TTL", "60"))
+from core.price_service import get_service
 
 _COINGECKO_IDS = {
     "CRO": "crypto-com-chain",
@@ -40,9 +39,6 @@ _COINGECKO_IDS = {
     # add more symbols here as you need them
 }
 
-def _now() -> float:
-    return time.time()
-
 def _to_decimal(x: object) -> Optional[Decimal]:
     if isinstance(x, Decimal):
         return x
@@ -57,18 +53,6 @@ def _norm_symbol(symbol: str) -> str:
         return "CRO"
     return s or "?"
 
-def _cache_get(key: str) -> Optional[Decimal]:
-    hit = _PRICE_CACHE.get(key)
-    if not hit:
-        return None
-    ts, val = hit
-    if (_now() - ts) <= _CACHE_TTL:
-        return val
-    return None
-
-def _cache_set(key: str, val: Decimal) -> None:
-    _PRICE_CACHE[key] = (_now(), val)
-
 def _cg_simple_price(coin_id: str) -> Optional[Decimal]:
     try:
         r = requests.get(
@@ -87,31 +71,19 @@ def _cg_simple_price(coin_id: str) -> Optional[Decimal]:
 def _cg_id_for_symbol(symbol: str) -> Optional[str]:
     return _COINGECKO_IDS.get(symbol.upper())
 
-def _dex_price_by_token_address(token_address: str) -> Optional[Decimal]:
-    if not token_address:
-        return None
-    cached = _cache_get(f"addr:{token_address.lower()}")
-    if cached is not None:
-        return cached
-    try:
-        url = f"https://api.dexscreener.com/latest/dex/tokens/{token_address}"
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-        pairs: List[Dict[str, Any]] = data.get("pairs") or []
-        if not pairs:
-            return None
-        candidates = [p for p in pairs if p.get("priceUsd")]
-        if not candidates:
-            return None
-        best = max(candidates, key=lambda p: float(p.get("liquidity", {}).get("usd", 0.0)))
-        price = _to_decimal(best.get("priceUsd"))
-        if price is not None:
-            _cache_set(f"addr:{token_address.lower()}", price)
-        return price
-    except Exception:
-        return None
+def prefetch_spot_usd(token_addresses: Iterable[Optional[str]]) -> int:
+    """
+    Warm the shared price cache for many tokens at once (core.dexscreener
+    multi-token endpoint, 30 per call) and keep them on the background
+    refresh list, since callers pass the tokens being held. Returns how many
+    got a price; the rest still go through the per-token lookup in get_spot_usd.
+    """
+    addrs = [a.lower() for a in token_addresses if a]
+    if not addrs:
+        return 0
+    svc = get_service()
+    svc.track(addrs)
+    return svc.prefetch(addrs)
 
 def get_symbol_for_address(address: str) -> Optional[str]:
     # Optional mapping (not maintained here)
@@ -119,19 +91,11 @@ def get_symbol_for_address(address: str) -> Optional[str]:
 
 def get_spot_usd(symbol: str, token_address: Optional[str] = None) -> Optional[Decimal]:
     sym = _norm_symbol(symbol)
+    svc = get_service()
 
-    cached = _cache_get(f"sym:{sym}")
-    if cached is not None:
-        return cached
-
-    price: Optional[Decimal] = None
-    coin_id = _cg_id_for_symbol(sym)
-    if coin_id:
-        price = _cg_simple_price(coin_id)
-
+    price = None
+    if sym == "CRO" or _cg_id_for_symbol(sym):
+        price = svc.get(sym)
     if price is None and token_address:
-        price = _dex_price_by_token_address(token_address)
-
-    if price is not None:
-        _cache_set(f"sym:{sym}", price)
-    return price
+        price = svc.get(token_address.lower(), symbol_hint=sym)
+    return _to_decimal(price) if price is not None else None
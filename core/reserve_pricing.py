@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+core/reserve_pricing.py — USD prices from on-chain UniswapV2-style pair reserves.
+
+For each token the pricer finds its pairs against WCRO and against a USD
+stablecoin on the configured V2 factories (VVS by default), then prices it
+from `getReserves()`:
+
+    token/WCRO pair   price = (reserve_wcro / reserve_token) * CRO_USD
+    token/stable pair price =  reserve_stable / reserve_token
+    CRO_USD                 = reserve_stable / reserve_wcro of the WCRO/stable pair
+
+Reserves are scaled by each token's decimals. When a token has several
+pairs, the one with the deepest quote-side liquidity wins (the same rule as
+Dexscreener's pick_best_pair). Pairs with less than ONCHAIN_MIN_LIQ_USD on
+the quote side give no price, because thin pools are easy to skew.
+
+Every tick is one Multicall3 `aggregate3` eth_call (core.multicall). It
+holds getReserves for every pair involved plus Multicall3's
+getBlockNumber(), so all prices in a tick come from the same block
+(`last_block`). Pair addresses, token ordering and decimals are static and
+are discovered once, in one more multicall per batch of new tokens (getPair
+per factory/quote plus decimals). token0 is derived locally from address
+order. Tokens without a usable pair return None; callers fall back to
+Dexscreener.
+
+Env: ONCHAIN_PRICING (1/0), DEX_V2_FACTORIES (comma list), WCRO_ADDRESS,
+USD_STABLE_ADDRESS, ONCHAIN_MIN_LIQ_USD.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core import multicall
+from core.cache import TTLCache
+
+logger = logging.getLogger("core.reserve_pricing")
+
+ONCHAIN_PRICING = os.getenv("ONCHAIN_PRICING", "1").strip().lower() not in ("0", "false", "no", "off", "")
+WCRO_ADDRESS = (os.getenv("WCRO_ADDRESS") or "0x5C7F8A570d578ED84E63fdFA7b1eE72dEae1AE23").strip().lower()
+USD_STABLE_ADDRESS = (os.getenv("USD_STABLE_ADDRESS") or "0xc21223249CA28397B4B6541dfFaEcC539BfF0c59").strip().lower()
+DEX_V2_FACTORIES = [
+    f.strip().lower()
+    for f in (os.getenv("DEX_V2_FACTORIES") or "0x3B44B2a187a7b3824131F8db5a74194D0a42Fc15").split(",")
+    if f.strip()
+]
+ONCHAIN_MIN_LIQ_USD = float(os.getenv("ONCHAIN_MIN_LIQ_USD", "5000") or 5000)
+PAIR_RECHECK_SEC = 6 * 3600  # tokens without a pair are looked up again after this
+
+SEL_GET_PAIR = "e6a43905"       # getPair(address,address)
+SEL_GET_RESERVES = "0902f1ac"   # getReserves()
+SEL_BLOCK_NUMBER = "42cbb15c"   # Multicall3.getBlockNumber()
+
+_ZERO = "0x" + "0" * 40
+
+Pair = Tuple[str, str]  # (pair address, quote token)
+
+
+def get_pair_data(a: str, b: str) -> str:
+    return "0x" + SEL_GET_PAIR + multicall.encode_address(a) + multicall.encode_address(b)
+
+
+def decode_address(data: Optional[bytes]) -> Optional[str]:
+    if not data or len(data) < 32:
+        return None
+    addr = "0x" + data[12:32].hex()
+    return None if addr == _ZERO else addr
+
+
+def decode_reserves(data: Optional[bytes]) -> Optional[Tuple[int, int]]:
+    if not data or len(data) < 64:
+        return None
+    return int.from_bytes(data[:32], "big"), int.from_bytes(data[32:64], "big")
+
+
+def _norm(addr: Any) -> Optional[str]:
+    a = str(addr or "").strip().lower()
+    return a if a.startswith("0x") and len(a) == 42 else None
+
+
+class ReservePricer:
+    def __init__(
+        self,
+        client: Any,
+        *,
+        factories: Sequence[str] = DEX_V2_FACTORIES,
+        wcro: str = WCRO_ADDRESS,
+        stable: str = USD_STABLE_ADDRESS,
+        min_liq_usd: float = ONCHAIN_MIN_LIQ_USD,
+        multicall_address: Optional[str] = None,
+    ):
+        self.client = client
+        self.factories = [f.lower() for f in factories]
+        self.wcro = wcro.lower()
+        self.stable = stable.lower()
+        self.min_liq_usd = float(min_liq_usd)
+        self.multicall_address = multicall.MULTICALL_ADDRESS if multicall_address is None else multicall_address
+        # token -> [(pair, quote), ...]; an empty list (no pair) is re-checked after PAIR_RECHECK_SEC
+        self._pairs = TTLCache(16384, ttl=None, negative_ttl=PAIR_RECHECK_SEC, is_negative=lambda v: not v)
+        self._decimals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.last_block: Optional[int] = None
+        self.calls = 0
+
+    def _aggregate(self, calls: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        self.calls += 1
+        return multicall.aggregate(
+            calls,
+            self.client.eth_call,
+            eth_call_many=getattr(self.client, "eth_call_many", None),
+            multicall_address=self.multicall_address,
+            batch_size=max(1, len(calls)),
+        )
+
+    # ---------- discovery (static data, cached) ----------
+    def _discover(self, tokens: List[str]) -> None:
+        todo = [t for t in tokens if t not in self._pairs]
+        need_dec = [t for t in {*todo, self.wcro, self.stable} if t not in self._decimals]
+        if not todo and not need_dec:
+            return
+        calls: List[Tuple[str, str]] = []
+        slots: List[Tuple[str, str, str]] = []  # (kind, token, quote)
+        for t in todo:
+            for f in self.factories:
+                for q in (self.wcro, self.stable):
+                    if q != t:
+                        calls.append((f, get_pair_data(t, q)))
+                        slots.append(("pair", t, q))
+        for t in need_dec:
+            calls.append((t, "0x" + multicall.SEL_DECIMALS))
+            slots.append(("dec", t, ""))
+        found: Dict[str, List[Pair]] = {t: [] for t in todo}
+        failed: set = set()
+        for (kind, t, q), data in zip(slots, self._aggregate(calls)):
+            if kind == "dec":
+                dec = multicall.decode_uint(data)
+                if dec is not None and 0 <= dec <= 36:
+                    self._decimals[t] = dec
+            elif not data or len(data) < 32:
+                failed.add(t)  # RPC error, not "no pair": leave uncached so the next tick retries
+            else:
+                pair = decode_address(data)
+                if pair and (pair, q) not in found[t]:
+                    found[t].append((pair, q))
+        for t, pairs in found.items():
+            if t not in failed:
+                self._pairs.set(t, pairs)
+
+    # ---------- pricing ----------
+    def _scaled(self, pair_token: str, quote: str, reserves: Tuple[int, int]) -> Optional[Tuple[float, float]]:
+        """(token amount, quote amount) of a pair, decimal-adjusted; token0 is the lower address."""
+        dt, dq = self._decimals.get(pair_token), self._decimals.get(quote)
+        if dt is None or dq is None:
+            return None
+        r0, r1 = reserves
+        rt, rq = (r0, r1) if pair_token < quote else (r1, r0)
+        if rt <= 0 or rq <= 0:
+            return None
+        return rt / 10 ** dt, rq / 10 ** dq
+
+    def _best(
+        self,
+        token: str,
+        reserves: Dict[str, Tuple[int, int]],
+        cro_usd: Optional[float],
+    ) -> Optional[Tuple[float, float]]:
+        """(price_usd, quote liquidity usd) of the deepest usable pair."""
+        best: Optional[Tuple[float, float]] = None
+        for pair, quote in self._pairs.peek(token) or []:
+            r = reserves.get(pair)
+            amounts = self._scaled(token, quote, r) if r else None
+            if not amounts:
+                continue
+            rt, rq = amounts
+            quote_usd = 1.0 if quote == self.stable else cro_usd
+            if not quote_usd:
+                continue
+            price, liq = rq / rt * quote_usd, rq * quote_usd
+            if best is None or liq > best[1]:
+                best = (price, liq)
+        return best
+
+    def prices(self, tokens: Iterable[str]) -> Dict[str, Optional[float]]:
+        """{token_lower: USD price or None}, one multicall (plus one-off discovery)."""
+        toks: List[str] = []
+        for t in tokens or []:
+            n = _norm(t)
+            if n and n not in toks:
+                toks.append(n)
+        if not toks:
+            return {}
+        with self._lock:
+            self._discover(toks + [self.wcro])
+            pairs = sorted({p for t in toks + [self.wcro] for p, _ in self._pairs.peek(t) or []})
+            if not pairs:
+                return {t: None for t in toks}
+            calls = [(p, "0x" + SEL_GET_RESERVES) for p in pairs]
+            if self.multicall_address:
+                calls.append((self.multicall_address, "0x" + SEL_BLOCK_NUMBER))
+            res = self._aggregate(calls)
+            reserves = {p: r for p, r in zip(pairs, (decode_reserves(d) for d in res)) if r}
+            if self.multicall_address:
+                self.last_block = multicall.decode_uint(res[-1]) or self.last_block
+
+            cro = self._best(self.wcro, reserves, None)  # only the WCRO/stable pair is usable here
+            cro_usd = cro[0] if cro and cro[1] >= self.min_liq_usd else None
+            out: Dict[str, Optional[float]] = {}
+            for t in toks:
+                if t == self.wcro:
+                    out[t] = cro_usd
+                    continue
+                best = self._best(t, reserves, cro_usd)
+                out[t] = best[0] if best and best[1] >= self.min_liq_usd else None
+            return out
+
+    def price_cro(self) -> Optional[float]:
+        return self.prices([self.wcro]).get(self.wcro)
+
+
+_default: Optional[ReservePricer] = None
+_default_lock = threading.Lock()
+
+
+def get_pricer() -> Optional[ReservePricer]:
+    """Process-wide pricer on the shared RPC client; None when disabled or no RPC is configured."""
+    global _default
+    if not ONCHAIN_PRICING:
+        return None
+    if _default is None:
+        from core import rpc_client
+
+        if not rpc_client.default_rpc_url():
+            return None
+        with _default_lock:
+            if _default is None:
+                _default = ReservePricer(rpc_client.get_client())
+    return _default
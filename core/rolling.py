@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+core/rolling.py — time-windowed rolling price statistics.
+
+`RollingStats` keeps several windows defined by age, not by sample count
+(default 1m / 5m / 15m / 1h). Each `RollingWindow` answers in O(1):
+
+    first / last          oldest and newest price inside the window
+    min / max             via monotonic deques (amortized O(1) per sample)
+    vwap                  sum(price * volume) / sum(volume) over samples that
+                          carried a volume (None when none did)
+    change_pct()          last vs first
+    swing_pct()           largest move of the last price against the window
+                          extreme behind it: +x% above the min or -y% below
+                          the max, whichever is larger in size
+
+Storage is compact: the samples live once per pair in a ring buffer of three
+parallel `array('d')` columns (timestamp, price, volume), shared by all
+windows; a window is just the sequence number of its first sample plus two
+monotonic deques of sequence numbers in `array('q')` rings. The ring starts
+at 8 slots and doubles while the longest window still needs its oldest
+sample, up to ROLLING_MAX_SAMPLES; past that the oldest samples are
+overwritten and the longest windows see a shorter history.
+
+Samples older than the window span are evicted when the next sample arrives,
+or on any read with `now=`. Timestamps must be non-decreasing per window.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from array import array
+from typing import Dict, Iterable, Mapping, Optional
+
+WINDOWS: Dict[str, float] = {"1m": 60.0, "5m": 300.0, "15m": 900.0, "1h": 3600.0}
+ROLLING_MAX_SAMPLES = max(8, int(os.getenv("ROLLING_MAX_SAMPLES", "1024") or 1024))
+
+
+class _Ring:
+    """Samples by sequence number; seq `i` lives at slot `i % cap`, the last `cap` are kept."""
+
+    __slots__ = ("cap", "max_cap", "ts", "px", "vol", "end")
+
+    def __init__(self, cap: int = 8, max_cap: int = ROLLING_MAX_SAMPLES):
+        self.max_cap = max(1, int(max_cap))
+        self.cap = min(max(1, int(cap)), self.max_cap)
+        self.ts = array("d", bytes(8 * self.cap))
+        self.px = array("d", bytes(8 * self.cap))
+        self.vol = array("d", bytes(8 * self.cap))
+        self.end = 0  # next sequence number
+
+    @property
+    def oldest(self) -> int:
+        return max(0, self.end - self.cap)
+
+    def full(self) -> bool:
+        return self.end - self.oldest >= self.cap
+
+    def reserve(self, keep_from: int) -> None:
+        """Grow (doubling) when the next push would overwrite a sample at or after `keep_from`."""
+        if self.end - keep_from < self.cap or self.cap >= self.max_cap:
+            return
+        new = min(self.max_cap, self.cap * 2)
+        cols = []
+        for col in (self.ts, self.px, self.vol):
+            out = array("d", bytes(8 * new))
+            for s in range(self.oldest, self.end):
+                out[s % new] = col[s % self.cap]
+            cols.append(out)
+        self.ts, self.px, self.vol = cols
+        self.cap = new
+
+    def push(self, ts: float, price: float, volume: float) -> int:
+        seq = self.end
+        i = seq % self.cap
+        self.ts[i] = ts
+        self.px[i] = price
+        self.vol[i] = volume
+        self.end = seq + 1
+        return seq
+
+
+class _SeqDeque:
+    """Deque of sequence numbers in an array('q') ring that doubles when full."""
+
+    __slots__ = ("buf", "head", "size")
+
+    def __init__(self, cap: int = 4):
+        self.buf = array("q", bytes(8 * cap))
+        self.head = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def first(self) -> int:
+        return self.buf[self.head]
+
+    def last(self) -> int:
+        return self.buf[(self.head + self.size - 1) % len(self.buf)]
+
+    def append(self, seq: int) -> None:
+        n = len(self.buf)
+        if self.size == n:
+            self.buf = array("q", [self.buf[(self.head + k) % n] for k in range(n)] + [0] * n)
+            self.head, n = 0, 2 * n
+        self.buf[(self.head + self.size) % n] = seq
+        self.size += 1
+
+    def pop(self) -> None:
+        self.size -= 1
+
+    def popleft(self) -> None:
+        self.head = (self.head + 1) % len(self.buf)
+        self.size -= 1
+
+
+class RollingWindow:
+    __slots__ = ("span", "ring", "start", "_min", "_max", "_pv", "_v")
+
+    def __init__(self, span: float, ring: Optional[_Ring] = None):
+        self.span = float(span)
+        self.ring = ring if ring is not None else _Ring()
+        self.start = self.ring.end  # seq of the oldest sample inside the window
+        self._min = _SeqDeque()  # seqs with increasing prices
+        self._max = _SeqDeque()  # seqs with decreasing prices
+        self._pv = 0.0
+        self._v = 0.0
+
+    def _drop_before(self, seq: int) -> None:
+        r = self.ring
+        while self.start < seq:
+            i = self.start % r.cap
+            v = r.vol[i]
+            if v:
+                self._pv -= r.px[i] * v
+                self._v -= v
+            self.start += 1
+        while self._min.size and self._min.first() < seq:
+            self._min.popleft()
+        while self._max.size and self._max.first() < seq:
+            self._max.popleft()
+        if self.start >= r.end:
+            self._pv = self._v = 0.0  # drop accumulated float error
+
+    def _evict(self, now: float) -> None:
+        r = self.ring
+        cutoff = now - self.span
+        seq = self.start
+        while seq < r.end and r.ts[seq % r.cap] < cutoff:
+            seq += 1
+        if seq != self.start:
+            self._drop_before(seq)
+
+    def _admit(self, seq: int) -> None:
+        r = self.ring
+        i = seq % r.cap
+        price, v = r.px[i], r.vol[i]
+        if v:
+            self._pv += price * v
+            self._v += v
+        while self._min.size and r.px[self._min.last() % r.cap] >= price:
+            self._min.pop()
+        self._min.append(seq)
+        while self._max.size and r.px[self._max.last() % r.cap] <= price:
+            self._max.pop()
+        self._max.append(seq)
+
+    def add(self, ts: float, price: float, volume: Optional[float] = None) -> None:
+        _add(self.ring, (self,), ts, price, volume)
+
+    def refresh(self, now: Optional[float] = None) -> "RollingWindow":
+        if now is not None:
+            self._evict(now)
+        return self
+
+    def __len__(self) -> int:
+        return self.ring.end - self.start
+
+    def _px(self, seq: int) -> float:
+        return self.ring.px[seq % self.ring.cap]
+
+    @property
+    def first(self) -> Optional[float]:
+        return self._px(self.start) if len(self) else None
+
+    @property
+    def last(self) -> Optional[float]:
+        return self._px(self.ring.end - 1) if len(self) else None
+
+    @property
+    def min(self) -> Optional[float]:
+        return self._px(self._min.first()) if self._min.size else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return self._px(self._max.first()) if self._max.size else None
+
+    @property
+    def vwap(self) -> Optional[float]:
+        return self._pv / self._v if self._v > 0 else None
+
+    def change_pct(self) -> Optional[float]:
+        first, last = self.first, self.last
+        if len(self) < 2 or not first:
+            return None
+        return (last - first) / first * 100.0
+
+    def swing_pct(self) -> Optional[float]:
+        last, lo, hi = self.last, self.min, self.max
+        if len(self) < 2 or not lo or not hi:
+            return None
+        up = (last - lo) / lo * 100.0
+        down = (last - hi) / hi * 100.0
+        return up if abs(up) >= abs(down) else down
+
+
+def _add(ring: _Ring, windows: Iterable[RollingWindow], ts: float, price: float, volume: Optional[float]) -> None:
+    windows = tuple(windows)
+    for w in windows:
+        w._evict(ts)
+    ring.reserve(min((w.start for w in windows), default=ring.end))
+    if ring.full():
+        doomed = ring.end - ring.cap  # slot about to be overwritten
+        for w in windows:
+            if w.start <= doomed:
+                w._drop_before(doomed + 1)
+    v = float(volume) if volume and volume > 0 else 0.0
+    seq = ring.push(float(ts), float(price), v)
+    for w in windows:
+        w._admit(seq)
+
+
+class RollingStats:
+    """One RollingWindow per named span over a shared ring; `add()` feeds all of them."""
+
+    __slots__ = ("windows", "last_ts", "ring")
+
+    def __init__(self, windows: Optional[Mapping[str, float]] = None, max_samples: int = ROLLING_MAX_SAMPLES):
+        self.ring = _Ring(max_cap=max_samples)
+        self.windows: Dict[str, RollingWindow] = {
+            name: RollingWindow(span, self.ring) for name, span in (windows or WINDOWS).items()
+        }
+        self.last_ts: Optional[float] = None
+
+    def add(self, price: float, ts: Optional[float] = None, volume: Optional[float] = None) -> None:
+        ts = time.time() if ts is None else float(ts)
+        if self.last_ts is not None and ts < self.last_ts:
+            ts = self.last_ts  # clock went backwards: keep windows monotonic
+        self.last_ts = ts
+        _add(self.ring, self.windows.values(), ts, price, volume)
+
+    def window(self, name: str, now: Optional[float] = None) -> RollingWindow:
+        return self.windows[name].refresh(now)
+
+    @property
+    def last(self) -> Optional[float]:
+        r = self.ring
+        return r.px[(r.end - 1) % r.cap] if r.end else None
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        out: Dict[str, Dict[str, Optional[float]]] = {}
+        for name in self.windows:
+            w = self.window(name, now)
+            out[name] = {
+                "first": w.first, "last": w.last, "min": w.min, "max": w.max, "vwap": w.vwap,
+                "change_pct": w.change_pct(), "swing_pct": w.swing_pct(), "samples": float(len(w)),
+            }
+        return out
@@ -5,12 +5,8 @@ from typing import Any, Dict, List, Mapping
 
 import requests
 
-WEB3 = None
-ERC20_ABI_MIN = [
-    {"constant": True, "inputs": [], "name": "decimals", "outputs": [{"name": "", "type": "uint8"}], "type": "function"},
-    {"constant": True, "inputs": [], "name": "symbol", "outputs": [{"name": "", "type": "string"}], "type": "function"},
-    {"constant": True, "inputs": [{"name": "owner", "type": "address"}], "name": "balanceOf", "outputs": [{"name": "", "type": "uint256"}], "type": "function"},
-]
+from core import rpc_client, singleflight, transfer_index
+from core.cache import TTLCache
 
 DEFAULT_CONFIG: Dict[str, str] = {
     "rpc_url": "",
@@ -19,8 +15,15 @@ DEFAULT_CONFIG: Dict[str, str] = {
 }
 
 _RPC_CONFIG: Dict[str, str] = dict(DEFAULT_CONFIG)
-_sym_cache: Dict[str, str] = {}
-_dec_cache: Dict[str, int] = {}
+# contract -> (symbol or None, decimals); failed reads (symbol None) are retried after 10 min
+_meta_cache = TTLCache(8192, ttl=None, negative_ttl=600, is_negative=lambda m: m[0] is None)
+
+
+def _meta(contract: str) -> tuple[str, int] | None:
+    m = _meta_cache.peek((contract or "").lower())  # keys are lower-case, as _read_batch stores them
+    if m is None:
+        return None
+    return (m[0] or contract[:8].upper(), m[1])
 
 
 def get_rpc_config(env: Mapping[str, str] = os.environ) -> Dict[str, str]:
@@ -37,7 +40,7 @@ def get_rpc_config(env: Mapping[str, str] = os.environ) -> Dict[str, str]:
 
 def configure_rpc(config: Dict[str, Any] | None = None) -> Dict[str, str]:
     """Apply a new RPC configuration. Returns the active config."""
-    global _RPC_CONFIG, WEB3
+    global _RPC_CONFIG
     if config is None:
         config = get_rpc_config()
     applied = dict(DEFAULT_CONFIG)
@@ -50,32 +53,20 @@ def configure_rpc(config: Dict[str, Any] | None = None) -> Dict[str, str]:
             applied[key] = text.lower()
         else:
             applied[key] = text
-    if applied["rpc_url"] != _RPC_CONFIG.get("rpc_url"):
-        WEB3 = None  # reset connection to apply new endpoint
     _RPC_CONFIG = applied
     return dict(_RPC_CONFIG)
 
 
-def rpc_init() -> bool:
-    """Initialize Web3 provider once; return True if connected."""
-    global WEB3
-    if WEB3 is not None:
-        try:
-            return bool(WEB3.is_connected())
-        except Exception:
-            pass
+def _client() -> "rpc_client.RpcClient":
+    return rpc_client.get_client(_RPC_CONFIG.get("rpc_url", ""))
 
-    rpc_url = _RPC_CONFIG.get("rpc_url", "")
-    if not rpc_url:
-        return False
-    try:
-        from web3 import Web3
 
-        WEB3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": 15}))
-        return bool(WEB3.is_connected())
-    except Exception:
-        WEB3 = None
+def rpc_init() -> bool:
+    """True if the configured endpoint(s) are healthy. Reads go through `_client()` each time
+    (no cached Web3 bound to one endpoint), so the pool's routing and failover apply."""
+    if not _RPC_CONFIG.get("rpc_url", ""):
         return False
+    return _client().healthy()
 
 
 def get_native_balance(addr: str) -> float:
@@ -83,124 +74,99 @@ def get_native_balance(addr: str) -> float:
     if not rpc_init():
         return 0.0
     try:
-        wei = WEB3.eth.get_balance(WEB3.to_checksum_address(addr))
+        wei = _client().get_balance(addr)
         return float(wei) / (10 ** 18)
     except Exception:
         return 0.0
 
 
-def erc20_balance(contract: str, owner: str) -> float:
-    """Return the ERC-20 token balance of the owner for the given contract."""
-    if not rpc_init():
-        return 0.0
+def _read_batch(contracts: List[str], owner: str | None) -> Dict[str, Dict[str, Any]]:
+    """Multicall-batched balanceOf/decimals/symbol; fills the symbol/decimals caches."""
+    contracts = [c.lower() for c in contracts]
+    known = [c for c in contracts if c in _meta_cache]
+    rows = _client().read_erc20_batch(contracts, owner or None, known_meta=known)
+    for addr, row in rows.items():
+        if addr in known:
+            continue
+        dec = row.get("decimals")
+        _meta_cache.set(addr, (row.get("symbol") or None, dec if dec is not None else 18))
+    return rows
+
+
+def erc20_balances(contracts: List[str], owner: str) -> Dict[str, float]:
+    """Return {contract: balance} for many ERC-20 contracts in one multicall round trip."""
+    addrs = [c.lower() for c in contracts if isinstance(c, str) and c.lower().startswith("0x")]
+    if not addrs or not rpc_init():
+        return {a: 0.0 for a in addrs}
     try:
-        c = WEB3.eth.contract(address=WEB3.to_checksum_address(contract), abi=ERC20_ABI_MIN)
-        bal = c.functions.balanceOf(WEB3.to_checksum_address(owner)).call()
-        if contract not in _dec_cache:
-            try:
-                _dec_cache[contract] = int(c.functions.decimals().call())
-            except Exception:
-                _dec_cache[contract] = 18
-        return float(bal) / (10 ** _dec_cache[contract])
+        rows = _read_batch(addrs, owner)
     except Exception:
-        return 0.0
+        return {a: 0.0 for a in addrs}
+    out: Dict[str, float] = {}
+    for addr in addrs:
+        raw = (rows.get(addr) or {}).get("balance") or 0
+        out[addr] = float(raw) / (10 ** (_meta(addr) or ("", 18))[1])
+    return out
+
+
+def erc20_balance(contract: str, owner: str) -> float:
+    """Return the ERC-20 token balance of the owner for the given contract."""
+    return erc20_balances([contract], owner).get((contract or "").lower(), 0.0)
 
 
 def erc20_symbol(contract: str) -> str:
     """Return the symbol for the given ERC-20 contract."""
-    if contract in _sym_cache:
-        return _sym_cache[contract]
-    if not rpc_init():
-        _sym_cache[contract] = contract[:8].upper()
-        return _sym_cache[contract]
-    try:
-        c = WEB3.eth.contract(address=WEB3.to_checksum_address(contract), abi=ERC20_ABI_MIN)
-        sym = c.functions.symbol().call()
-        if isinstance(sym, bytes):
-            sym = sym.decode("utf-8", "ignore").strip()
-        _sym_cache[contract] = sym or contract[:8].upper()
-        return _sym_cache[contract]
-    except Exception:
-        _sym_cache[contract] = contract[:8].upper()
-        return _sym_cache[contract]
+    return get_symbol_decimals(contract)[0]
 
 
 def get_symbol_decimals(contract: str) -> tuple[str, int]:
     """Return (symbol, decimals) for the given ERC-20 contract address."""
-    if contract in _sym_cache and contract in _dec_cache:
-        return (_sym_cache[contract], _dec_cache[contract])
+    m = _meta(contract)
+    if m:
+        return m
+    # concurrent first lookups of one contract share a single RPC read
+    return singleflight.do(("erc20_meta", (contract or "").lower()), lambda: _read_symbol_decimals(contract))
+
+
+def _read_symbol_decimals(contract: str) -> tuple[str, int]:
     if not rpc_init():
-        _sym_cache[contract] = contract[:8].upper()
-        _dec_cache[contract] = 18
-        return (_sym_cache[contract], _dec_cache[contract])
+        return (contract[:8].upper(), 18)
     try:
-        c = WEB3.eth.contract(address=WEB3.to_checksum_address(contract), abi=ERC20_ABI_MIN)
-        sym = c.functions.symbol().call()
-        dec = int(c.functions.decimals().call())
-        if isinstance(sym, bytes):
-            sym = sym.decode("utf-8", "ignore").strip()
-        _sym_cache[contract] = sym or contract[:8].upper()
-        _dec_cache[contract] = dec if dec is not None else 18
+        rows = _read_batch([contract.lower()], None)
+        row = rows.get(contract.lower()) or {}
+        sym, dec = row.get("symbol"), row.get("decimals")
+        _meta_cache.set(contract.lower(), (sym or None, dec if dec is not None else 18))
     except Exception:
-        _sym_cache[contract] = contract[:8].upper()
-        _dec_cache[contract] = 18
-    return (_sym_cache[contract], _dec_cache[contract])
+        _meta_cache.set(contract.lower(), (None, 18))
+    return _meta(contract) or (contract[:8].upper(), 18)
 
 
-def discover_token_contracts_by_logs(owner: str, blocks_back: int, chunk: int) -> set[str]:
-    """Scan recent blockchain logs for ERC-20 Transfer events involving the owner address."""
+def discover_token_contracts_by_logs(owner: str, blocks_back: int, chunk: int, full: bool = False) -> set[str]:
+    """
+    Scan blockchain logs for ERC-20 Transfer events involving the owner address.
+    Only blocks not yet in the local Transfer-log index (core.transfer_index) are fetched unless `full` is set.
+    """
     if not rpc_init():
         return set()
     try:
-        latest = WEB3.eth.block_number
+        latest = _client().block_number()
     except Exception:
         return set()
     if latest is None:
         return set()
-    start_block = max(0, latest - max(1, blocks_back))
-    found: set[str] = set()
-    owner_hex = owner.lower().replace("0x", "")
-    topic_addr = "0x" + owner_hex.rjust(64, "0")
-    transfer_topic = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
-    current_block = start_block
-    while current_block <= latest:
-        end_block = min(latest, current_block + chunk - 1)
-        try:
-            logs = WEB3.eth.get_logs({
-                "fromBlock": current_block,
-                "toBlock": end_block,
-                "topics": [transfer_topic, topic_addr],
-            })
-            for log in logs:
-                addr = (log.get("address") or "").lower()
-                if addr.startswith("0x"):
-                    found.add(addr)
-        except Exception:
-            pass
-        try:
-            logs = WEB3.eth.get_logs({
-                "fromBlock": current_block,
-                "toBlock": end_block,
-                "topics": [transfer_topic, None, topic_addr],
-            })
-            for log in logs:
-                addr = (log.get("address") or "").lower()
-                if addr.startswith("0x"):
-                    found.add(addr)
-        except Exception:
-            pass
-        current_block = end_block + 1
-    return found
+    index = transfer_index.get_index()
+    index.sync(owner, _client().get_logs, latest, blocks_back, chunk=chunk, full=full)
+    return index.contracts(owner)
 
 
-def discover_wallet_tokens(window_blocks: int = 120000, chunk: int = 5000) -> List[Dict[str, Any]]:
+def discover_wallet_tokens(window_blocks: int = 120000, chunk: int = 5000, full: bool = False) -> List[Dict[str, Any]]:
     """Discover wallet tokens with positive balance via RPC and optional Etherscan fallback."""
     tokens: List[Dict[str, Any]] = []
     wallet = _RPC_CONFIG.get("wallet_address", "")
     if not wallet:
         return tokens
 
-    contracts = discover_token_contracts_by_logs(wallet, window_blocks, chunk)
+    contracts = discover_token_contracts_by_logs(wallet, window_blocks, chunk, full=full)
     etherscan_api = _RPC_CONFIG.get("etherscan_api", "")
 
     if not contracts and etherscan_api:
@@ -231,11 +197,9 @@ def discover_wallet_tokens(window_blocks: int = 120000, chunk: int = 5000) -> Li
     if not contracts:
         return tokens
 
-    for addr in sorted(contracts):
-        if not addr.startswith("0x"):
-            continue
+    balances = erc20_balances(sorted(contracts), wallet)
+    for addr, bal in balances.items():
         sym, dec = get_symbol_decimals(addr)
-        bal = erc20_balance(addr, wallet)
         if bal > 1e-12:
             tokens.append({
                 "token_addr": addr,
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+core/rpc_client.py — one process-wide Cronos RPC client.
+
+Every module that talks to the chain goes through `get_client()`:
+
+- JSON-RPC calls and batches ride the pooled keep-alive session of
+  core.jsonrpc, so the worker reuses TLS connections instead of opening a
+  new one per Web3 instance / requests.post;
+- `client.web3` is a lazily built Web3 whose HTTPProvider shares that same
+  session (for code that still needs contract objects or web3 helpers);
+- health is tracked from real traffic: any answered call marks the
+  endpoint healthy for RPC_HEALTH_TTL seconds, so `healthy()` only probes
+  (eth_blockNumber) when nothing succeeded recently — no `is_connected()`
+  round trip per call;
+- `eth_call` / `eth_call_many` / `get_balance` / `get_logs` match the
+  transport signatures of core.multicall and core.logscan, and
+  `read_erc20_batch()` wires them together.
+
+Multiple endpoints
+------------------
+CRONOS_RPC_URL may list several endpoints, comma separated. `get_client()`
+then returns an `RpcPool` with the same interface that:
+
+- keeps per-endpoint latency (EWMA + p95 over recent samples) and error rate;
+- routes each request to the healthiest endpoint whose circuit breaker is
+  closed, failing over to the next one on transport errors;
+- with RPC_HEDGE=1, fires a duplicate to the second-best endpoint when the
+  first has not answered within its own p95, and takes whichever answers
+  first.
+
+JSON-RPC error objects (reverts, bad params) are answers, not endpoint
+failures: they are raised to the caller without failover.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from core import jsonrpc, multicall
+from core.circuit_breaker import CircuitBreaker
+from core.jsonrpc import RpcError
+
+logger = logging.getLogger("core.rpc_client")
+
+RPC_HEALTH_TTL = float(os.getenv("RPC_HEALTH_TTL", "30"))
+RPC_HEALTH_RETRY = float(os.getenv("RPC_HEALTH_RETRY", "5"))
+RPC_HEDGE = os.getenv("RPC_HEDGE", "0").strip().lower() in ("1", "true", "yes", "on")
+RPC_HEDGE_MIN_DELAY = float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.25"))
+RPC_CB_FAILURES = int(os.getenv("RPC_CB_FAILURES", "3"))
+RPC_CB_OPEN_SEC = int(os.getenv("RPC_CB_OPEN_SEC", "30"))
+
+_LATENCY_SAMPLES = 64
+_EWMA_ALPHA = 0.2
+
+
+def parse_rpc_urls(raw: Optional[str]) -> List[str]:
+    """Split a comma-separated endpoint list, dropping blanks and duplicates."""
+    out: List[str] = []
+    for part in (raw or "").split(","):
+        u = part.strip()
+        if u and u not in out:
+            out.append(u)
+    return out
+
+
+def default_rpc_url() -> str:
+    return (os.getenv("CRONOS_RPC_URL") or os.getenv("CRONOSRPCURL") or os.getenv("RPC_URL") or "").strip()
+
+
+class _TransportDown(RuntimeError):
+    """Every item of a batch failed at the transport level."""
+
+
+class _RpcMethods(ABC):
+    """eth_* helpers on top of `call()` / `batch()`; shared by RpcClient and RpcPool."""
+
+    @abstractmethod
+    def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        """One JSON-RPC call; raises RpcError on an error response."""
+
+    @abstractmethod
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        """Results in request order; a failed call is returned as its RpcError."""
+
+    def block_number(self) -> int:
+        return int(self.call("eth_blockNumber", []), 16)
+
+    def get_balance(self, addr: str) -> int:
+        return int(self.call("eth_getBalance", [addr, "latest"]), 16)
+
+    def eth_call(self, to: str, data: str) -> Optional[str]:
+        return self.call("eth_call", [{"to": to, "data": data}, "latest"])
+
+    def eth_call_many(self, calls: Sequence[Tuple[str, str]]) -> List[Optional[str]]:
+        res = self.batch([("eth_call", [{"to": to, "data": data}, "latest"]) for to, data in calls])
+        return [None if isinstance(r, RpcError) else r for r in res]
+
+    def get_logs(self, flt: Dict[str, Any]) -> List[Dict[str, Any]]:
+        q = dict(flt)
+        for k in ("fromBlock", "toBlock"):
+            if isinstance(q.get(k), int):
+                q[k] = hex(q[k])
+        return self.call("eth_getLogs", [q]) or []
+
+    def read_erc20_batch(self, contracts: Sequence[str], owner: Optional[str], **kwargs: Any) -> Dict[str, Dict[str, Any]]:
+        """core.multicall.read_erc20_batch over this client (aggregate3, batched per-call fallback)."""
+        kwargs.setdefault("eth_call_many", self.eth_call_many)
+        kwargs.setdefault("get_balance", self.get_balance)
+        return multicall.read_erc20_batch(contracts, owner, self.eth_call, **kwargs)
+
+
+class RpcClient(_RpcMethods):
+    """A single endpoint, with health, latency and error tracking."""
+
+    def __init__(self, url: str, timeout: Optional[float] = None):
+        self.url = url
+        self.timeout = float(timeout or jsonrpc.RPC_TIMEOUT)
+        self.breaker = CircuitBreaker(RPC_CB_FAILURES, RPC_CB_OPEN_SEC)
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0  # EWMA of transport failures (0..1)
+        self._samples: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._last_ok = 0.0
+        self._last_fail = 0.0
+        self._web3: Any = None
+        self._lock = threading.Lock()
+
+    # ---------- health ----------
+    def _mark(self, ok: bool, elapsed: Optional[float] = None) -> None:
+        with self._lock:
+            if ok:
+                self._last_ok = time.monotonic()
+                self.breaker.record_success()
+                if elapsed is not None:
+                    self._samples.append(elapsed)
+                    prev = self.latency_ewma
+                    self.latency_ewma = elapsed if prev is None else prev + _EWMA_ALPHA * (elapsed - prev)
+            else:
+                self._last_fail = time.monotonic()
+                self.breaker.record_failure()
+            self.error_rate += _EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of recent successful single-call latencies (None until sampled)."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+    def score(self) -> float:
+        """Lower is better; an open breaker sorts last."""
+        if not self.breaker.allow():
+            return float("inf")
+        lat = self.latency_ewma if self.latency_ewma is not None else 0.5
+        return lat * (1.0 + 10.0 * self.error_rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "latency_ewma": self.latency_ewma,
+            "p95": self.p95(),
+            "error_rate": round(self.error_rate, 3),
+            "breaker_open": not self.breaker.allow(),
+        }
+
+    def healthy(self) -> bool:
+        """True if the endpoint answered recently; probes only when it has not."""
+        if not self.url:
+            return False
+        now = time.monotonic()
+        if self._last_ok and now - self._last_ok < RPC_HEALTH_TTL:
+            return True
+        if self._last_fail > self._last_ok and now - self._last_fail < RPC_HEALTH_RETRY:
+            return False
+        try:
+            self.block_number()
+            return True
+        except Exception as e:
+            logger.debug("rpc health probe failed for %s: %s", self.url, e)
+            return False
+
+    # ---------- raw JSON-RPC ----------
+    def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        t0 = time.monotonic()
+        try:
+            res = jsonrpc.rpc_call(self.url, method, params, timeout=self.timeout)
+        except RpcError:
+            self._mark(True, time.monotonic() - t0)  # the node answered; the call itself failed
+            raise
+        except Exception:
+            self._mark(False)
+            raise
+        self._mark(True, time.monotonic() - t0)
+        return res
+
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        """[(method, params), ...] -> [result | RpcError, ...]."""
+        res = jsonrpc.rpc_batch(self.url, calls, timeout=self.timeout)
+        if res:
+            # health only: a whole batch's wall time is no single-call latency (p95 sets the hedge delay)
+            self._mark(not all(isinstance(r, RpcError) and str(r).startswith("transport error") for r in res))
+        return res
+
+    # ---------- web3 ----------
+    @property
+    def web3(self) -> Any:
+        """Web3 instance on the shared pooled session (built on first use)."""
+        if self._web3 is None:
+            with self._lock:
+                if self._web3 is None:
+                    from web3 import Web3  # optional dependency, imported lazily
+
+                    provider = Web3.HTTPProvider(
+                        self.url, request_kwargs={"timeout": self.timeout}, session=jsonrpc.get_session()
+                    )
+                    self._web3 = Web3(provider)
+        return self._web3
+
+
+class RpcPool(_RpcMethods):
+    """Several endpoints behind one client: health-scored routing, failover, optional hedging."""
+
+    def __init__(self, clients: Sequence[RpcClient], hedge: Optional[bool] = None):
+        if not clients:
+            raise ValueError("RpcPool needs at least one endpoint")
+        self.clients = list(clients)
+        self.hedge = RPC_HEDGE if hedge is None else bool(hedge)
+        self.url = ",".join(c.url for c in self.clients)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def ranked(self) -> List[RpcClient]:
+        """Endpoints best first; open breakers last (still tried if nothing else is left)."""
+        return sorted(self.clients, key=lambda c: c.score())
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [c.stats() for c in self.clients]
+
+    def healthy(self) -> bool:
+        return any(c.healthy() for c in self.ranked())
+
+    @property
+    def web3(self) -> Any:
+        return self.ranked()[0].web3
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max(2, 2 * len(self.clients)), thread_name_prefix="rpc-hedge"
+                    )
+        return self._executor
+
+    def _hedged(self, first: RpcClient, second: RpcClient, op: Callable[[RpcClient], Any]) -> Any:
+        delay = max(RPC_HEDGE_MIN_DELAY, first.p95() or first.timeout)
+        pool = self._pool()
+        futs = [pool.submit(op, first)]
+        done, _ = wait(futs, timeout=delay)
+        if not done:
+            logger.debug("rpc hedge: %s slower than %.2fs, duplicating to %s", first.url, delay, second.url)
+            futs.append(pool.submit(op, second))
+        elif futs[0].exception() is not None and not isinstance(futs[0].exception(), RpcError):
+            futs.append(pool.submit(op, second))  # failed fast: plain failover
+        pending = set(futs)
+        err: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                e = f.exception()
+                if e is None:
+                    return f.result()
+                if isinstance(e, RpcError):
+                    raise e
+                err = e
+        raise err if err else RuntimeError("hedged request failed")
+
+    def _run(self, op: Callable[[RpcClient], Any]) -> Any:
+        ranked = self.ranked()
+        last: Optional[BaseException] = None
+        i = 0
+        while i < len(ranked):
+            first = ranked[i]
+            second = ranked[i + 1] if i + 1 < len(ranked) else None
+            try:
+                if self.hedge and second is not None and second.breaker.allow():
+                    i += 2
+                    return self._hedged(first, second, op)
+                i += 1
+                return op(first)
+            except RpcError:
+                raise
+            except Exception as e:
+                last = e
+                logger.debug("rpc endpoint failed (%s); trying next", e)
+        raise last if last else RuntimeError("no RPC endpoint available")
+
+    def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        return self._run(lambda c: c.call(method, params))
+
+    def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        last: List[Any] = []
+
+        def op(c: RpcClient) -> List[Any]:
+            nonlocal last
+            res = c.batch(calls)
+            if res and all(isinstance(r, RpcError) and str(r).startswith("transport error") for r in res):
+                last = res
+                raise _TransportDown(c.url)
+            return res
+
+        try:
+            return self._run(op)
+        except _TransportDown:
+            return last
+
+
+_clients: Dict[str, _RpcMethods] = {}
+_clients_lock = threading.Lock()
+
+
+def _endpoint(url: str) -> RpcClient:
+    # one RpcClient per URL, so stats are shared by every pool that lists it
+    client = _clients.get(url)
+    if not isinstance(client, RpcClient):
+        client = _clients[url] = RpcClient(url)
+    return client
+
+
+def get_client(url: Optional[str] = None) -> Any:
+    """
+    Shared client for `url` (default: CRONOS_RPC_URL). A comma-separated list
+    gives an RpcPool over those endpoints; a single URL a plain RpcClient.
+    """
+    raw = (url or default_rpc_url()).strip()
+    key = ",".join(parse_rpc_urls(raw))
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                urls = parse_rpc_urls(raw)
+                if len(urls) <= 1:
+                    client = _endpoint(key)
+                else:
+                    client = _clients[key] = RpcPool([_endpoint(u) for u in urls])
+    return client
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+core/singleflight.py — coalesce concurrent identical upstream lookups.
+
+The alerts, guard, wallet, dex and telegram threads often ask for the same
+price, pair or token metadata at the same moment. `do(key, fn)` lets the
+first caller for a key run `fn` while every other caller that arrives before
+it finishes waits and receives the same result (or the same exception).
+Nothing is cached: once the call returns, the next caller starts a new one.
+Caching stays with the callers (core.price_service, the meta caches).
+
+Keys are tuples built by the caller from the normalized request, e.g.
+("pair", "cronos/0xabc..."), ("erc20_meta", "0xabc..."),
+("explorer", "account", "tokentx", (("address", "0x..."), ...)).
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class Group:
+    """One namespace of in-flight calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+            else:
+                call.waiters += 1
+                self.stats["shared"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+_default = Group()
+
+
+def do(key: Hashable, fn: Callable[[], T]) -> T:
+    """Run `fn` once for all concurrent callers of `key` (process-wide group)."""
+    return _default.do(key, fn)
+
+
+def stats() -> Dict[str, int]:
+    return dict(_default.stats)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+core/transfer_index.py — local SQLite index of the wallet's ERC-20 Transfer logs.
+
+Every Transfer log with the wallet as sender or receiver is stored once
+(keyed by tx_hash + log_index) with block, contract, from, to and the raw
+uint256 value. The index records which block window it covers per wallet,
+so `sync()` only tails blocks newer than the last sync (or older ones when a
+deeper lookback is asked for) through core.logscan, and advances only over
+blocks the scanner actually covered.
+
+Lookups are local queries:
+    contracts(wallet)            -> every token contract ever touched
+    net_flow(wallet)             -> {contract: raw_in - raw_out}
+    transfers(wallet, ...)       -> rows for balance reconstruction / backfill
+
+Token discovery in main.py, core.rpc, core.holdings and core.discovery goes
+through `sync()` + `contracts()`; the index is the only scan checkpoint (it
+replaced the old DATA_DIR/scan_cursor.json). main.wallet_monitor_loop tails
+it, and main.compute_holdings_usd_via_rpc reconstructs balances the
+multicall read did not return from `net_flow()`.
+
+Raw values are uint256 and do not fit SQLite INTEGER; they are stored as
+decimal TEXT and summed by a Python-int aggregate (`bigsum`) in GROUP BY.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from core import logscan
+
+logger = logging.getLogger("core.transfer_index")
+
+DATA_DIR = os.getenv("DATA_DIR", "/app/data")
+TRANSFER_INDEX_DB = os.getenv("TRANSFER_INDEX_DB") or os.path.join(DATA_DIR, "transfer_index.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    tx_hash   TEXT    NOT NULL,
+    log_index INTEGER NOT NULL,
+    block     INTEGER NOT NULL,
+    contract  TEXT    NOT NULL,
+    from_addr TEXT    NOT NULL,
+    to_addr   TEXT    NOT NULL,
+    value     TEXT    NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS ix_transfers_from ON transfers (from_addr, contract);
+CREATE INDEX IF NOT EXISTS ix_transfers_to ON transfers (to_addr, contract);
+CREATE INDEX IF NOT EXISTS ix_transfers_block ON transfers (block);
+CREATE TABLE IF NOT EXISTS coverage (
+    wallet      TEXT PRIMARY KEY,
+    first_block INTEGER NOT NULL,
+    last_block  INTEGER NOT NULL
+);
+"""
+
+
+def _hex(x: Any) -> str:
+    if isinstance(x, (bytes, bytearray)):
+        return "0x" + bytes(x).hex()
+    if hasattr(x, "hex") and not isinstance(x, str):
+        h = x.hex()
+        return h if h.startswith("0x") else "0x" + h
+    return str(x or "")
+
+
+def _int(x: Any) -> int:
+    if isinstance(x, int):
+        return x
+    h = _hex(x)
+    return int(h, 16) if h.startswith("0x") else int(h or 0)
+
+
+def _topic_addr(topic: Any) -> str:
+    return "0x" + _hex(topic)[-40:].lower()
+
+
+def parse_transfer(lg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return a row dict for an ERC-20 Transfer log, or None (ERC-721 / malformed)."""
+    try:
+        topics = lg.get("topics") or []
+        if len(topics) != 3 or _hex(topics[0]).lower() != logscan.TRANSFER_TOPIC:
+            return None
+        data = _hex(lg.get("data"))
+        return {
+            "tx_hash": _hex(lg.get("transactionHash")).lower(),
+            "log_index": _int(lg.get("logIndex")),
+            "block": _int(lg.get("blockNumber")),
+            "contract": str(lg.get("address") or "").lower(),
+            "from_addr": _topic_addr(topics[1]),
+            "to_addr": _topic_addr(topics[2]),
+            "value": str(int(data, 16) if data not in ("", "0x") else 0),
+        }
+    except Exception:
+        return None
+
+
+class _BigSum:
+    """SQLite aggregate bigsum(value, sign): sum of sign * int(value) as decimal TEXT (no int64 overflow)."""
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, value: Any, sign: Any) -> None:
+        self.total += int(sign) * int(value)
+
+    def finalize(self) -> str:
+        return str(self.total)
+
+
+class TransferIndex:
+    """Thread-safe wrapper around one SQLite connection."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or TRANSFER_INDEX_DB
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.create_aggregate("bigsum", 2, _BigSum)
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # ---------- writes ----------
+    def add_logs(self, logs: Iterable[Dict[str, Any]]) -> int:
+        rows = [r for r in (parse_transfer(lg) for lg in logs) if r]
+        if not rows:
+            return 0
+        with self._lock, self._db:
+            cur = self._db.executemany(
+                "INSERT OR IGNORE INTO transfers (tx_hash, log_index, block, contract, from_addr, to_addr, value) "
+                "VALUES (:tx_hash, :log_index, :block, :contract, :from_addr, :to_addr, :value)",
+                rows,
+            )
+            return cur.rowcount or 0
+
+    def coverage(self, wallet: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT first_block, last_block FROM coverage WHERE wallet = ?", ((wallet or "").lower(),)
+            ).fetchone()
+        return {"first_block": row[0], "last_block": row[1]} if row else None
+
+    def _set_coverage(self, wallet: str, first_block: int, last_block: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO coverage (wallet, first_block, last_block) VALUES (?, ?, ?)",
+                ((wallet or "").lower(), int(first_block), int(last_block)),
+            )
+
+    def sync(
+        self,
+        wallet: str,
+        get_logs: logscan.GetLogs,
+        head: int,
+        lookback: int,
+        *,
+        chunk: int = 2000,
+        full: bool = False,
+    ) -> int:
+        """
+        Index Transfer logs for blocks in [head - lookback, head] that are not
+        covered yet. Returns the number of new rows.
+        """
+        head = int(head)
+        start = max(0, head - max(1, int(lookback)))
+        cov = None if full else self.coverage(wallet)
+        ranges = []  # (from, to, side)
+        if cov:
+            if start < cov["first_block"]:
+                ranges.append((start, cov["first_block"] - 1, "older"))
+            if cov["last_block"] < head:
+                ranges.append((cov["last_block"] + 1, head, "newer"))
+            first, last = min(start, cov["first_block"]), max(head, cov["last_block"])
+        else:
+            ranges.append((start, head, "newer"))
+            first, last = start, head
+
+        added = 0
+        for frm, to, side in ranges:
+            res = logscan.scan_transfer_contracts(get_logs, wallet, frm, to, chunk=chunk)
+            added += self.add_logs(res.logs)
+            if side == "newer":
+                last = min(last, res.covered_until)
+            else:
+                first = max(first, res.covered_from)
+            for fb, tb, err in res.gaps:
+                logger.info("transfer index %s: gap %s-%s (%s)", wallet, fb, tb, err)
+        with self._lock:
+            # another thread may have synced meanwhile; keep the union
+            now = None if full else self.coverage(wallet)
+            if now:
+                first, last = min(first, now["first_block"]), max(last, now["last_block"])
+            self._set_coverage(wallet, first, last)
+        return added
+
+    # ---------- queries ----------
+    def contracts(self, wallet: str) -> Set[str]:
+        w = (wallet or "").lower()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT contract FROM transfers WHERE from_addr = ? "
+                "UNION SELECT contract FROM transfers WHERE to_addr = ?",
+                (w, w),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def net_flow(self, wallet: str) -> Dict[str, int]:
+        """{contract: sum(raw in) - sum(raw out)} for the wallet, over the covered blocks."""
+        w = (wallet or "").lower()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT contract, bigsum(value, sign) FROM ("
+                "SELECT contract, value, 1 AS sign FROM transfers WHERE to_addr = ? "
+                "UNION ALL SELECT contract, value, -1 FROM transfers WHERE from_addr = ?"
+                ") GROUP BY contract",
+                (w, w),
+            ).fetchall()
+        return {contract: int(total) for contract, total in rows}
+
+    def transfers(
+        self,
+        wallet: str,
+        contract: Optional[str] = None,
+        since_block: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Rows touching the wallet, oldest first; `value` is returned as int."""
+        w = (wallet or "").lower()
+        where, params = "", []
+        if contract:
+            where += " AND contract = ?"
+            params.append(contract.lower())
+        if since_block is not None:
+            where += " AND block >= ?"
+            params.append(int(since_block))
+        sql = (
+            f"SELECT tx_hash, log_index, block, contract, from_addr, to_addr, value FROM transfers "
+            f"WHERE from_addr = ?{where} UNION "
+            f"SELECT tx_hash, log_index, block, contract, from_addr, to_addr, value FROM transfers "
+            f"WHERE to_addr = ?{where} ORDER BY block, log_index"
+        )
+        with self._lock:
+            rows = self._db.execute(sql, [w, *params, w, *params]).fetchall()
+        keys = ("tx_hash", "log_index", "block", "contract", "from_addr", "to_addr", "value")
+        out = [dict(zip(keys, r)) for r in rows]
+        for r in out:
+            r["value"] = int(r["value"])
+        return out
+
+
+_default: Optional[TransferIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_index() -> TransferIndex:
+    """Process-wide index at TRANSFER_INDEX_DB."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = TransferIndex()
+    return _default
@@ -21,6 +21,7 @@ Compatible helpers:
 
 import os, sys, time, json, threading, logging, signal
 from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from dotenv import load_dotenv
@@ -30,10 +31,15 @@ from zoneinfo import ZoneInfo
 from utils.http import safe_get, safe_json
 from telegram.api import send_telegram
 from reports.day_report import build_day_report_text as _compose_day_report
-from reports.ledger import append_ledger, update_cost_basis as ledger_update_cost_basis, replay_cost_basis_over_entries
-from reports.aggregates import aggregate_per_asset
+from reports.ledger import append_ledger, iter_ledger, ledger_days, has_tx as ledger_has_tx, update_cost_basis as ledger_update_cost_basis, replay_cost_basis_over_entries
+from reports.positions import get_checkpoint as get_position_checkpoint
+from reports import history_manifest
 from reports import scheduler as report_scheduler
 from core import guards
+from core import block_follower, candles, dexscreener, pair_follower, pair_scheduler, price_service, rpc_client, rpc_ingest, singleflight, transfer_index
+from core.cache import TTLCache
+from core.pair_store import PairStore
+from core.rolling import RollingStats
 import core.rpc as core_rpc
 
 # ---------- Bootstrap / TZ ----------
@@ -71,11 +77,27 @@ DEX_PAIRS          = os.getenv("DEX_PAIRS", "")
 LOG_SCAN_BLOCKS = int(os.getenv("LOG_SCAN_BLOCKS", "120000"))
 LOG_SCAN_CHUNK  = int(os.getenv("LOG_SCAN_CHUNK",  "5000"))
 WALLET_POLL     = int(os.getenv("WALLET_POLL", "15"))
+WALLET_TOKEN_RECONCILE = int(os.getenv("WALLET_TOKEN_RECONCILE", "600"))  # tokentx poll even without bloom hits
+TRANSFER_INDEX_SYNC = int(os.getenv("TRANSFER_INDEX_SYNC", "60"))  # wallet loop tails the Transfer index this often (0: off)
+WALLET_INGEST   = (os.getenv("WALLET_INGEST", "etherscan") or "etherscan").strip().lower()  # etherscan | rpc
 DEX_POLL        = int(os.getenv("DEX_POLL", "60"))
-PRICE_WINDOW    = int(os.getenv("PRICE_WINDOW","3"))
+DEX_MONITOR_MODE = (os.getenv("DEX_MONITOR_MODE", "poll") or "poll").strip().lower()   # poll | events (Sync/Swap logs)
+DEX_EVENTS_POLL = max(1, int(os.getenv("DEX_EVENTS_POLL", "5") or 5))
+DEX_POLL_WORKERS = max(1, int(os.getenv("DEX_POLL_WORKERS", "4") or 4))
+DEX_POLL_MIN    = float(os.getenv("DEX_POLL_MIN", "10") or 10)          # adaptive poll: fastest interval per pair
+DEX_POLL_MAX    = float(os.getenv("DEX_POLL_MAX", "900") or 900)        # adaptive poll: idle back-off ceiling
+DEX_REQUEST_BUDGET = float(os.getenv("DEX_REQUEST_BUDGET", "60") or 60) # Dexscreener requests per minute
+DEX_ACTIVE_VOL_H1 = float(os.getenv("DEX_ACTIVE_VOL_H1", "10000") or 10000)
+SPIKE_WINDOW    = os.getenv("SPIKE_WINDOW","5m")            # rolling window (1m/5m/15m/1h) for spike swings
+PRICE_MOVE_WINDOW = os.getenv("PRICE_MOVE_WINDOW","5m")    # rolling window for the net price-move check
 PRICE_MOVE_THRESHOLD = float(os.getenv("PRICE_MOVE_THRESHOLD","5"))
 SPIKE_THRESHOLD      = float(os.getenv("SPIKE_THRESHOLD","8"))
 MIN_VOLUME_FOR_ALERT = float(os.getenv("MIN_VOLUME_FOR_ALERT","0"))
+PAIR_STALE_SEC  = float(os.getenv("PAIR_STALE_SEC", str(6*3600)) or 6*3600)  # discovered pairs with no price change/trade this long are dropped
+_pair_sched = pair_scheduler.PairScheduler(
+    DEX_POLL, min_interval=DEX_POLL_MIN, max_interval=DEX_POLL_MAX, budget_per_min=DEX_REQUEST_BUDGET,
+    chunk=dexscreener.DEXSCREENER_CHUNK, spike_threshold=SPIKE_THRESHOLD, move_threshold=PRICE_MOVE_THRESHOLD,
+    active_vol_h1=DEX_ACTIVE_VOL_H1)
 
 DISCOVER_ENABLED  = (os.getenv("DISCOVER_ENABLED","true").lower() in ("1","true","yes","on"))
 DISCOVER_QUERY    = os.getenv("DISCOVER_QUERY","cronos")
@@ -111,7 +133,7 @@ DEX_BASE_PAIRS   = "https://api.dexscreener.com/latest/dex/pairs"
 DEX_BASE_TOKENS  = "https://api.dexscreener.com/latest/dex/tokens"
 DEX_BASE_SEARCH  = "https://api.dexscreener.com/latest/dex/search"
 CRONOS_TX        = "https://cronoscan.com/tx/{txhash}"
-DATA_DIR         = "/app/data"
+DATA_DIR         = os.getenv("DATA_DIR", "/app/data")
 ATH_PATH         = os.path.join(DATA_DIR, "ath.json")
 
 log = logging.getLogger("wallet-monitor")
@@ -238,8 +260,7 @@ def start_services() -> None:
 # ---------- Runtime ----------
 shutdown_event = threading.Event()
 _seen_tx_hashes = set()
-_last_prices, _price_history, _last_pair_tx = {}, {}, {}
-_tracked_pairs, _known_pairs_meta = set(), {}
+_pairs = PairStore(PAIR_STALE_SEC)   # tracked Dex pairs: slug -> PairState (meta fields, last price/tx, rolling stats)
 _TOKEN_EVENT_LRU_MAX, _TOKEN_HASH_LRU_MAX = 4000, 2000
 _seen_token_events, _seen_token_hashes = set(), set()
 _seen_token_events_q, _seen_token_hashes_q = deque(maxlen=_TOKEN_EVENT_LRU_MAX), deque(maxlen=_TOKEN_HASH_LRU_MAX)
@@ -254,10 +275,11 @@ _realized_pnl_today = 0.0
 EPSILON = 1e-12
 _last_intraday_sent = 0.0
 
-PRICE_CACHE, PRICE_CACHE_TTL = {}, 60
-ATH, _alert_last_sent = {}, {}
+ATH = {}
 COOLDOWN_SEC = 60*30
+_alert_last_sent = TTLCache(4096, ttl=COOLDOWN_SEC)   # key present = alert still cooling down
 _guard = {}  # key -> {"entry","peak","start_ts"}
+_guard_stats = {}  # key -> RollingStats over the guard window
 
 # ---------- Utils ----------
 def _format_amount(a):
@@ -289,7 +311,7 @@ def write_json(path, obj):
     with open(tmp,"w",encoding="utf-8") as f: json.dump(obj,f,ensure_ascii=False,indent=2)
     os.replace(tmp,path)
 
-def data_file_for_today(): return os.path.join(DATA_DIR, f"transactions_{ymd()}.json")
+def ledger_today(): return iter_ledger(ymd())   # today's ledger entries, streamed (reports.ledger)
 
 # ---------- ATH ----------
 def load_ath():
@@ -304,91 +326,32 @@ def update_ath(key: str, live_price: float):
         ATH[key] = live_price; save_ath()
         send_telegram(f"🏆 New ATH {key}: ${_format_price(live_price)}")
 
-# ---------- Pricing (Dexscreener) ----------
+# ---------- Pricing (core.price_service) ----------
 PRICE_ALIASES = {"tcro":"cro"}
-_HISTORY_LAST_PRICE = {}
 
 def _pick_best_price(pairs):
-    if not pairs: return None
-    best, best_liq = None, -1.0
-    for p in pairs:
-        try:
-            if str(p.get("chainId","")).lower()!="cronos": continue
-            liq=float((p.get("liquidity") or {}).get("usd") or 0)
-            price=float(p.get("priceUsd") or 0)
-            if price<=0: continue
-            if liq>best_liq: best_liq, best = liq, price
-        except: continue
-    return best
+    return dexscreener.pick_best_price(pairs)
+
+def prefetch_prices_usd(addrs):
+    """Bulk-warm the shared price cache: one Dexscreener call per 30 tokens (core.price_service).
+    Tokens it cannot price are left to get_price_usd's per-token lookup."""
+    return price_service.get_service().prefetch(addrs)
+
+def track_prices(keys):
+    """Keep held/watched tokens warm in the background refresher."""
+    price_service.get_service().track(k for k in keys or [] if isinstance(k,str) and k)
 
 def _pairs_for_token_addr(addr: str):
-    url1=f"{DEX_BASE_TOKENS}/cronos/{addr}"
-    data = safe_json(safe_get(url1,timeout=10)) or {}
-    pairs = data.get("pairs") or []
-    if not pairs:
-        url2=f"{DEX_BASE_TOKENS}/{addr}"
-        data = safe_json(safe_get(url2,timeout=10)) or {}
-        pairs = data.get("pairs") or []
-    if not pairs:
-        data = safe_json(safe_get(DEX_BASE_SEARCH, params={"q": addr}, timeout=10)) or {}
-        pairs = data.get("pairs") or []
-    return pairs
+    return dexscreener.token_pairs(addr)
 
 def _history_price_fallback(query_key: str, symbol_hint: str=None):
-    if not query_key: return None
-    k=query_key.strip()
-    if not k: return None
-    if k.startswith("0x"):
-        p=_HISTORY_LAST_PRICE.get(k)
-        if p and p>0: return p
-    sym=(symbol_hint or k)
-    sym=(PRICE_ALIASES.get(sym.lower(), sym.lower())).upper()
-    p=_HISTORY_LAST_PRICE.get(sym)
-    if p and p>0: return p
-    if sym=="CRO":
-        p=_HISTORY_LAST_PRICE.get("CRO")
-        if p and p>0: return p
-    return None
-
-def _price_cro_fallback():
-    for q in ["wcro usdc","cro usdc","cro busd","cro dai"]:
-        try:
-            data=safe_json(safe_get(DEX_BASE_SEARCH, params={"q": q}, timeout=10)) or {}
-            p=_pick_best_price(data.get("pairs"))
-            if p and p>0: return p
-        except: pass
-    return None
+    if not query_key or not query_key.strip(): return None
+    return price_service.get_service().history_price(query_key.strip(), symbol_hint=symbol_hint)
 
 def get_price_usd(symbol_or_addr: str):
+    """Fresh/stale cached price, or a blocking lookup on a cold miss (last ledger price as fallback)."""
     if not symbol_or_addr: return None
-    key = PRICE_ALIASES.get(symbol_or_addr.strip().lower(), symbol_or_addr.strip().lower())
-    now = time.time()
-    c = PRICE_CACHE.get(key)
-    if c and (now - c[1] < PRICE_CACHE_TTL): return c[0]
-
-    price=None
-    try:
-        if key in ("cro","wcro","w-cro","wrappedcro","wrapped cro"):
-            for q in ["wcro usdt","cro usdt"]:
-                data=safe_json(safe_get(DEX_BASE_SEARCH, params={"q": q}, timeout=10)) or {}
-                price=_pick_best_price(data.get("pairs"))
-                if price: break
-            if not price: price=_price_cro_fallback()
-        elif key.startswith("0x") and len(key)==42:
-            price=_pick_best_price(_pairs_for_token_addr(key))
-        else:
-            for q in [key, f"{key} usdt", f"{key} wcro"]:
-                data=safe_json(safe_get(DEX_BASE_SEARCH, params={"q": q}, timeout=10)) or {}
-                price=_pick_best_price(data.get("pairs"))
-                if price: break
-    except: price=None
-
-    if (price is None) or (not price) or (float(price)<=0):
-        hist=_history_price_fallback(symbol_or_addr, symbol_hint=symbol_or_addr)
-        if hist and hist>0: price=float(hist)
-
-    PRICE_CACHE[key]=(price, now)
-    return price
+    return price_service.get_service().get(symbol_or_addr, symbol_hint=symbol_or_addr)
 
 def get_change_and_price_for_symbol_or_addr(sym_or_addr: str):
     if sym_or_addr.lower().startswith("0x") and len(sym_or_addr)==42:
@@ -417,12 +380,17 @@ def get_change_and_price_for_symbol_or_addr(sym_or_addr: str):
     return (price, ch24, ch2h, ds_url)
 
 # ---------- Etherscan ----------
+def _etherscan_account(params):
+    """GET one Etherscan v2 account call; identical concurrent calls share one request."""
+    key=("etherscan",)+tuple(sorted((k,str(v)) for k,v in params.items() if k!="apikey"))
+    return singleflight.do(key, lambda: safe_json(safe_get(ETHERSCAN_V2_URL, params=params, timeout=15, retries=3)) or {})
+
 def fetch_latest_wallet_txs(limit=25):
     if not WALLET_ADDRESS or not ETHERSCAN_API: return []
     params={"chainid":CRONOS_CHAINID,"module":"account","action":"txlist",
             "address":WALLET_ADDRESS,"startblock":0,"endblock":99999999,
             "page":1,"offset":limit,"sort":"desc","apikey":ETHERSCAN_API}
-    data=safe_json(safe_get(ETHERSCAN_V2_URL, params=params, timeout=15, retries=3)) or {}
+    data=_etherscan_account(params)
     if str(data.get("status","")).strip()=="1" and isinstance(data.get("result"), list): return data["result"]
     return []
 
@@ -431,7 +399,7 @@ def fetch_latest_token_txs(limit=50):
     params={"chainid":CRONOS_CHAINID,"module":"account","action":"tokentx",
             "address":WALLET_ADDRESS,"startblock":0,"endblock":99999999,
             "page":1,"offset":limit,"sort":"desc","apikey":ETHERSCAN_API}
-    data=safe_json(safe_get(ETHERSCAN_V2_URL, params=params, timeout=15, retries=3)) or {}
+    data=_etherscan_account(params)
     if str(data.get("status","")).strip()=="1" and isinstance(data.get("result"), list): return data["result"]
     return []
 
@@ -439,149 +407,133 @@ def fetch_latest_token_txs(limit=50):
 def _replay_today_cost_basis():
     global _position_qty, _position_cost, _realized_pnl_today
     _position_qty.clear(); _position_cost.clear(); _realized_pnl_today=0.0
-    path=data_file_for_today()
-    data=read_json(path, default={"date": ymd(),"entries":[],"net_usd_flow":0.0,"realized_pnl":0.0})
-    total_realized=replay_cost_basis_over_entries(_position_qty,_position_cost,data.get("entries",[]),eps=EPSILON)
+    total_realized=replay_cost_basis_over_entries(_position_qty,_position_cost,ledger_today(),eps=EPSILON)
     _realized_pnl_today=float(total_realized)
-    data["realized_pnl"]=float(total_realized); write_json(path,data)
+
+def _add_realized_today(realized):
+    global _realized_pnl_today
+    _realized_pnl_today+=float(realized or 0.0)
 
 # ---------- History maps ----------
+_history_maps_seeded=None
 def _build_history_maps():
-    symbol_to_contract, symbol_conflict = {}, set()
-    files=[]
-    try:
-        for fn in os.listdir(DATA_DIR):
-            if fn.startswith("transactions_") and fn.endswith(".json"): files.append(fn)
-    except Exception as ex: log.exception("listdir data error: %s", ex)
-    files.sort()
-    for fn in files:
-        data=read_json(os.path.join(DATA_DIR,fn), default=None)
-        if not isinstance(data,dict): continue
-        for e in data.get("entries",[]):
-            sym=(e.get("token") or "").strip()
-            addr=(e.get("token_addr") or "").strip().lower()
-            p=float(e.get("price_usd") or 0.0)
-            if p>0:
-                if addr and addr.startswith("0x"): _HISTORY_LAST_PRICE[addr]=p
-                if sym: _HISTORY_LAST_PRICE[sym.upper()]=p
-            if sym and addr and addr.startswith("0x"):
-                if sym in symbol_to_contract and symbol_to_contract[sym]!=addr:
-                    symbol_conflict.add(sym)
-                else:
-                    symbol_to_contract.setdefault(sym, addr)
-    for s in symbol_conflict: symbol_to_contract.pop(s,None)
-    return symbol_to_contract
+    """symbol -> contract over the ledger (reports.history_manifest: only changed days are re-read,
+    callers within MANIFEST_REUSE_SEC share one result); seeds ledger prices into the price service."""
+    global _history_maps_seeded
+    hm=history_manifest.get_manifest().maps()
+    if hm is not _history_maps_seeded:
+        svc=price_service.get_service()
+        for k,p in hm.last_price.items(): svc.record_history(k, p)
+        _history_maps_seeded=hm
+    return dict(hm.symbol_to_contract)
+
+def _history_contracts():
+    return history_manifest.get_manifest().maps().contracts
 
 # ---------- RPC (minimal) ----------
-WEB3=None
-ERC20_ABI_MIN=[
-    {"constant":True,"inputs":[],"name":"name","outputs":[{"name":"","type":"string"}],"type":"function"},
-    {"constant":True,"inputs":[],"name":"symbol","outputs":[{"name":"","type":"string"}],"type":"function"},
-    {"constant":True,"inputs":[],"name":"decimals","outputs":[{"name":"","type":"uint8"}],"type":"function"},
-    {"constant":True,"inputs":[{"name":"owner","type":"address"}],"name":"balanceOf","outputs":[{"name":"","type":"uint256"}],"type":"function"},
-]
 TRANSFER_TOPIC0="0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
 
-def _to_checksum(addr:str):
-    try:
-        from web3 import Web3
-        return Web3.to_checksum_address(addr)
-    except: return addr
+def RPC():
+    """The shared pooled client (core.rpc_client) for CRONOS_RPC_URL."""
+    return rpc_client.get_client(CRONOS_RPC_URL)
 
 def rpc_init():
-    global WEB3
     if not CRONOS_RPC_URL:
         log.warning("CRONOS_RPC_URL not set; RPC disabled."); return False
-    try:
-        from web3 import Web3
-        WEB3=Web3(Web3.HTTPProvider(CRONOS_RPC_URL, request_kwargs={"timeout":15}))
-        ok=WEB3.is_connected()
-        if not ok: log.warning("Web3 not connected.")
-        return ok
-    except Exception as e:
-        log.exception("web3 init error: %s", e); return False
+    ok=RPC().healthy()   # answered recently -> no round trip
+    if not ok: log.warning("RPC not reachable.")
+    return ok
 
 def rpc_block_number():
-    try: return WEB3.eth.block_number if WEB3 else None
+    if not CRONOS_RPC_URL: return None
+    try: return RPC().block_number()
     except: return None
 
-def rpc_get_native_balance(addr:str):
-    try:
-        wei=WEB3.eth.get_balance(addr)
-        return float(wei)/(10**18)
-    except: return 0.0
+# contract -> (symbol, decimals); a failed read caches the (addr[:8], 18) fallback for 10 min only
+_rpc_meta_cache=TTLCache(8192, ttl=None, negative_ttl=600, is_negative=lambda m: m[0] is None)
+def _rpc_meta(contract):
+    m=_rpc_meta_cache.peek((contract or "").lower())   # keys are lower-case, as rpc_read_wallet_batch stores them
+    if m is None: return None
+    return (m[0] or contract[:8].upper(), m[1])
 
-_rpc_sym_cache,_rpc_dec_cache={},{}
 def rpc_get_symbol_decimals(contract:str):
-    if contract in _rpc_sym_cache and contract in _rpc_dec_cache:
-        return _rpc_sym_cache[contract], _rpc_dec_cache[contract]
+    m=_rpc_meta(contract)
+    if m: return m
+    return singleflight.do(("erc20_meta", contract.lower()), lambda: _rpc_read_symbol_decimals(contract))
+
+def _rpc_read_symbol_decimals(contract:str):
+    # through the pool (health routing, failover, breaker) like every other read
+    rpc_read_wallet_batch([contract], None)
+    if contract.lower() not in _rpc_meta_cache: _rpc_meta_cache.set(contract.lower(),(None,18))   # read failed
+    return _rpc_meta(contract) or (contract[:8].upper(), 18)
+
+def rpc_read_wallet_batch(contracts, owner:str, include_native:bool=False):
+    """Multicall-batched balance/symbol/decimals for many contracts.
+    Returns {addr: {"symbol","decimals","balance"}} (+ "CRO" when include_native), balances as floats."""
+    if not CRONOS_RPC_URL: return {}
+    contracts=[c.lower() for c in contracts if isinstance(c,str) and c.startswith("0x")]
+    known=[c for c in contracts if c in _rpc_meta_cache]
     try:
-        c=WEB3.eth.contract(address=_to_checksum(contract), abi=ERC20_ABI_MIN)
-        sym=c.functions.symbol().call(); dec=int(c.functions.decimals().call())
-        _rpc_sym_cache[contract]=sym; _rpc_dec_cache[contract]=dec
-        return sym,dec
-    except:
-        _rpc_sym_cache[contract]=contract[:8].upper(); _rpc_dec_cache[contract]=18
-        return _rpc_sym_cache[contract], _rpc_dec_cache[contract]
+        rows=RPC().read_erc20_batch(contracts, owner, known_meta=known, include_native=include_native)
+    except Exception as e:
+        log.debug("multicall batch error: %s", e); return {}
+    out={}
+    for addr,row in rows.items():
+        if addr=="CRO":
+            wei=row.get("balance")
+            out["CRO"]={"symbol":"CRO","decimals":18,"balance":float(wei or 0)/(10**18)}
+            continue
+        if addr not in known:
+            dec=row.get("decimals")
+            _rpc_meta_cache.set(addr,(row.get("symbol") or None, dec if dec is not None else 18))
+        sym,dec=_rpc_meta(addr) or (addr[:8].upper(),18)
+        raw=row.get("balance") or 0
+        out[addr]={"symbol":sym,"decimals":dec,"balance":float(raw)/(10**dec)}
+    return out
+
+def rpc_sync_transfer_index(owner:str, blocks_back:int, chunk:int, full:bool=False):
+    """Tail new blocks into the local Transfer-log index (core.transfer_index); returns rows added."""
+    latest=rpc_block_number()
+    if not latest: return 0
+    try:
+        return transfer_index.get_index().sync(owner, RPC().get_logs, latest, blocks_back, chunk=chunk, full=full)
+    except Exception as e:
+        log.debug("rpc_sync_transfer_index err: %s", e); return 0
 
-def rpc_get_erc20_balance(contract:str, owner:str):
+def rpc_index_balances(owner:str, contracts):
+    """Balances rebuilt from the Transfer index's net raw flow, for contracts with known decimals.
+    Only when the index covers the wallet from block 0: a window's net flow is not a balance."""
     try:
-        c=WEB3.eth.contract(address=_to_checksum(contract), abi=ERC20_ABI_MIN)
-        bal=c.functions.balanceOf(_to_checksum(owner)).call()
-        _,dec=rpc_get_symbol_decimals(contract)
-        return float(bal)/(10**dec)
-    except: return 0.0
-
-def rpc_discover_token_contracts_by_logs(owner:str, blocks_back:int, chunk:int):
-    if not WEB3: return set()
-    latest=rpc_block_number()
-    if not latest: return set()
-    start=max(1, latest - max(1, blocks_back))
-    found=set()
+        idx=transfer_index.get_index(); cov=idx.coverage(owner)
+        if not cov or cov["first_block"]>0: return {}
+        flows=idx.net_flow(owner)
+    except Exception as e:
+        log.debug("rpc_index_balances err: %s", e); return {}
+    out={}
+    for addr in contracts:
+        raw=flows.get(addr.lower()); m=_rpc_meta_cache.peek(addr.lower())
+        if not raw or raw<0 or m is None or m[0] is None: continue   # unknown decimals: no guess
+        out[addr.lower()]={"symbol":m[0],"decimals":m[1],"balance":float(raw)/(10**m[1])}
+    return out
+
+def rpc_discover_token_contracts_by_logs(owner:str, blocks_back:int, chunk:int, full:bool=False):
+    """Every contract the owner's Transfer logs touched, from the local index (only new blocks hit the RPC)."""
+    rpc_sync_transfer_index(owner, blocks_back, chunk, full=full)
     try:
-        wallet_topic="0x"+"0"*24+owner.lower().replace("0x","")
-        frm=start
-        while frm<=latest:
-            to=min(latest, frm+chunk-1)
-            for topics in [[TRANSFER_TOPIC0, wallet_topic],[TRANSFER_TOPIC0,None,wallet_topic]]:
-                try:
-                    logs=WEB3.eth.get_logs({"fromBlock":frm,"toBlock":to,"topics":topics})
-                    for lg in logs:
-                        addr=(lg.get("address") or "").lower()
-                        if addr.startswith("0x"): found.add(addr)
-                except: pass
-            frm=to+1
+        return transfer_index.get_index().contracts(owner)
     except Exception as e:
         log.debug("rpc_discover_token_contracts_by_logs err: %s", e)
-    return found
+        return set()
 
-def rpc_discover_wallet_tokens(window_blocks:int=None, chunk:int=None):
+def rpc_discover_wallet_tokens(window_blocks:int=None, chunk:int=None, full:bool=False):
     window_blocks=window_blocks or LOG_SCAN_BLOCKS
     chunk=chunk or LOG_SCAN_CHUNK
     if not rpc_init():
         log.warning("rpc_discover_wallet_tokens: RPC not connected."); return 0
     contracts=set()
     try:
-        head=rpc_block_number()
-        if head is None: raise RuntimeError("no block number")
-        start=max(0, head-window_blocks)
-        wallet_cs=_to_checksum(WALLET_ADDRESS)
-        topic_wallet="0x"+"0"*24+wallet_cs.lower().replace("0x","")
-        def _scan(from_topic,to_topic):
-            nonlocal contracts
-            frm=start
-            while frm<=head:
-                to=min(head, frm+chunk-1)
-                try:
-                    logs=WEB3.eth.get_logs({"fromBlock":frm,"toBlock":to,"topics":[TRANSFER_TOPIC0,from_topic,to_topic]})
-                    for lg in logs:
-                        addr=(lg.get("address") or "").lower()
-                        if addr.startswith("0x"): contracts.add(addr)
-                except Exception as e:
-                    log.debug("get_logs %s-%s: %s", frm,to,e); time.sleep(0.2)
-                frm=to+1
-        _scan(topic_wallet,None)
-        _scan(None,topic_wallet)
+        if rpc_block_number() is None: raise RuntimeError("no block number")
+        contracts=set(rpc_discover_token_contracts_by_logs(WALLET_ADDRESS, window_blocks, chunk, full=full))
     except Exception as e:
         log.warning("rpc_discover_wallet_tokens (RPC phase) failed: %s", e)
 
@@ -598,17 +550,13 @@ def rpc_discover_wallet_tokens(window_blocks:int=None, chunk:int=None):
         log.info("rpc_discover_wallet_tokens: no contracts discovered."); return 0
 
     found_positive=0
-    for addr in sorted(contracts):
-        try:
-            sym,dec=rpc_get_symbol_decimals(addr)
-            bal=rpc_get_erc20_balance(addr, WALLET_ADDRESS)
-            if bal>EPSILON:
-                _token_balances[addr]=bal
-                _token_meta[addr]={"symbol":sym or addr[:8].upper(),"decimals":dec or 18}
-                found_positive+=1
-        except Exception as e:
-            log.debug("discover balance/meta error %s: %s", addr, e)
-            continue
+    rows=rpc_read_wallet_batch(sorted(contracts), WALLET_ADDRESS)
+    for addr,row in rows.items():
+        bal=row["balance"]
+        if bal>EPSILON:
+            _token_balances[addr]=bal
+            _token_meta[addr]={"symbol":row["symbol"] or addr[:8].upper(),"decimals":row["decimals"] or 18}
+            found_positive+=1
     log.info("rpc_discover_wallet_tokens: positive-balance tokens discovered: %s", found_positive)
     return found_positive
 
@@ -617,9 +565,8 @@ def gather_all_known_token_contracts():
     known=set()
     for k in list(_token_meta.keys()):
         if isinstance(k,str) and k.startswith("0x"): known.add(k.lower())
-    symbol_to_contract=_build_history_maps()
-    for addr in symbol_to_contract.values():
-        if addr and addr.startswith("0x"): known.add(addr.lower())
+    _build_history_maps()
+    known |= _history_contracts()   # every token_addr in the ledger, incl. symbols shared by several contracts
     try:
         for t in fetch_latest_token_txs(limit=100) or []:
             addr=(t.get("contractAddress") or "").lower()
@@ -640,21 +587,26 @@ def compute_holdings_usd_via_rpc():
     total, breakdown, unrealized = 0.0, [], 0.0
     _=_build_history_maps()
     cro_amt=0.0
+    rows={}
     if rpc_init():
-        try: cro_amt=rpc_get_native_balance(WALLET_ADDRESS)
-        except: cro_amt=0.0
+        contracts=gather_all_known_token_contracts()
+        rows=rpc_read_wallet_batch(sorted(contracts), WALLET_ADDRESS, include_native=True)
+        cro_amt=float((rows.pop("CRO",None) or {}).get("balance") or 0.0)
+        for addr,row in rpc_index_balances(WALLET_ADDRESS, [c for c in contracts if c not in rows]).items():
+            rows.setdefault(addr,row)   # multicall missed these: fall back to the indexed net flow
     if cro_amt>EPSILON:
         cro_price=get_price_usd("CRO") or 0.0
         cro_val=cro_amt*cro_price; total+=cro_val
         breakdown.append({"token":"CRO","token_addr":None,"amount":cro_amt,"price_usd":cro_price,"usd_value":cro_val})
         rem_qty=_position_qty.get("CRO",0.0); rem_cost=_position_cost.get("CRO",0.0)
         if rem_qty>EPSILON and _nonzero(cro_price): unrealized += (cro_amt*cro_price - rem_cost)
-    contracts=gather_all_known_token_contracts()
-    for addr in sorted(list(contracts)):
+    held=[a for a in rows if (rows[a].get("balance") or 0)>EPSILON]
+    track_prices(held+["cro"]); prefetch_prices_usd(held)
+    for addr in sorted(rows):
         try:
-            bal=rpc_get_erc20_balance(addr, WALLET_ADDRESS)
+            bal=rows[addr]["balance"]
             if bal<=EPSILON: continue
-            sym,dec=rpc_get_symbol_decimals(addr)
+            sym=rows[addr]["symbol"]
             pr=get_price_usd(addr) or 0.0
             val=bal*pr; total+=val
             breakdown.append({"token":sym,"token_addr":addr,"amount":bal,"price_usd":pr,"usd_value":val})
@@ -665,44 +617,10 @@ def compute_holdings_usd_via_rpc():
     return total, breakdown, unrealized
 
 def rebuild_open_positions_from_history():
-    pos_qty, pos_cost = defaultdict(float), defaultdict(float)
-    symbol_to_contract=_build_history_maps()
-
-    def _update(pos_qty,pos_cost,token_key,signed_amount,price_usd):
-        qty=pos_qty[token_key]; cost=pos_cost[token_key]
-        if signed_amount>EPSILON:
-            pos_qty[token_key]=qty+signed_amount
-            pos_cost[token_key]=cost+signed_amount*(price_usd or 0.0)
-        elif signed_amount<-EPSILON and qty>EPSILON:
-            sell_qty=min(-signed_amount, qty)
-            avg_cost=(cost/qty) if qty>EPSILON else (price_usd or 0.0)
-            pos_qty[token_key]=qty-sell_qty
-            pos_cost[token_key]=max(0.0, cost - avg_cost*sell_qty)
-
-    files=[]
-    try:
-        for fn in os.listdir(DATA_DIR):
-            if fn.startswith("transactions_") and fn.endswith(".json"): files.append(fn)
-    except Exception as ex: log.exception("listdir data error: %s", ex)
-    files.sort()
-
-    for fn in files:
-        data=read_json(os.path.join(DATA_DIR,fn), default=None)
-        if not isinstance(data,dict): continue
-        for e in data.get("entries",[]):
-            sym_raw=(e.get("token") or "").strip()
-            addr_raw=(e.get("token_addr") or "").strip().lower()
-            amt=float(e.get("amount") or 0.0)
-            pr=float(e.get("price_usd") or 0.0)
-            symU=sym_raw.upper() if sym_raw else sym_raw
-            if addr_raw and addr_raw.startswith("0x"): key=addr_raw
-            else:
-                mapped=symbol_to_contract.get(sym_raw) or symbol_to_contract.get(symU)
-                key=mapped if (mapped and mapped.startswith("0x")) else (symU or sym_raw or "?")
-            _update(pos_qty,pos_cost,key,amt,pr)
-
-    for k,v in list(pos_qty.items()):
-        if abs(v)<1e-10: pos_qty[k]=0.0
+    """Open qty/cost per key over all history, from the persisted checkpoint (reports.positions):
+    only entries appended since the last call are replayed (full replay: scripts/rebuild_cost_basis.py)."""
+    _build_history_maps()   # seeds ledger prices for _history_price_fallback
+    pos_qty,pos_cost,_=get_position_checkpoint(eps=EPSILON).refresh()
     return pos_qty, pos_cost
 
 def compute_holdings_usd_from_history_positions():
@@ -724,6 +642,8 @@ def compute_holdings_usd_from_history_positions():
             p=_history_price_fallback(key if (isinstance(key,str) and key.startswith("0x")) else sym_hint, symbol_hint=sym_hint) or 0.0
         return float(p or 0.0)
 
+    held=[k for k,a in pos_qty.items() if float(a)>EPSILON]
+    track_prices(held); prefetch_prices_usd(held)
     for key,amt in pos_qty.items():
         amt=max(0.0,float(amt))
         if amt<=EPSILON: continue
@@ -784,11 +704,9 @@ def compute_holdings_merged():
 # ---------- Day report wrapper ----------
 def build_day_report_text():
     date_str=ymd()
-    path=data_file_for_today()
-    data=read_json(path, default={"date":date_str,"entries":[],"net_usd_flow":0.0,"realized_pnl":0.0})
-    entries=data.get("entries",[])
-    net_flow=float(data.get("net_usd_flow",0.0))
-    realized_today_total=float(data.get("realized_pnl",0.0))
+    entries=list(iter_ledger(date_str))
+    net_flow=sum(float(e.get("usd_value") or 0.0) for e in entries)
+    realized_today_total=sum(float(e.get("realized_pnl") or 0.0) for e in entries)
     holdings_total, breakdown, unrealized, _receipts = compute_holdings_merged()
     if not breakdown:
         holdings_total, breakdown, unrealized = compute_holdings_usd_from_history_positions()
@@ -817,6 +735,9 @@ def handle_native_tx(tx: dict):
     h=tx.get("hash")
     if not h or h in _seen_tx_hashes: return
     _seen_tx_hashes.add(h)
+    try:
+        if ledger_has_tx(h, type="native"): return   # recorded before a restart
+    except: pass
     val_raw=tx.get("value","0")
     try: amount_cro=int(val_raw)/(10**18)
     except:
@@ -834,6 +755,7 @@ def handle_native_tx(tx: dict):
     _token_balances["CRO"]+=sign*amount_cro
     _token_meta["CRO"]={"symbol":"CRO","decimals":18}
     realized=ledger_update_cost_basis(_position_qty,_position_cost,"CRO",sign*amount_cro,price,eps=EPSILON)
+    _add_realized_today(realized)
 
     link=CRONOS_TX.format(txhash=h)
     send_telegram(
@@ -877,7 +799,7 @@ def handle_erc20_tx(t: dict):
     except: decimals=18
     val_raw=t.get("value","0")
 
-    event_key=(h,token_addr,frm,to,str(val_raw),str(decimals))
+    event_key=(h.lower(),token_addr,frm,to,str(val_raw))   # no decimals: RPC and Etherscan copies of one transfer match
     if not _remember_token_event(event_key): return
     _remember_token_hash(h)
     if WALLET_ADDRESS not in (frm,to): return
@@ -902,6 +824,7 @@ def handle_erc20_tx(t: dict):
     _token_meta[key]={"symbol":symbol,"decimals":decimals}
 
     realized=ledger_update_cost_basis(_position_qty,_position_cost,key,sign*amount,(price or 0.0),eps=EPSILON)
+    _add_realized_today(realized)
     try:
         if _nonzero(price):
             ath_key=token_addr if token_addr else symbol
@@ -917,6 +840,7 @@ def handle_erc20_tx(t: dict):
     _mini_summary_line(key, symbol)
     if sign>0 and _nonzero(price):
         _guard[key]={"entry":float(price),"peak":float(price),"start_ts":time.time()}
+        _guard_stats[key]=RollingStats({"guard": GUARD_WINDOW_MIN*60}); _guard_stats[key].add(float(price))
 
     append_ledger({
         "time": dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -929,7 +853,8 @@ def handle_erc20_tx(t: dict):
 def slug(chain: str, pair_address: str) -> str: return f"{chain}/{pair_address}".lower()
 
 def fetch_pair(slg_str: str):
-    return safe_json(safe_get(f"{DEX_BASE_PAIRS}/{slg_str}", timeout=12))
+    key=("pair", (slg_str or "").lower())
+    return singleflight.do(key, lambda: safe_json(safe_get(f"{DEX_BASE_PAIRS}/{slg_str}", timeout=12)))
 
 def fetch_token_pairs(chain: str, token_address: str):
     data=safe_json(safe_get(f"{DEX_BASE_TOKENS}/{chain}/{token_address}", timeout=12)) or {}
@@ -939,85 +864,207 @@ def fetch_search(query: str):
     data=safe_json(safe_get(DEX_BASE_SEARCH, params={"q": query}, timeout=15)) or {}
     return data.get("pairs") or []
 
-def ensure_tracking_pair(chain: str, pair_address: str, meta: dict=None):
+def ensure_tracking_pair(chain: str, pair_address: str, meta: dict=None, pinned: bool=True):
     s=slug(chain, pair_address)
-    if s in _tracked_pairs: return
-    _tracked_pairs.add(s); _last_prices[s]=None; _last_pair_tx[s]=None
-    _price_history[s]=deque(maxlen=PRICE_WINDOW)
-    if meta: _known_pairs_meta[s]=meta
+    st=_pairs.add(s, meta, pinned=pinned)
+    if st is None: return
+    _pair_sched.add(s)
+    _warm_pair_stats(s, st)
     ds_link=f"https://dexscreener.com/{chain}/{pair_address}"
-    sym=None
-    if isinstance(meta,dict):
-        bt=meta.get("baseToken") or {}; sym=bt.get("symbol")
-    title=f"{sym} ({s})" if sym else s
+    title=f"{st.symbol} ({s})" if st.symbol else s
     send_telegram(f"🆕 Now monitoring pair: {title}\n{ds_link}")
 
-def update_price_history(slg, price):
-    hist=_price_history.get(slg) or deque(maxlen=PRICE_WINDOW)
-    _price_history[slg]=hist; hist.append(price); _last_prices[slg]=price
+def update_price_history(slg, price, volume=None):
+    st=_pairs.get(slg)
+    if st is None: return
+    if price!=st.last_price: _pairs.touch(slg)
+    st.stats.add(price, volume=volume); st.last_price=price
+    store=candles.get_store()
+    if store: store.record(slg, price, volume=volume or 0.0)
+
+def _warm_pair_stats(slg, st):
+    """Replay the last hour of 1m candles into a newly tracked pair's rolling windows (restart warm-up)."""
+    store=candles.get_store()
+    if not store: return
+    now=time.time()
+    try: recent=store.candles(slg, now-3600, now, "1m")
+    except Exception as e:
+        log.debug("candle warm-up %s failed: %s", slg, e); return
+    for c in recent:
+        st.stats.add(c.close, ts=min(now, c.ts+59), volume=c.volume or None)
+    if recent: st.last_price=recent[-1].close
+
+def _drop_pair(slg):
+    _pair_sched.remove(slg)
+    store=candles.get_store()
+    if store: store.forget(slg)
+
+def _price_window(slg, name):
+    st=_pairs.get(slg)
+    try: return st.stats.window(name, time.time()) if st else None
+    except KeyError: return st.stats.window("5m", time.time())
 
 def detect_spike(slg):
-    hist=_price_history.get(slg)
-    if not hist or len(hist)<2: return None
-    first, last = hist[0], hist[-1]
-    if not first: return None
-    pct=(last-first)/first*100.0
-    return pct if abs(pct)>=SPIKE_THRESHOLD else None
-
-_last_pair_alert={}
+    """Swing of the last price against the SPIKE_WINDOW min (up) or max (down), if it crosses SPIKE_THRESHOLD."""
+    w=_price_window(slg, SPIKE_WINDOW)
+    pct=w.swing_pct() if w else None
+    return pct if pct is not None and abs(pct)>=SPIKE_THRESHOLD else None
+
 PAIR_ALERT_COOLDOWN=60*10
+_last_pair_alert=TTLCache(4096, ttl=PAIR_ALERT_COOLDOWN)
 def _pair_cooldown_ok(key):
-    last=_last_pair_alert.get(key,0.0); now=time.time()
-    if now-last>=PAIR_ALERT_COOLDOWN:
-        _last_pair_alert[key]=now; return True
-    return False
+    return _last_pair_alert.add(key, time.time())
+
+def _pair_from_payload(data):
+    if not isinstance(data,dict): return None
+    if isinstance(data.get("pair"),dict): return data["pair"]
+    if isinstance(data.get("pairs"),list) and data["pairs"]: return data["pairs"][0]
+    return None
+
+def _process_pair_update(s, price_val, symbol=None, vol_h1=None, last_tx=None, volume=None):
+    """Feed one observed price / last trade of tracked pair `s` into the spike, move and new-trade alerts.
+    `volume` (base-token amount traded since the last update) weights the rolling VWAP when known."""
+    symbol=symbol or s
+    st=_pairs.get(s)
+    if st is None: return
+    if price_val and price_val>0:
+        prev=st.last_price
+        update_price_history(s, price_val, volume)
+        spike_pct=detect_spike(s)
+        if spike_pct is not None:
+            if not (MIN_VOLUME_FOR_ALERT and vol_h1 and vol_h1<MIN_VOLUME_FOR_ALERT):
+                if _pair_cooldown_ok(f"spike:{s}"):
+                    send_telegram(f"🚨 Spike on {symbol}: {spike_pct:.2f}% ({SPIKE_WINDOW})\nPrice: ${_format_price(price_val)}")
+        # net move over PRICE_MOVE_WINDOW; a sparse poll (one sample in the window) compares with the previous tick
+        w=_price_window(s, PRICE_MOVE_WINDOW)
+        delta, ref = (w.change_pct(), w.first) if w else (None, None)
+        if delta is None and prev and prev>0:
+            delta, ref = (price_val-prev)/prev*100.0, prev
+        if delta is not None and abs(delta)>=PRICE_MOVE_THRESHOLD and _pair_cooldown_ok(f"move:{s}"):
+            send_telegram(f"📈 Price move on {symbol}: {delta:.2f}%\nPrice: ${_format_price(price_val)} (from ${_format_price(ref)})")
+    if last_tx:
+        if st.last_tx!=last_tx:
+            _pairs.touch(s)
+            if _pair_cooldown_ok(f"trade:{s}"):
+                st.last_tx=last_tx
+                send_telegram(f"🔔 New trade on {symbol}\nTx: {CRONOS_TX.format(txhash=last_tx)}")
+
+def _process_pair_payload(s, pair):
+    try: price_val=float(pair.get("priceUsd") or 0)
+    except: price_val=None
+    st=_pairs.get(s)
+    if st is None: return price_val, None
+    st.apply_meta(pair)
+    _process_pair_update(s, price_val, st.symbol, st.vol_h1, (pair.get("lastTx") or {}).get("hash"))
+    return price_val, st.vol_h1
+
+def _fetch_pair_quiet(s):
+    try: return _pair_from_payload(fetch_pair(s))
+    except Exception as e:
+        log.debug("fetch_pair %s failed: %s", s, e); return None
+
+def fetch_pairs_many(slugs, spend=None):
+    """{slug: pair} for many tracked pairs: one Dexscreener multi-pair call per 30 pairs of a chain;
+    pairs the batch did not return are fetched one by one on a DEX_POLL_WORKERS pool, as many as
+    `spend(n)` (the scheduler's request budget) grants; the rest are left out."""
+    by_chain=defaultdict(list)
+    for s in slugs:
+        chain,_,addr=s.partition("/")
+        if addr: by_chain[chain].append(addr)
+    out={}
+    for chain,addrs in by_chain.items():
+        try: got=dexscreener.fetch_pairs_multi(chain, addrs)
+        except Exception as e:
+            log.debug("multi-pair fetch %s failed: %s", chain, e); got={}
+        for a,p in got.items(): out[slug(chain,a)]=p
+    rest=[s for s in slugs if s not in out]
+    if rest and spend is not None: rest=rest[:spend(len(rest))]
+    if rest:
+        with ThreadPoolExecutor(max_workers=min(DEX_POLL_WORKERS,len(rest)), thread_name_prefix="dexpair") as ex:
+            for s,pair in zip(rest, ex.map(_fetch_pair_quiet, rest)):
+                if pair: out[s]=pair
+    return out
+
+def _window_pct(s):
+    w=_price_window(s, SPIKE_WINDOW)
+    return w.swing_pct() if w else None
+
+def _sweep_pairs(slugs, sched=None):
+    got=fetch_pairs_many(slugs, spend=sched.spend if sched else None)   # fallbacks are charged to the budget
+    for s in slugs:
+        pair=got.get(s)
+        if not pair:
+            if sched: sched.missed(s)
+            continue
+        st=_pairs.get(s); prev=st.last_price if st else None
+        try: price_val,vol_h1=_process_pair_payload(s, pair)
+        except Exception as e:
+            log.debug("pairs loop error %s: %s", s, e); price_val=vol_h1=None
+        if sched:
+            move=(price_val-prev)/prev*100.0 if (prev and price_val) else None
+            sched.observe(s, price_val or None, vol_h1, move, _window_pct(s))
 
 def monitor_tracked_pairs_loop():
-    if not _tracked_pairs:
+    if not _pairs:
         log.info("No tracked pairs; monitor waits.")
     else:
-        send_telegram(f"🚀 Dex monitor started: {', '.join(sorted(_tracked_pairs))}")
+        send_telegram(f"🚀 Dex monitor started: {', '.join(sorted(_pairs))}")
+    if DEX_MONITOR_MODE=="events" and CRONOS_RPC_URL:
+        return monitor_tracked_pairs_events_loop()
+    # adaptive: each pair has its own next-due time (core.pair_scheduler); sleep until the next one
     while not shutdown_event.is_set():
-        if not _tracked_pairs:
-            time.sleep(DEX_POLL); continue
-        for s in list(_tracked_pairs):
+        try:
+            _pair_sched.sync(list(_pairs))
+            due=_pair_sched.pop_due()
+            if due: _sweep_pairs(due, _pair_sched)
+        except Exception as e:
+            log.debug("pairs loop error: %s", e)
+        _pair_sched.wait(DEX_POLL)
+
+def _pair_base_address(s):
+    """Base token address of tracked pair `s`; its Dexscreener meta is fetched once if discovery did not provide it."""
+    st=_pairs.get(s)
+    if st is None: return None
+    if not st.base_address: st.apply_meta(_pair_from_payload(fetch_pair(s)))
+    return st.base_address
+
+def _pair_event_price(follower, s, upd):
+    """(USD price, base-token volume) of the pair from the reserves of its last Sync (quote token priced
+    by the price service) and the amounts of its Swaps in the range."""
+    if upd.reserve0 is None: return None, None
+    base=_pair_base_address(s)
+    info=follower.pair_info(s.split("/",1)[1]) if base else None
+    px=info.price(base, upd.reserve0, upd.reserve1) if info else None
+    if not px: return None, None
+    quote=info.other(base); track_prices([quote])
+    q_usd=get_price_usd(quote)
+    return (px*q_usd if q_usd else None), info.base_volume(base, upd.volume0, upd.volume1)
+
+def monitor_tracked_pairs_events_loop():
+    """DEX_MONITOR_MODE=events: one eth_getLogs (Sync/Swap) per tick for every tracked Cronos pair;
+    only pairs whose reserves changed or that traded are processed. Non-Cronos pairs keep the DEX_POLL timer."""
+    follower=pair_follower.PairFollower(RPC())
+    last_poll=0.0
+    while not shutdown_event.is_set():
+        tracked=list(_pairs)
+        cronos=[s for s in tracked if s.startswith("cronos/")]
+        try: updates=follower.poll(s.split("/",1)[1] for s in cronos)
+        except Exception as e:
+            log.debug("pair events poll error: %s", e); updates={}
+        for s in cronos:
+            upd=updates.get(s.split("/",1)[1])
+            if not upd: continue
             try:
-                data=fetch_pair(s); 
-                if not data: continue
-                pair=None
-                if isinstance(data.get("pair"),dict): pair=data["pair"]
-                elif isinstance(data.get("pairs"),list) and data["pairs"]: pair=data["pairs"][0]
-                if not pair: continue
-                try: price_val=float(pair.get("priceUsd") or 0)
-                except: price_val=None
-                if price_val and price_val>0:
-                    update_price_history(s, price_val)
-                    spike_pct=detect_spike(s)
-                    if spike_pct is not None:
-                        try: vol_h1=float((pair.get("volume") or {}).get("h1") or 0)
-                        except: vol_h1=None
-                        if not (MIN_VOLUME_FOR_ALERT and vol_h1 and vol_h1<MIN_VOLUME_FOR_ALERT):
-                            bt=pair.get("baseToken") or {}; symbol=bt.get("symbol") or s
-                            if _pair_cooldown_ok(f"spike:{s}"):
-                                send_telegram(f"🚨 Spike on {symbol}: {spike_pct:.2f}%\nPrice: ${_format_price(price_val)}")
-                                _price_history[s].clear(); _last_prices[s]=price_val
-                prev=_last_prices.get(s)
-                if prev and price_val and prev>0:
-                    delta=(price_val-prev)/prev*100.0
-                    if abs(delta)>=PRICE_MOVE_THRESHOLD and _pair_cooldown_ok(f"move:{s}"):
-                        bt=pair.get("baseToken") or {}; symbol=bt.get("symbol") or s
-                        send_telegram(f"📈 Price move on {symbol}: {delta:.2f}%\nPrice: ${_format_price(price_val)} (prev ${_format_price(prev)})")
-                        _last_prices[s]=price_val
-                last_tx=(pair.get("lastTx") or {}).get("hash")
-                if last_tx:
-                    prev_tx=_last_pair_tx.get(s)
-                    if prev_tx!=last_tx and _pair_cooldown_ok(f"trade:{s}"):
-                        _last_pair_tx[s]=last_tx
-                        bt=pair.get("baseToken") or {}; symbol=bt.get("symbol") or s
-                        send_telegram(f"🔔 New trade on {symbol}\nTx: {CRONOS_TX.format(txhash=last_tx)}")
+                price_val,volume=_pair_event_price(follower, s, upd)
+                st=_pairs.get(s)
+                if st: _process_pair_update(s, price_val, st.symbol, st.vol_h1, upd.last_swap_tx, volume)
             except Exception as e:
-                log.debug("pairs loop error %s: %s", s, e)
-        for _ in range(DEX_POLL):
+                log.debug("pair events error %s: %s", s, e)
+        others=[s for s in tracked if not s.startswith("cronos/")]
+        if others and time.time()-last_poll>=DEX_POLL:
+            last_poll=time.time()
+            _sweep_pairs(others)
+        for _ in range(DEX_EVENTS_POLL):
             if shutdown_event.is_set(): break
             time.sleep(1)
 
@@ -1063,14 +1110,16 @@ def discovery_loop():
     send_telegram("🧭 Dexscreener auto-discovery enabled (Cronos).")
     while not shutdown_event.is_set():
         try:
+            for s in _pairs.evict_stale():
+                _drop_pair(s); log.info("Dropped stale pair %s", s)
             found=fetch_search(DISCOVER_QUERY); adopted=0
             for p in found or []:
                 if not _pair_passes_filters(p): continue
                 pair_addr=p.get("pairAddress")
                 if not pair_addr: continue
                 s=slug("cronos", pair_addr)
-                if s in _tracked_pairs: continue
-                ensure_tracking_pair("cronos", pair_addr, meta=p)
+                if s in _pairs: continue
+                ensure_tracking_pair("cronos", pair_addr, meta=p, pinned=False)
                 adopted+=1
                 if adopted>=DISCOVER_LIMIT: break
         except Exception as e:
@@ -1081,10 +1130,7 @@ def discovery_loop():
 
 # ---------- Alerts & Guard ----------
 def _cooldown_ok(key):
-    last=_alert_last_sent.get(key,0.0)
-    if time.time()-last>=COOLDOWN_SEC:
-        _alert_last_sent[key]=time.time(); return True
-    return False
+    return _alert_last_sent.add(key, time.time())
 
 def get_wallet_balances_snapshot():
     balances={}
@@ -1114,9 +1160,8 @@ def alerts_monitor_loop():
                         send_telegram(f"🚀 Pump Alert {sym} 24h {ch24:.2f}%\nPrice ${_format_price(price)}\n{url}")
                     if ch24<=DUMP_ALERT_24H_PCT and _cooldown_ok(f"24h_dump:{sym}"):
                         send_telegram(f"⚠️ Dump Alert {sym} 24h {ch24:.2f}%\nPrice ${_format_price(price)}\n{url}")
-            data=read_json(data_file_for_today(), default={"entries":[]})
             seen=set()
-            for e in data.get("entries",[]):
+            for e in ledger_today():
                 if float(e.get("amount") or 0)>0:
                     sym=(e.get("token") or "?").upper()
                     addr=(e.get("token_addr") or "").lower()
@@ -1143,6 +1188,7 @@ def guard_monitor_loop():
     while not shutdown_event.is_set():
         try:
             dead=[]
+            track_prices(list(_guard)); prefetch_prices_usd(list(_guard))
             for key,st in list(_guard.items()):
                 if time.time()-st["start_ts"]>GUARD_WINDOW_MIN*60:
                     dead.append(key); continue
@@ -1152,8 +1198,10 @@ def guard_monitor_loop():
                     meta=_token_meta.get(key,{}); sym=meta.get("symbol") or key
                     price=get_price_usd(sym) or 0.0
                 if not price or price<=0: continue
-                entry,peak=st["entry"],st["peak"]
-                if price>peak: st["peak"]=price; peak=price
+                rs=_guard_stats.get(key)
+                if rs is None: rs=_guard_stats[key]=RollingStats({"guard": GUARD_WINDOW_MIN*60}); rs.add(st["entry"], st["start_ts"])
+                rs.add(price)
+                entry=st["entry"]; peak=st["peak"]=rs.window("guard").max or price   # rolling max over the guard window
                 pct_from_entry=(price-entry)/entry*100.0 if entry>0 else 0.0
                 trail_from_peak=(price-peak)/peak*100.0 if peak>0 else 0.0
                 sym=_token_meta.get(key,{}).get("symbol") or ("CRO" if key=="CRO" else (key[:6] if isinstance(key,str) else "ASSET"))
@@ -1163,7 +1211,7 @@ def guard_monitor_loop():
                     send_telegram(f"🔻 GUARD Drop {sym} {pct_from_entry:.2f}% (entry ${_format_price(entry)} → ${_format_price(price)})")
                 if trail_from_peak<=GUARD_TRAIL_DROP_PCT and _cooldown_ok(f"guard:trail:{key}"):
                     send_telegram(f"🟠 GUARD Trail {sym} {trail_from_peak:.2f}% from peak ${_format_price(peak)} → ${_format_price(price)}")
-            for k in dead: _guard.pop(k,None)
+            for k in dead: _guard.pop(k,None); _guard_stats.pop(k,None)
         except Exception as e:
             log.exception("guard monitor error: %s", e)
         for _ in range(15):
@@ -1172,11 +1220,8 @@ def guard_monitor_loop():
 
 # ---------- Today per-asset summary (/dailysum) ----------
 def summarize_today_per_asset():
-    path=data_file_for_today()
-    data=read_json(path, default={"date": ymd(), "entries":[]})
-    entries=data.get("entries",[])
     agg={}
-    for e in entries:
+    for e in ledger_today():
         sym=(e.get("token") or "?").upper()
         addr=(e.get("token_addr") or "").lower()
         key=addr if addr.startswith("0x") else sym
@@ -1202,6 +1247,7 @@ def summarize_today_per_asset():
 
     result=[]
     _,_,_,_ = compute_holdings_merged()
+    prefetch_prices_usd([rec["token_addr"] for rec in agg.values() if rec["token_addr"]])
     for key,rec in agg.items():
         if rec["token_addr"]:
             price_now=get_price_usd(rec["token_addr"]) or rec["last_price_seen"]; gkey=rec["token_addr"]
@@ -1243,41 +1289,16 @@ def _format_daily_sum_message():
     if _nonzero(tot_unrl): lines.append(f"*Σύνολο unreal (open τώρα):* ${_format_amount(tot_unrl)}")
     return "\n".join(lines)
     # ---------- Totals (today|month|all) ----------
-def _iter_ledger_files_for_scope(scope:str):
-    files=[]
-    if scope=="today":
-        files=[f"transactions_{ymd()}.json"]
-    elif scope=="month":
+def _scope_days(scope:str):
+    if scope=="today": return ymd(), ymd()
+    if scope=="month":
         pref=month_prefix()
-        try:
-            for fn in os.listdir(DATA_DIR):
-                if fn.startswith(f"transactions_{pref}") and fn.endswith(".json"): files.append(fn)
-        except: pass
-    else:
-        try:
-            for fn in os.listdir(DATA_DIR):
-                if fn.startswith("transactions_") and fn.endswith(".json"): files.append(fn)
-        except: pass
-    files.sort()
-    return [os.path.join(DATA_DIR,fn) for fn in files]
-
-def _load_entries_for_totals(scope:str):
-    entries=[]
-    for path in _iter_ledger_files_for_scope(scope):
-        data=read_json(path, default=None)
-        if not isinstance(data,dict): continue
-        for e in data.get("entries",[]):
-            sym=(e.get("token") or "?").upper()
-            amt=float(e.get("amount") or 0.0)
-            usd=float(e.get("usd_value") or 0.0)
-            realized=float(e.get("realized_pnl") or 0.0)
-            side="IN" if amt>0 else "OUT"
-            entries.append({"asset":sym,"side":side,"qty":abs(amt),"usd":usd,"realized_usd":realized})
-    return entries
+        return f"{pref}-01", f"{pref}-31"
+    return None, None
 
 def format_totals(scope:str):
     scope=(scope or "all").lower()
-    rows=aggregate_per_asset(_load_entries_for_totals(scope))
+    rows=history_manifest.get_manifest().totals("ledger", *_scope_days(scope))   # cached per range, only new ledger rows are added
     if not rows: return f"📊 Totals per Asset — {scope.capitalize()}: (no data)"
     lines=[f"📊 Totals per Asset — {scope.capitalize()}:"]
     for i,r in enumerate(rows,1):
@@ -1292,21 +1313,83 @@ def format_totals(scope:str):
     return "\n".join(lines)
 
 # ---------- Wallet monitor loop ----------
+def _make_block_follower():
+    if not (CRONOS_RPC_URL and WALLET_ADDRESS): return None
+    try: return block_follower.BlockFollower(RPC(), WALLET_ADDRESS)
+    except Exception as e:
+        log.debug("block follower unavailable: %s", e); return None
+
+def _make_rpc_ingestor():
+    if WALLET_INGEST!="rpc" or not (CRONOS_RPC_URL and WALLET_ADDRESS): return None
+    try: return rpc_ingest.RpcIngestor(RPC(), WALLET_ADDRESS)
+    except Exception as e:
+        log.debug("rpc ingestor unavailable: %s", e); return None
+
 def wallet_monitor_loop():
     send_telegram("📡 Wallet monitor started.")
     last_native_hashes=set()
     last_token_hashes=set()
+
+    def _ingest_native(txs):
+        for tx in txs:
+            h=tx.get("hash")
+            if h and h not in last_native_hashes:
+                last_native_hashes.add(h); handle_native_tx(tx)
+
+    def _ingest_tokens(txs):
+        # per transfer, not per hash: a swap has several legs under one hash (handle_erc20_tx dedupes events)
+        for t in txs:
+            h=t.get("hash")
+            if h:
+                last_token_hashes.add(h); handle_erc20_tx(t)
+
+    # WALLET_INGEST=rpc: blocks/logs straight from the node are the hot path,
+    # Etherscan txlist/tokentx only reconcile every WALLET_TOKEN_RECONCILE s.
+    ingestor=_make_rpc_ingestor()
+    # Etherscan mode: tokentx only when a new block's logsBloom may hold a wallet Transfer
+    # (or every WALLET_TOKEN_RECONCILE s). Native CRO emits no logs -> stays on the timer.
+    follower=None if ingestor else _make_block_follower()
+    pending_token_tx={}  # tx hash seen on-chain -> first seen; refetch until Etherscan lists it
+    last_token_fetch=0.0
+    last_index_sync=0.0
+    positions_day=None
     while not shutdown_event.is_set():
         try:
-            for tx in fetch_latest_wallet_txs(limit=25):
-                h=tx.get("hash")
-                if h and h not in last_native_hashes:
-                    last_native_hashes.add(h); handle_native_tx(tx)
-            for t in fetch_latest_token_txs(limit=100):
-                h=t.get("hash")
-                if h and h not in last_token_hashes:
-                    last_token_hashes.add(h); handle_erc20_tx(t)
-            _replay_today_cost_basis()
+            now=time.time()
+            # keep the Transfer index at the head (only blocks after its coverage are scanned)
+            if TRANSFER_INDEX_SYNC>0 and CRONOS_RPC_URL and WALLET_ADDRESS and now-last_index_sync>=TRANSFER_INDEX_SYNC:
+                last_index_sync=now; rpc_sync_transfer_index(WALLET_ADDRESS, LOG_SCAN_BLOCKS, LOG_SCAN_CHUNK)
+            # today's positions: one replay at start / day rollover, the tx handlers keep them current
+            if positions_day!=ymd(): positions_day=ymd(); _replay_today_cost_basis()
+            if ingestor is not None:
+                reconcile=now-last_token_fetch>=WALLET_TOKEN_RECONCILE
+                try:
+                    native,tokens=ingestor.poll()
+                    _ingest_native(native); _ingest_tokens(tokens)
+                except Exception as e:
+                    log.warning("rpc ingest error, falling back to Etherscan: %s", e); reconcile=True
+                if reconcile:
+                    last_token_fetch=now
+                    _ingest_native(fetch_latest_wallet_txs(limit=25))
+                    _ingest_tokens(fetch_latest_token_txs(limit=100))
+            else:
+                _ingest_native(fetch_latest_wallet_txs(limit=25))
+                token_due=follower is None or now-last_token_fetch>=WALLET_TOKEN_RECONCILE
+                if follower is not None:
+                    try:
+                        hits=follower.poll()
+                        for lg in (follower.transfer_logs(hits) if hits else []):
+                            txh=(lg.get("transactionHash") or "").lower()
+                            if txh and txh not in last_token_hashes: pending_token_tx.setdefault(txh, now)
+                        if follower.retry_blocks: token_due=True   # eth_getLogs failed: re-read next poll, tokentx now
+                    except Exception as e:
+                        log.debug("block follower poll error: %s", e); token_due=True
+                if pending_token_tx: token_due=True
+                if token_due:
+                    last_token_fetch=now
+                    _ingest_tokens(fetch_latest_token_txs(limit=100))
+                    for txh,seen in list(pending_token_tx.items()):
+                        if txh in last_token_hashes or now-seen>WALLET_TOKEN_RECONCILE: pending_token_tx.pop(txh,None)
         except Exception as e:
             log.exception("wallet monitor error: %s", e)
         for _ in range(WALLET_POLL):
@@ -1379,11 +1462,12 @@ def _handle_command(text: str):
             f"LOGSCANBLOCKS={LOG_SCAN_BLOCKS} LOGSCANCHUNK={LOG_SCAN_CHUNK}\n"
             f"TZ={TZ} INTRADAYHOURS={INTRADAY_HOURS} EOD={EOD_HOUR:02d}:{EOD_MINUTE:02d}\n"
             f"Alerts every: {ALERTS_INTERVAL_MIN}m | Pump/Dump: {PUMP_ALERT_24H_PCT}/{DUMP_ALERT_24H_PCT}\n"
-            f"Tracked pairs: {', '.join(sorted(_tracked_pairs)) or '(none)'}"
+            f"Tracked pairs: {', '.join(sorted(_pairs)) or '(none)'}"
         )
     elif low.startswith("/rescan"):
-        cnt=rpc_discover_wallet_tokens()
-        send_telegram(f"🔄 Rescan done. Positive tokens: {cnt}")
+        full=(low.split()[1:2]==["full"])
+        cnt=rpc_discover_wallet_tokens(full=full)
+        send_telegram(f"🔄 {'Full rescan' if full else 'Rescan'} done. Positive tokens: {cnt}")
     elif low.startswith("/holdings") or low.startswith("/show_wallet_assets") or low.startswith("/showwalletassets") or low=="/show":
         send_telegram(_fmt_holdings_text())
     elif low.startswith("/dailysum") or low.startswith("/showdaily"):
@@ -1418,17 +1502,17 @@ def _handle_command(text: str):
                     send_telegram("Use format cronos/<pairAddress>")
             elif rest.startswith("rm "):
                 pair=rest.split(" ",1)[1].strip().lower()
-                if pair in _tracked_pairs:
-                    _tracked_pairs.remove(pair); send_telegram(f"🗑 Removed {pair}")
+                if _pairs.remove(pair):
+                    _drop_pair(pair); send_telegram(f"🗑 Removed {pair}")
                 else: send_telegram("Pair not tracked.")
             elif rest.strip()=="list":
-                send_telegram("👁 Tracked:\n"+"\n".join(sorted(_tracked_pairs)) if _tracked_pairs else "None.")
+                send_telegram("👁 Tracked:\n"+"\n".join(sorted(_pairs)) if _pairs else "None.")
             else:
                 send_telegram("Usage: /watch add <cronos/pair> | /watch rm <cronos/pair> | /watch list")
         except Exception as e:
             send_telegram(f"Watch error: {e}")
     else:
-        send_telegram("❓ Commands: /status /diag /rescan /holdings /show /dailysum /report /totals [today|month|all] /totalstoday /totalsmonth /pnl [scope] /watch ...")
+        send_telegram("❓ Commands: /status /diag /rescan [full] /holdings /show /dailysum /report /totals [today|month|all] /totalstoday /totalsmonth /pnl [scope] /watch ...")
 
 # ---------- Schedulers (Intraday/EOD) ----------
 def _scheduler_loop():
@@ -1450,7 +1534,11 @@ def _scheduler_loop():
 def _graceful_exit(signum, frame):
     try: send_telegram("🛑 Shutting down.")
     except: pass
-    shutdown_event.set()
+    shutdown_event.set(); _pair_sched.wake()
+    try:
+        store=candles.get_store()
+        if store: store.flush()
+    except: pass
 
 def run_forever() -> None:
     while not shutdown_event.is_set():
@@ -13,10 +13,7 @@ from typing import Any, Dict, List, Optional, Set
 
 import aiohttp
 
-try:
-    from web3 import Web3
-except Exception:
-    Web3 = None  # optional
+from core.rpc_client import get_client
 
 try:
     from core.pricing import get_spot_usd
@@ -34,7 +31,7 @@ WALLET_LC = WALLET.lower() if WALLET else ""
 
 EXPLORER_BASE = os.getenv("CRONOS_EXPLORER_API_BASE", "https://cronos.org/explorer/api").rstrip("/")
 EXPLORER_KEY = os.getenv("CRONOS_EXPLORER_API_KEY", "").strip()
-RPC_URL = os.getenv("CRONOS_RPC_URL", "https://cronos-evm-rpc.publicnode.com").split(",")[0].strip()
+RPC_URL = os.getenv("CRONOS_RPC_URL", "https://cronos-evm-rpc.publicnode.com").strip()  # may list several (core.rpc_client)
 
 MONITOR_POLL = float(os.getenv("MONITOR_POLL_SECONDS", os.getenv("RT_POLL_SEC", "4")))
 getcontext().prec = 36
@@ -96,11 +93,10 @@ def _fmt_price(p: Decimal) -> str:
         return str(p)
 
 async def _seed_block(logger):
-    if not RPC_URL or not Web3:
+    if not RPC_URL:
         return None
     try:
-        w3 = Web3(Web3.HTTPProvider(RPC_URL))
-        blk = int(w3.eth.block_number)
+        blk = await asyncio.to_thread(get_client(RPC_URL).block_number)
         logger.info(f"seed current block {blk}")
         return blk
     except Exception as e:
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-from collections import defaultdict
 from decimal import Decimal, InvalidOperation
 from typing import Any, Dict, Iterable, List, Optional
 
@@ -18,28 +17,47 @@ def _normalize_wallet(value: Optional[str]) -> str:
     return (value or "").strip().lower()
 
 
-def aggregate_per_asset(
+Accumulator = Dict[str, Dict[str, Any]]  # asset -> running sums, see accumulate()
+
+
+def _new_bucket() -> Dict[str, Any]:
+    return {
+        "in_qty": Decimal("0"),
+        "out_qty": Decimal("0"),
+        "in_usd": Decimal("0"),
+        "out_usd": Decimal("0"),
+        "realized_usd": Decimal("0"),
+        "tx_count": 0,
+    }
+
+
+def _add(acc: Accumulator, asset: str, side: str, qty: Any, usd: Any, realized: Any) -> None:
+    bucket = acc.get(asset)
+    if bucket is None:
+        bucket = acc[asset] = _new_bucket()
+    if side == "IN":
+        bucket["in_qty"] += _to_decimal(qty)
+        bucket["in_usd"] += _to_decimal(usd)
+    elif side == "OUT":
+        bucket["out_qty"] += _to_decimal(qty)
+        bucket["out_usd"] += _to_decimal(usd)
+    # SWAP and unsupported sides are still counted to highlight activity
+    bucket["tx_count"] += 1
+    bucket["realized_usd"] += _to_decimal(realized)
+
+
+def accumulate(
+    acc: Accumulator,
     entries: Iterable[Dict[str, Any]] | None,
     wallet: Optional[str] = None,
-) -> List[Dict[str, Any]]:
-    """Aggregate buy/sell ledger entries per asset.
+) -> Accumulator:
+    """Add buy/sell ledger entries to the running per-asset sums in `acc`.
 
-    The function keeps Decimal values so downstream formatters/tests can
-    perform precise arithmetic without string parsing.
+    Sums are added in entry order, so feeding entries in several calls gives
+    exactly the sums (Decimal exponents included) of one call over all of them.
     """
 
     normalized_wallet = _normalize_wallet(wallet)
-    acc: Dict[str, Dict[str, Decimal]] = defaultdict(
-        lambda: {
-            "in_qty": Decimal("0"),
-            "out_qty": Decimal("0"),
-            "in_usd": Decimal("0"),
-            "out_usd": Decimal("0"),
-            "realized_usd": Decimal("0"),
-            "tx_count": Decimal("0"),
-        }
-    )
-
     for entry in entries or []:
         if not isinstance(entry, dict):
             continue
@@ -50,31 +68,51 @@ def aggregate_per_asset(
         }:
             continue
 
-        asset = str(entry.get("asset") or "?").upper()
-        if not asset:
-            asset = "?"
-
+        asset = str(entry.get("asset") or "?").upper() or "?"
         side = str(entry.get("side") or "").upper()
-        qty = _to_decimal(entry.get("qty"))
-        usd = _to_decimal(entry.get("usd"))
-        realized = _to_decimal(entry.get("realized_usd"))
-
-        bucket = acc[asset]
-        if side == "IN":
-            bucket["in_qty"] += qty
-            bucket["in_usd"] += usd
-            bucket["tx_count"] += Decimal(1)
-        elif side == "OUT":
-            bucket["out_qty"] += qty
-            bucket["out_usd"] += usd
-            bucket["tx_count"] += Decimal(1)
-        elif side == "SWAP":
-            bucket["tx_count"] += Decimal(1)
-        else:
-            # ignore unsupported side but still count to highlight activity
-            bucket["tx_count"] += Decimal(1)
-
-        bucket["realized_usd"] += realized
+        _add(acc, asset, side, entry.get("qty"), entry.get("usd"), entry.get("realized_usd"))
+    return acc
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def accumulate_ledger(
+    acc: Accumulator,
+    entries: Iterable[Dict[str, Any]] | None,
+    wallet: Optional[str] = None,
+) -> Accumulator:
+    """accumulate() over the wallet ledger's own rows (token / amount / usd_value /
+    realized_pnl): a positive amount is IN, anything else OUT of abs(amount).
+
+    Same sums as mapping every row to an accumulate() entry first, without
+    building that dict per row.
+    """
+
+    normalized_wallet = _normalize_wallet(wallet)
+    for entry in entries or []:
+        if not isinstance(entry, dict):
+            continue
+        if normalized_wallet and _normalize_wallet(entry.get("wallet")) not in ("", normalized_wallet):
+            continue
+        amount = _float(entry.get("amount"))
+        _add(
+            acc,
+            str(entry.get("token") or "?").upper() or "?",
+            "IN" if amount > 0 else "OUT",
+            abs(amount),
+            _float(entry.get("usd_value")),
+            _float(entry.get("realized_pnl")),
+        )
+    return acc
+
+
+def rows_from(acc: Accumulator) -> List[Dict[str, Any]]:
+    """Per-asset rows of an accumulator, largest net USD first."""
 
     rows: List[Dict[str, Any]] = []
     for asset, values in acc.items():
@@ -82,8 +120,6 @@ def aggregate_per_asset(
         out_qty = values["out_qty"]
         in_usd = values["in_usd"]
         out_usd = values["out_usd"]
-        realized_usd = values["realized_usd"]
-        tx_count = int(values["tx_count"])
         rows.append(
             {
                 "asset": asset,
@@ -93,8 +129,8 @@ def aggregate_per_asset(
                 "in_usd": in_usd,
                 "out_usd": out_usd,
                 "net_usd": in_usd - out_usd,
-                "realized_usd": realized_usd,
-                "tx_count": tx_count,
+                "realized_usd": values["realized_usd"],
+                "tx_count": int(values["tx_count"]),
             }
         )
 
@@ -102,6 +138,42 @@ def aggregate_per_asset(
     return rows
 
 
+def dump_accumulator(acc: Accumulator) -> Dict[str, List[Any]]:
+    """JSON-safe form of an accumulator; Decimal strings round-trip exactly."""
+    return {
+        asset: [str(b["in_qty"]), str(b["out_qty"]), str(b["in_usd"]), str(b["out_usd"]),
+                str(b["realized_usd"]), int(b["tx_count"])]
+        for asset, b in acc.items()
+    }
+
+
+def load_accumulator(data: Dict[str, List[Any]]) -> Accumulator:
+    acc: Accumulator = {}
+    for asset, (in_qty, out_qty, in_usd, out_usd, realized, count) in data.items():
+        acc[asset] = {
+            "in_qty": Decimal(in_qty),
+            "out_qty": Decimal(out_qty),
+            "in_usd": Decimal(in_usd),
+            "out_usd": Decimal(out_usd),
+            "realized_usd": Decimal(realized),
+            "tx_count": int(count),
+        }
+    return acc
+
+
+def aggregate_per_asset(
+    entries: Iterable[Dict[str, Any]] | None,
+    wallet: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Aggregate buy/sell ledger entries per asset.
+
+    The function keeps Decimal values so downstream formatters/tests can
+    perform precise arithmetic without string parsing.
+    """
+
+    return rows_from(accumulate({}, entries, wallet=wallet))
+
+
 def totals(rows: Iterable[Dict[str, Any]]) -> Dict[str, Decimal]:
     total = {
         "in_qty": Decimal("0"),
@@ -3,7 +3,7 @@
 from decimal import Decimal, InvalidOperation
 from typing import Any, Dict, Iterable, List, Optional
 
-from core.tz import ymd
+from core.tz import now_gr, ymd
 from reports.aggregates import aggregate_per_asset, totals
 from reports.ledger import read_ledger
 
@@ -79,6 +79,44 @@ def _top_movers(rows: Iterable[Dict[str, Any]], limit: int = 5) -> List[str]:
     return movers
 
 
+def _intraday_moves(assets: Iterable[str], limit: int = 5) -> List[str]:
+    """Move since local midnight per asset from the persisted candles (no API calls)."""
+    try:
+        from core.candles import get_store  # local import: optional at report time
+        from core.price_service import norm_key
+
+        store = get_store()
+        since = now_gr().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    except Exception:
+        return []
+    if store is None:
+        return []
+
+    moves = []
+    seen = set()
+    for asset in assets:
+        key = norm_key(asset)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        try:
+            got = store.candles(key, since)
+        except Exception:
+            continue
+        if not got or not got[0].open:
+            continue
+        first, last = got[0].open, got[-1].close
+        low, high = min(c.low for c in got), max(c.high for c in got)
+        moves.append(((last - first) / first * 100.0, str(asset).upper(), first, last, low, high))
+
+    moves.sort(key=lambda m: abs(m[0]), reverse=True)
+    return [
+        f" - {asset}: {pct:+.2f}% ({_fmt_money(_to_decimal(first))} → {_fmt_money(_to_decimal(last))},"
+        f" range {_fmt_money(_to_decimal(low))}–{_fmt_money(_to_decimal(high))})"
+        for pct, asset, first, last, low, high in moves[:limit]
+    ]
+
+
 def _build_totals_line(totals_row: Dict[str, Any]) -> str:
     in_usd = _fmt_money(_to_decimal(totals_row.get("in_usd")))
     out_usd = _fmt_money(_to_decimal(totals_row.get("out_usd")))
@@ -150,6 +188,11 @@ def build_day_report_text() -> str:
     lines.append("")
     lines.append("Top movers:")
     lines.extend(_top_movers(rows))
+    intraday = _intraday_moves([str(row.get("asset") or "") for row in rows] + list(snapshot))
+    if intraday:
+        lines.append("")
+        lines.append("Intraday moves:")
+        lines.extend(intraday)
     lines.append("")
     lines.append(_build_totals_line(totals_row))
 
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+reports/history_manifest.py — what the bot derives from the whole ledger, cached per day.
+
+main._build_history_maps used to parse every ledger day on every call (three
+times per /holdings). Here each day's derived data is kept in
+MANIFEST_FILE next to its reports.ledger.day_stamps() stamp (inode, mtime
+and size, or edit version and row ids on SQLite) and the offset it was read
+up to:
+
+    symbols     symbol -> contracts seen with it
+    prices      last price_usd per key (0x contract and raw symbol), in order
+    contracts   every token_addr seen
+
+`maps()` re-stats the days and re-reads only what changed: the appended
+tail of the newest day when it only grew, or the whole of any other day
+whose stamp changed.
+Days that are unchanged cost one stat. The merged result
+(`HistoryMaps`) is rebuilt only when a day changed. Within MANIFEST_REUSE_SEC
+of the last check the same object is returned without touching the disk,
+so every caller in one request shares one pass.
+
+`totals()` serves per-asset totals (reports.aggregates rows) the same way.
+Each requested (kind, wallet, day range) keeps the running accumulator of
+aggregate_per_asset over the entries read so far, persisted with the days.
+Appended tails and new days are added on top of it in ledger order, so the
+rows are exactly what one aggregate_per_asset pass would give. When a day
+it already covers is edited or removed, the accumulator is rebuilt from its
+first day. The MANIFEST_TOTALS_MAX most recently used ranges are kept.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+from reports import aggregates, ledger
+
+logger = logging.getLogger("reports.history_manifest")
+
+MANIFEST_FILE = ledger.LEDGER_DIR / "history_manifest.json"
+MANIFEST_REUSE_SEC = float(os.getenv("MANIFEST_REUSE_SEC", "2") or 2)
+MANIFEST_TOTALS_MAX = max(1, int(os.getenv("MANIFEST_TOTALS_MAX", "8") or 8))
+_VERSION = 2
+
+# totals() kinds: how a ledger entry is added to an accumulator
+_ACCUMULATE = {
+    "ledger": aggregates.accumulate_ledger,  # token / amount / usd_value / realized_pnl rows
+    "entries": aggregates.accumulate,  # asset / side / qty / usd / realized_usd rows
+}
+
+
+class HistoryMaps(NamedTuple):
+    symbol_to_contract: Dict[str, str]  # symbols seen with exactly one contract
+    last_price: Dict[str, float]  # key -> last ledger price, oldest first
+    contracts: Set[str]
+
+
+def _new_day() -> Dict[str, Any]:
+    return {"stamp": None, "offset": None, "symbols": {}, "prices": {}, "contracts": []}
+
+
+def _new_totals(kind: str, wallet: str, first: Optional[str], last: Optional[str]) -> Dict[str, Any]:
+    # through/offset: the last day added and the offset read up to in it
+    return {"kind": kind, "wallet": wallet, "first": first, "last": last,
+            "ready": False, "through": None, "offset": None, "acc": {}}
+
+
+def _covers(t: Dict[str, Any], day: str) -> bool:
+    return (t["first"] is None or t["first"] <= day) and (t["last"] is None or day <= t["last"])
+
+
+def _fold(day: Dict[str, Any], e: Dict[str, Any]) -> None:
+    sym = (e.get("token") or "").strip()
+    addr = (e.get("token_addr") or "").strip().lower()
+    is_addr = addr.startswith("0x")
+    try:
+        p = float(e.get("price_usd") or 0.0)
+    except (TypeError, ValueError):
+        p = 0.0
+    prices = day["prices"]
+    if p > 0:
+        for k in ((addr,) if is_addr else ()) + ((sym,) if sym else ()):
+            prices.pop(k, None)  # keep dict order = order of last occurrence
+            prices[k] = p
+    if is_addr:
+        if addr not in day["contracts"]:
+            day["contracts"].append(addr)
+        if sym:
+            seen = day["symbols"].setdefault(sym, [])
+            if addr not in seen:
+                seen.append(addr)
+
+
+class HistoryManifest:
+    def __init__(self, path=None, reuse_sec: float = MANIFEST_REUSE_SEC, clock: Callable[[], float] = time.monotonic):
+        self.path = path or MANIFEST_FILE
+        self.reuse_sec = float(reuse_sec)
+        self.clock = clock
+        self.days: Dict[str, Dict[str, Any]] = {}
+        self.totals_cache: Dict[str, Dict[str, Any]] = {}  # key -> _new_totals(), acc as Decimals
+        self.reads = 0  # day (re)reads, full or tail
+        self._maps: Optional[HistoryMaps] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == _VERSION and isinstance(data.get("days"), dict):
+                self.days = data["days"]
+                for key, t in (data.get("totals") or {}).items():
+                    self.totals_cache[key] = dict(t, acc=aggregates.load_accumulator(t["acc"]))
+        except (OSError, ValueError, TypeError, KeyError, ArithmeticError):
+            self.days, self.totals_cache = {}, {}
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                totals = {k: dict(t, acc=aggregates.dump_accumulator(t["acc"])) for k, t in self.totals_cache.items()}
+                f.write(json.dumps({"version": _VERSION, "days": self.days, "totals": totals}, separators=(",", ":")))  # C encoder
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("history manifest not saved: %s", e)
+
+    def _sync(self) -> bool:
+        """Bring the per-day data and the totals in line with the ledger; True if anything changed."""
+        stamps = ledger.day_stamps()
+        changed = False
+        reread: Set[str] = set()  # days to read from the start
+        for day in list(self.days):
+            if day not in stamps:
+                del self.days[day]
+                reread.add(day)
+                changed = True
+        last_day = max(stamps, default="")
+        for day in stamps:
+            cur = self.days.get(day)
+            if cur is None or (cur["stamp"] != stamps[day] and (
+                    day != last_day or not ledger.appended_only(cur["stamp"], stamps[day]))):
+                reread.add(day)  # new, edited, or a past day: read it all
+        for t in self.totals_cache.values():
+            if not t["ready"] or any(t["through"] is not None and d <= t["through"] and _covers(t, d) for d in reread):
+                t.update(ready=True, through=None, offset=None, acc={})  # new, or a day it added changed
+                reread.update(d for d in stamps if _covers(t, d))
+                changed = True
+        for day in sorted(stamps):
+            stamp = stamps[day]
+            cur = self.days.get(day)
+            if day in reread:
+                cur = self.days[day] = _new_day()
+            elif cur["stamp"] == stamp:
+                continue
+            rows = list(ledger.iter_ledger_since(day, cur["offset"]))
+            for e, off in rows:
+                _fold(cur, e)
+                cur["offset"] = off
+            for t in self.totals_cache.values():
+                if not rows or not _covers(t, day) or (t["through"] is not None and day < t["through"]):
+                    continue  # nothing new for it (a day it added is re-read for another range)
+                done = t["offset"] if day == t["through"] and t["offset"] is not None else None
+                _ACCUMULATE[t["kind"]](t["acc"], (e for e, off in rows if done is None or off > done), wallet=t["wallet"])
+                t["through"], t["offset"] = day, rows[-1][1]
+            cur["stamp"] = stamp
+            self.reads += 1
+            changed = True
+        return changed
+
+    def _merge(self) -> HistoryMaps:
+        symbols: Dict[str, List[str]] = {}
+        prices: Dict[str, float] = {}
+        contracts: Set[str] = set()
+        for day in sorted(self.days):
+            d = self.days[day]
+            for sym, addrs in d["symbols"].items():
+                seen = symbols.setdefault(sym, [])
+                for a in addrs:
+                    if a not in seen:
+                        seen.append(a)
+            for k, p in d["prices"].items():
+                prices.pop(k, None)
+                prices[k] = p
+            contracts.update(d["contracts"])
+        return HistoryMaps({s: a[0] for s, a in symbols.items() if len(a) == 1}, prices, contracts)
+
+    def _refresh(self, force: bool = False) -> None:
+        """Sync unless checked within reuse_sec (or `force`); caller holds the lock."""
+        now = self.clock()
+        if not force and self._maps is not None and now - self._checked < self.reuse_sec:
+            return
+        self._checked = now
+        changed = self._sync()
+        if changed:
+            self._save()
+        if changed or self._maps is None:
+            self._maps = self._merge()
+
+    def maps(self) -> HistoryMaps:
+        """Merged history maps; the same object until a ledger day changes."""
+        with self._lock:
+            self._refresh()
+            return self._maps
+
+    def totals(self, kind: str = "ledger", first: Optional[str] = None, last: Optional[str] = None,
+               wallet: Optional[str] = None) -> List[Dict[str, Any]]:
+        """aggregate_per_asset rows of the days first..last (inclusive YYYY-MM-DD, None: open)
+        with `kind` entries ("ledger" rows, or aggregate_per_asset's own "entries")."""
+        if kind not in _ACCUMULATE:
+            raise ValueError(f"unknown totals kind: {kind!r}")
+        wallet = (wallet or "").strip().lower()
+        key = "|".join((kind, wallet, first or "", last or ""))
+        with self._lock:
+            t = self.totals_cache.pop(key, None)
+            self.totals_cache[key] = t or _new_totals(kind, wallet, first, last)  # most recently used last
+            while len(self.totals_cache) > MANIFEST_TOTALS_MAX:
+                del self.totals_cache[next(iter(self.totals_cache))]
+            self._refresh(force=t is None)
+            return aggregates.rows_from(self.totals_cache[key]["acc"])
+
+
+_default: Optional[HistoryManifest] = None
+_default_lock = threading.Lock()
+
+
+def get_manifest() -> HistoryManifest:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = HistoryManifest()
+    return _default
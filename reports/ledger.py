@@ -1,18 +1,626 @@
 # -*- coding: utf-8 -*-
 """
-reports/ledger.py — minimal stub for avg cost.
+reports/ledger.py — append-only transaction ledger, one JSON line per entry.
 
-The holdings snapshot will call:
-    get_avg_cost_usd(symbol: str) -> Decimal | None
+Storage: LEDGER_DIR/transactions_<YYYY-MM-DD>.jsonl (LEDGER_DIR defaults to
+DATA_DIR). Appending an entry is one buffered write of one line, never a
+rewrite of the day. Lines are flushed to the OS at once, so readers in any
+thread or process see them. fsync is grouped: it runs after
+LEDGER_FSYNC_EVERY appends or LEDGER_FSYNC_SEC after the first unsynced
+append, whichever comes first, and at exit. A torn last line from a crash
+is skipped by readers.
 
-Return None to indicate "no ledger/cost available yet".
-This keeps the flow stable without throwing import/attr errors.
+Days written before this format (transactions_<day>.json, {"entries": [...]})
+are still read, before that day's JSONL lines.
+
+Decimal values are written as exact JSON numbers (always with a fraction or
+exponent) and non-integer numbers read back as Decimal.
+
+LEDGER_BACKEND=sqlite keeps the same entries in LEDGER_DB (default
+LEDGER_DIR/ledger.sqlite3, see reports.ledger_sqlite) instead of day files;
+per-day, month, per-asset and txhash queries are then index lookups. Fill it
+once from the day files / CSV ledgers with scripts/import_ledger_sqlite.py.
+
+API:
+    append_ledger(day, entry) / append_ledger(entry)   (day from entry["time"])
+    iter_ledger(day), read_ledger(day=None), ledger_days(), iter_all_entries()
+    iter_days_between(first, last)            entries of an inclusive day range
+    entries_for_asset(symbol_or_addr)         entries of one asset, oldest first
+    has_tx(txhash, type=None)                 already recorded (as a leg of that type)?
+    day_stamps(), appended_only(old, new), iter_ledger_since(day, offset)
+                                              change detection / resumable reads
+                                              (reports.positions checkpoint)
+    update_cost_basis()                       FIFO rebuild over every day:
+                                              annotates realized_usd (JSONL:
+                                              past days only), writes
+                                              COST_BASIS_FILE
+    update_cost_basis(qty, cost, key, signed_amount, price, eps=)
+                                              running average-cost update,
+                                              returns realized USD
+    replay_cost_basis_over_entries(qty, cost, entries, eps=)
+    get_avg_cost_usd(symbol)                  from COST_BASIS_FILE
 """
 
 from __future__ import annotations
-from decimal import Decimal
-from typing import Optional
+
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import IO, Any, Callable, Deque, Dict, Iterable, Iterator, List, MutableMapping, Optional, Tuple
+
+from core.tz import ymd
+
+logger = logging.getLogger("reports.ledger")
+
+LEDGER_DIR = Path(os.getenv("LEDGER_DIR") or os.getenv("DATA_DIR") or "/app/data")
+COST_BASIS_FILE = LEDGER_DIR / "cost_basis.json"
+LEDGER_FSYNC_EVERY = max(1, int(os.getenv("LEDGER_FSYNC_EVERY", "32") or 32))
+LEDGER_FSYNC_SEC = float(os.getenv("LEDGER_FSYNC_SEC", "1.0") or 1.0)
+LEDGER_BACKEND = (os.getenv("LEDGER_BACKEND") or "jsonl").strip().lower()
+LEDGER_DB = Path(os.getenv("LEDGER_DB") or LEDGER_DIR / "ledger.sqlite3")
+_MAX_OPEN_FILES = 4
+
+_DAY_RE = re.compile(r"^transactions_(\d{4}-\d{2}-\d{2})\.jsonl?$")
+_DEC_MARK = "\x00dec:"
+_DEC_RE = re.compile(r'"\\u0000dec:([^"]*)"')
+
+
+def ledger_path(day: str) -> Path:
+    return LEDGER_DIR / f"transactions_{day}.jsonl"
+
+
+def legacy_path(day: str) -> Path:
+    return LEDGER_DIR / f"transactions_{day}.json"
+
+
+# ---------- encoding ----------
+def _mark_decimals(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        if not obj.is_finite():
+            return None
+        text = str(obj)
+        return _DEC_MARK + (text if ("." in text or "E" in text) else text + ".0")  # reads back as Decimal
+    if isinstance(obj, dict):
+        return {k: _mark_decimals(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_mark_decimals(v) for v in obj]
+    return obj
+
+
+def _dumps(entry: Dict[str, Any]) -> str:
+    """One JSON line; Decimals become exact JSON numbers."""
+    text = json.dumps(_mark_decimals(entry), ensure_ascii=False, separators=(",", ":"), default=str)
+    return _DEC_RE.sub(r"\1", text)
+
+
+def _loads(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        obj = json.loads(line, parse_float=Decimal)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+# ---------- writer ----------
+class _Writer:
+    """Open append handles per day file; every line is flushed, fsync is grouped."""
+
+    def __init__(self, every: int = LEDGER_FSYNC_EVERY, interval: float = LEDGER_FSYNC_SEC):
+        self.every = every
+        self.interval = interval
+        self._files: Dict[Path, IO[str]] = {}
+        self._order: Deque[Path] = deque()
+        self._unsynced = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self.syncs = 0
+
+    def _open(self, path: Path) -> IO[str]:
+        f = self._files.get(path)
+        if f is not None:
+            return f
+        while len(self._order) >= _MAX_OPEN_FILES:
+            self._close_locked(self._order.popleft())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = self._files[path] = open(path, "a", encoding="utf-8")
+        self._order.append(path)
+        return f
+
+    def append(self, path: Path, line: str) -> None:
+        with self._lock:
+            f = self._open(path)
+            f.write(line + "\n")
+            f.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.every:
+                self._sync_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._unsynced:
+            return
+        for f in self._files.values():
+            try:
+                os.fsync(f.fileno())
+            except OSError as e:
+                logger.warning("ledger fsync failed: %s", e)
+        self._unsynced = 0
+        self.syncs += 1
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync_locked()
+
+    def _close_locked(self, path: Path) -> None:
+        f = self._files.pop(path, None)
+        if f is None:
+            return
+        try:
+            f.flush()
+            os.fsync(f.fileno())
+        except OSError:
+            pass
+        f.close()
+        try:
+            self._order.remove(path)
+        except ValueError:
+            pass
+
+    @contextmanager
+    def holding(self, path: Path) -> Iterator[None]:
+        """Close one file and keep every append waiting until the block ends (read-modify-replace)."""
+        with self._lock:
+            self._close_locked(path)
+            yield
+
+    def close(self) -> None:
+        with self._lock:
+            self._sync_locked()
+            for path in list(self._files):
+                self._close_locked(path)
+
+
+_writer = _Writer()
+atexit.register(_writer.close)
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def _sqlite():
+    """The SqliteLedger when LEDGER_BACKEND=sqlite, else None."""
+    global _db
+    if LEDGER_BACKEND != "sqlite":
+        return None
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                from reports.ledger_sqlite import SqliteLedger
+
+                LEDGER_DB.parent.mkdir(parents=True, exist_ok=True)
+                _db = SqliteLedger(str(LEDGER_DB), dumps=_dumps, loads=_loads)
+    return _db
+
+
+def sync() -> None:
+    """fsync everything appended so far."""
+    _writer.sync()
+
+
+# ---------- append / read ----------
+def _day_of(entry: Dict[str, Any]) -> str:
+    t = entry.get("time")
+    if isinstance(t, str) and re.match(r"^\d{4}-\d{2}-\d{2}", t):
+        return t[:10]
+    if isinstance(t, (int, float)) and t > 0:
+        return datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%d")
+    return ymd()
+
+
+def append_ledger(day_or_entry: Any, entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Append one entry to its day. `append_ledger(entry)` takes the day from entry["time"]."""
+    if entry is None:
+        entry, day = day_or_entry, _day_of(day_or_entry)
+    else:
+        day = str(day_or_entry)
+    db = _sqlite()
+    if db is not None:
+        db.append(day, entry)
+        return entry
+    _writer.append(ledger_path(day), _dumps(entry))
+    tx = _tx_of(entry)
+    if tx and _tx_seen is not None:
+        _tx_seen.setdefault(_type_of(entry), set()).add(tx)
+    return entry
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except OSError:
+        return
+    with f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # torn last line
+            e = _loads(line)
+            if e is not None:
+                yield e
+
+
+def _iter_legacy(path: Path) -> Iterator[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f, parse_float=Decimal)
+    except (OSError, ValueError):
+        return
+    for e in (data.get("entries") if isinstance(data, dict) else None) or []:
+        if isinstance(e, dict):
+            yield e
+
+
+def iter_ledger(day: str) -> Iterator[Dict[str, Any]]:
+    """Entries of one day, streamed: legacy JSON entries first, then JSONL lines."""
+    db = _sqlite()
+    if db is not None:
+        yield from db.iter_day(day)
+        return
+    yield from _iter_legacy(legacy_path(day))
+    yield from _iter_jsonl(ledger_path(day))
+
+
+def ledger_days() -> List[str]:
+    db = _sqlite()
+    if db is not None:
+        return db.days()
+    try:
+        names = os.listdir(LEDGER_DIR)
+    except OSError:
+        return []
+    return sorted({m.group(1) for m in map(_DAY_RE.match, names) if m})
+
+
+def iter_all_entries() -> Iterator[Dict[str, Any]]:
+    for day in ledger_days():
+        yield from iter_ledger(day)
+
+
+def read_ledger(day: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Entries of `day`, or of every day when None."""
+    return list(iter_ledger(day) if day else iter_all_entries())
+
+
+def iter_days_between(first_day: str, last_day: str) -> Iterator[Dict[str, Any]]:
+    """Entries of the days first_day..last_day (inclusive, YYYY-MM-DD), oldest first."""
+    db = _sqlite()
+    if db is not None:
+        yield from db.iter_range(first_day, last_day)
+        return
+    for day in ledger_days():
+        if first_day <= day <= last_day:
+            yield from iter_ledger(day)
+
+
+def entries_for_asset(symbol_or_addr: str) -> List[Dict[str, Any]]:
+    """Entries of one asset (symbol, or 0x token address), oldest first."""
+    db = _sqlite()
+    if db is not None:
+        return list(db.for_asset(symbol_or_addr))
+    from reports.ledger_sqlite import entry_columns
+
+    key = (symbol_or_addr or "").strip()
+    if key.lower().startswith("0x"):
+        key = key.lower()
+        return [e for e in iter_all_entries() if entry_columns(e)[1] == key]
+    key = key.upper()
+    return [e for e in iter_all_entries() if entry_columns(e)[0] == key]
+
+
+def day_stamps() -> Dict[str, List[int]]:
+    """Per day, a stamp whose last element only grows while the day is appended to; the one
+    before it (JSONL mtime) may change along with that growth. See appended_only().
+
+    JSONL: [legacy size, legacy mtime_ns, jsonl inode, jsonl mtime_ns, jsonl size].
+    SQLite: [edit version, first id, last id]."""
+    db = _sqlite()
+    if db is not None:
+        return db.day_stamps()
+    out: Dict[str, List[int]] = {}
+    try:
+        it = os.scandir(LEDGER_DIR)
+    except OSError:
+        return out
+    with it:
+        for d in it:
+            m = _DAY_RE.match(d.name)
+            if not m:
+                continue
+            try:
+                st = d.stat()
+            except OSError:
+                continue
+            stamp = out.setdefault(m.group(1), [0, 0, 0, 0, 0])
+            if d.name.endswith(".jsonl"):
+                stamp[2], stamp[3], stamp[4] = st.st_ino, st.st_mtime_ns, st.st_size
+            else:
+                stamp[0], stamp[1] = st.st_size, st.st_mtime_ns
+    return out
+
+
+def appended_only(old: Optional[List[int]], new: Optional[List[int]]) -> bool:
+    """Whether a day went from stamp `old` to `new` only by appending (or not at all). Only a day
+    still being appended to should get this benefit; compare past days' stamps strictly."""
+    if old is None or new is None or len(old) != len(new):
+        return False
+    return old == new or (old[:-2] == new[:-2] and new[-1] > old[-1])
+
+
+def iter_ledger_since(day: str, offset: Optional[int] = None) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """(entry, offset) pairs of `day` after `offset` (None: from the start). Pass the last
+    offset back to resume; it is a byte position (JSONL) or a row id (SQLite)."""
+    db = _sqlite()
+    if db is not None:
+        yield from db.iter_day_since(day, -1 if offset is None else offset)
+        return
+    if offset is None:
+        for e in _iter_legacy(legacy_path(day)):
+            yield e, 0
+        offset = 0
+    try:
+        f = open(ledger_path(day), "rb")
+    except OSError:
+        return
+    with f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # torn last line
+            offset += len(raw)
+            e = _loads(raw.decode("utf-8"))
+            if e is not None:
+                yield e, offset
+
+
+def _tx_of(entry: Dict[str, Any]) -> str:
+    return str(entry.get("txhash") or entry.get("tx") or entry.get("txid") or entry.get("hash") or "").strip().lower()
+
+
+def _type_of(entry: Dict[str, Any]) -> str:
+    return str(entry.get("type") or "").strip().lower()
+
+
+_tx_seen: Optional[Dict[str, set]] = None  # JSONL backend: type -> recorded txhashes, built on first has_tx()
+
+
+def has_tx(txhash: str, type: Optional[str] = None) -> bool:
+    """Whether an entry with this txhash is already in the ledger; with `type`, only entries of
+    that type count (a swap's erc20 legs share the hash of its native leg)."""
+    global _tx_seen
+    tx = (txhash or "").strip().lower()
+    if not tx:
+        return False
+    db = _sqlite()
+    if db is not None:
+        return db.has_tx(tx, type)
+    if _tx_seen is None:
+        seen: Dict[str, set] = {}
+        for e in iter_all_entries():
+            t = _tx_of(e)
+            if t:
+                seen.setdefault(_type_of(e), set()).add(t)
+        _tx_seen = seen
+    if type is None:
+        return any(tx in s for s in _tx_seen.values())
+    return tx in _tx_seen.get(type.strip().lower(), ())
+
+
+def _write_day_locked(day: str, entries: List[Dict[str, Any]]) -> None:
+    path = ledger_path(day)
+    tmp = path.with_suffix(".jsonl.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for e in entries:
+            f.write(_dumps(e) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    old = legacy_path(day)
+    if old.exists():
+        old.replace(old.with_suffix(".json.migrated"))
+
+
+def _rewrite_day(day: str, entries: List[Dict[str, Any]]) -> None:
+    """Replace a day with `entries` in JSONL form."""
+    db = _sqlite()
+    if db is not None:
+        db.replace_day(day, entries)
+        return
+    with _writer.holding(ledger_path(day)):
+        _write_day_locked(day, entries)
+
+
+def _file_sig(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _update_day(day: str, fn: Callable[[List[Dict[str, Any]]], bool]) -> None:
+    """Read a day, let `fn` edit its entries in place (True: something changed) and write it back,
+    with appends held off from the read to the replace.
+
+    JSONL: the current day (and later ones) is never rewritten, since the bot may be appending
+    to it from another process, and a day whose file changed while `fn` ran is left as it is.
+    """
+    db = _sqlite()
+    if db is not None:
+        db.update_day(day, fn)
+        return
+    path = ledger_path(day)
+    with _writer.holding(path):
+        before = _file_sig(path)
+        entries = list(iter_ledger(day))
+        changed = fn(entries) or legacy_path(day).exists()
+        if not changed or day >= ymd():
+            return
+        if _file_sig(path) != before:
+            logger.warning("ledger %s changed during the rewrite; left as it is", day)
+            return
+        _write_day_locked(day, entries)
+
+
+# ---------- cost basis ----------
+def _dec(value: Any) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(str(value)) if value not in (None, "") else Decimal("0")
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal("0")
+
+
+def _fifo_fields(e: Dict[str, Any]) -> Tuple[str, str, Decimal, Decimal]:
+    """(asset, side, qty, usd) for both entry shapes: side/qty/usd and token/amount/usd_value."""
+    asset = str(e.get("asset") or e.get("token") or "?").upper()
+    side = str(e.get("side") or "").upper()
+    qty = abs(_dec(e.get("qty")))
+    if side not in ("IN", "OUT"):
+        amount = _dec(e.get("amount"))
+        side = "IN" if amount > 0 else ("OUT" if amount < 0 else side)
+        qty = abs(amount)
+    if e.get("usd") not in (None, ""):
+        usd = abs(_dec(e.get("usd")))
+    elif e.get("usd_value") not in (None, ""):
+        usd = abs(_dec(e.get("usd_value")))
+    else:
+        usd = qty * _dec(e.get("price_usd"))
+    return asset, side, qty, usd
+
+
+def _rebuild_fifo() -> Dict[str, Any]:
+    lots: Dict[str, Deque[List[Decimal]]] = defaultdict(deque)  # asset -> [[qty, unit_cost], ...]
+    realized_total: Dict[str, Decimal] = defaultdict(Decimal)
+
+    def annotate(entries: List[Dict[str, Any]]) -> bool:
+        changed = False
+        for e in entries:
+            asset, side, qty, usd = _fifo_fields(e)
+            realized = Decimal("0")
+            if side == "IN" and qty > 0:
+                lots[asset].append([qty, usd / qty])
+            elif side == "OUT" and qty > 0:
+                left, cost = qty, Decimal("0")
+                book = lots[asset]
+                while left > 0 and book:
+                    lot = book[0]
+                    take = min(left, lot[0])
+                    cost += take * lot[1]
+                    lot[0] -= take
+                    left -= take
+                    if lot[0] <= 0:
+                        book.popleft()
+                matched = qty - left
+                realized = usd * matched / qty - cost
+                realized_total[asset] += realized
+            if e.get("realized_usd") != realized or not isinstance(e.get("realized_usd"), Decimal):
+                e["realized_usd"] = realized
+                changed = True
+        return changed
+
+    for day in ledger_days():
+        _update_day(day, annotate)
+    assets: Dict[str, Any] = {}
+    for asset in sorted(set(lots) | set(realized_total)):
+        qty = sum((lot[0] for lot in lots[asset]), Decimal("0"))
+        cost = sum((lot[0] * lot[1] for lot in lots[asset]), Decimal("0"))
+        assets[asset] = {
+            "qty": str(qty),
+            "cost_usd": str(cost),
+            "avg_cost_usd": str(cost / qty) if qty > 0 else None,
+            "realized_usd": str(realized_total[asset]),
+            "lots": [[str(q), str(u)] for q, u in lots[asset]],
+        }
+    state = {"updated": datetime.now(timezone.utc).isoformat(timespec="seconds"), "method": "fifo", "assets": assets}
+    COST_BASIS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = COST_BASIS_FILE.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, COST_BASIS_FILE)
+    return state
+
+
+def update_cost_basis(
+    pos_qty: Optional[MutableMapping[str, float]] = None,
+    pos_cost: Optional[MutableMapping[str, float]] = None,
+    key: Optional[str] = None,
+    signed_amount: float = 0.0,
+    price: float = 0.0,
+    eps: float = 1e-12,
+) -> Any:
+    """No arguments: FIFO rebuild over the whole ledger (returns the cost-basis state).
+    With positions: apply one signed trade at `price` with average cost and return the realized USD."""
+    if pos_qty is None:
+        return _rebuild_fifo()
+    qty, cost = float(pos_qty.get(key, 0.0)), float(pos_cost.get(key, 0.0))
+    amount, price = float(signed_amount or 0.0), float(price or 0.0)
+    realized = 0.0
+    if amount > eps:
+        pos_qty[key] = qty + amount
+        pos_cost[key] = cost + amount * price
+    elif amount < -eps and qty > eps:
+        sell = min(-amount, qty)
+        avg = cost / qty
+        realized = (price - avg) * sell if price > 0 else 0.0
+        pos_qty[key] = qty - sell
+        pos_cost[key] = max(0.0, cost - avg * sell)
+    return realized
+
+
+def _entry_key(e: Dict[str, Any]) -> str:
+    addr = str(e.get("token_addr") or "").strip().lower()
+    if addr.startswith("0x"):
+        return addr
+    return str(e.get("token") or e.get("asset") or "?").strip().upper()
+
+
+def replay_cost_basis_over_entries(
+    pos_qty: MutableMapping[str, float],
+    pos_cost: MutableMapping[str, float],
+    entries: Iterable[Dict[str, Any]],
+    eps: float = 1e-12,
+) -> float:
+    """Average-cost replay over token/amount/price_usd entries; sets each entry's realized_pnl
+    and returns the total."""
+    total = 0.0
+    for e in entries or []:
+        amount = float(e.get("amount") or 0.0)
+        realized = update_cost_basis(pos_qty, pos_cost, _entry_key(e), amount, float(e.get("price_usd") or 0.0), eps=eps)
+        e["realized_pnl"] = realized
+        total += realized
+    return total
+
 
 def get_avg_cost_usd(symbol: str) -> Optional[Decimal]:
-    # TODO: Wire up real ledger average cost when your trade history is ready.
-    return None
+    """Average cost of the open FIFO lots of `symbol` from the last rebuild; None when unknown."""
+    try:
+        with open(COST_BASIS_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        avg = ((state.get("assets") or {}).get(str(symbol or "").upper()) or {}).get("avg_cost_usd")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return Decimal(avg) if avg else None
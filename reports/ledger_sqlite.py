@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+reports/ledger_sqlite.py — SQLite storage for reports.ledger (LEDGER_BACKEND=sqlite).
+
+One table, one row per ledger entry. The entry itself is kept verbatim as a
+JSON line (`data`), next to the columns the bot filters on:
+
+    day         YYYY-MM-DD          index (day)           -> per-day / month ranges
+    asset       upper-case symbol   index (asset, day)    -> /pnl SYM, /tx SYM
+    token_addr  lower-case 0x...    partial index         -> lookups by contract
+    txhash      lower-case 0x...    partial index         -> "already recorded?"
+    type        native / erc20 / .. (txhash, type)        -> per leg kind
+
+Triggers bump day_versions.version for a day on every UPDATE or DELETE of
+its rows, so day_stamps() sees edits that leave the id range as it was.
+
+The database runs in WAL mode with synchronous=NORMAL. Readers never block
+the writer, and a commit does not fsync (the WAL is synced at checkpoints).
+All access goes through one connection guarded by a lock.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id         INTEGER PRIMARY KEY,
+    day        TEXT NOT NULL,
+    asset      TEXT NOT NULL,
+    token_addr TEXT,
+    txhash     TEXT,
+    side       TEXT,
+    type       TEXT,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_day ON entries(day);
+CREATE INDEX IF NOT EXISTS ix_entries_asset_day ON entries(asset, day);
+CREATE INDEX IF NOT EXISTS ix_entries_token ON entries(token_addr) WHERE token_addr IS NOT NULL;
+CREATE INDEX IF NOT EXISTS ix_entries_tx_type ON entries(txhash, type) WHERE txhash IS NOT NULL;
+CREATE TABLE IF NOT EXISTS day_versions (
+    day     TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS tr_entries_update AFTER UPDATE ON entries BEGIN
+    INSERT INTO day_versions(day, version) VALUES (OLD.day, 1) ON CONFLICT(day) DO UPDATE SET version = version + 1;
+    INSERT INTO day_versions(day, version) VALUES (NEW.day, 1) ON CONFLICT(day) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tr_entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO day_versions(day, version) VALUES (OLD.day, 1) ON CONFLICT(day) DO UPDATE SET version = version + 1;
+END;
+"""
+
+
+def entry_columns(entry: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str], str]:
+    """(asset, token_addr, txhash, side) of an entry in any of the ledger shapes."""
+    asset = str(entry.get("asset") or entry.get("token") or entry.get("symbol") or "?").strip().upper() or "?"
+    addr = str(entry.get("token_addr") or "").strip().lower()
+    tx = str(entry.get("txhash") or entry.get("tx") or entry.get("txid") or entry.get("hash") or "").strip().lower()
+    side = str(entry.get("side") or "").strip().upper()
+    if not side:
+        try:
+            amount = float(entry.get("amount") or 0)
+        except (TypeError, ValueError):
+            amount = 0.0
+        side = "IN" if amount > 0 else ("OUT" if amount < 0 else "")
+    return asset, (addr if addr.startswith("0x") else None), (tx or None), side
+
+
+class SqliteLedger:
+    def __init__(
+        self,
+        path: str,
+        *,
+        dumps: Callable[[Dict[str, Any]], str] = json.dumps,
+        loads: Callable[[str], Optional[Dict[str, Any]]] = json.loads,
+    ):
+        self.path = str(path)
+        self.dumps = dumps
+        self.loads = loads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _row(self, day: str, entry: Dict[str, Any]) -> Tuple[Any, ...]:
+        asset, addr, tx, side = entry_columns(entry)
+        kind = str(entry.get("type") or "").strip().lower() or None
+        return day, asset, addr, tx, side, kind, self.dumps(entry)
+
+    # ---------- writes ----------
+    def append(self, day: str, entry: Dict[str, Any]) -> None:
+        row = self._row(day, entry)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO entries(day, asset, token_addr, txhash, side, type, data) VALUES (?,?,?,?,?,?,?)", row
+            )
+
+    def append_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        rows = [self._row(day, e) for day, e in items]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO entries(day, asset, token_addr, txhash, side, type, data) VALUES (?,?,?,?,?,?,?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def replace_day(self, day: str, entries: List[Dict[str, Any]]) -> None:
+        rows = [self._row(day, e) for e in entries]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM entries WHERE day = ?", (day,))
+                self._conn.executemany(
+                    "INSERT INTO entries(day, asset, token_addr, txhash, side, type, data) VALUES (?,?,?,?,?,?,?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update_day(self, day: str, fn: Callable[[List[Dict[str, Any]]], bool]) -> bool:
+        """Let `fn` edit a day's entries in place and store them back in one write transaction,
+        so no insert (from any connection) lands between the read and the update. Row ids are kept."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = []
+                for rid, data in self._conn.execute("SELECT id, data FROM entries WHERE day = ? ORDER BY id", (day,)):
+                    e = self.loads(data)
+                    if e is not None:
+                        rows.append((rid, e))
+                changed = bool(fn([e for _, e in rows]))
+                if changed:
+                    self._conn.executemany(
+                        "UPDATE entries SET asset = ?, token_addr = ?, txhash = ?, side = ?, type = ?, data = ? WHERE id = ?",
+                        [self._row(day, e)[1:] + (rid,) for rid, e in rows],
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    # ---------- reads ----------
+    def _select(self, where: str, args: Tuple[Any, ...]) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM entries WHERE {where} ORDER BY day, id", args).fetchall()
+        for (data,) in rows:
+            e = self.loads(data)
+            if e is not None:
+                yield e
+
+    def iter_day(self, day: str) -> Iterator[Dict[str, Any]]:
+        return self._select("day = ?", (day,))
+
+    def iter_range(self, first_day: str, last_day: str) -> Iterator[Dict[str, Any]]:
+        return self._select("day BETWEEN ? AND ?", (first_day, last_day))
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        return self._select("1", ())
+
+    def for_asset(self, symbol_or_addr: str) -> Iterator[Dict[str, Any]]:
+        key = (symbol_or_addr or "").strip()
+        if key.lower().startswith("0x"):
+            return self._select("token_addr = ?", (key.lower(),))
+        return self._select("asset = ?", (key.upper(),))
+
+    def iter_day_since(self, day: str, after_id: int) -> Iterator[Tuple[Dict[str, Any], int]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, data FROM entries WHERE day = ? AND id > ? ORDER BY id", (day, after_id)
+            ).fetchall()
+        for rid, data in rows:
+            e = self.loads(data)
+            if e is not None:
+                yield e, rid
+
+    def day_stamps(self) -> Dict[str, List[int]]:
+        """day -> [edit version, first id, last id]; appends only raise the last id."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.day, COALESCE(v.version, 0), MIN(e.id), MAX(e.id) FROM entries e "
+                "LEFT JOIN day_versions v ON v.day = e.day GROUP BY e.day"
+            ).fetchall()
+        return {day: [ver, lo, hi] for day, ver, lo, hi in rows}
+
+    def days(self) -> List[str]:
+        with self._lock:
+            return [d for (d,) in self._conn.execute("SELECT DISTINCT day FROM entries ORDER BY day")]
+
+    def has_tx(self, txhash: str, type: Optional[str] = None) -> bool:
+        tx = (txhash or "").strip().lower()
+        with self._lock:
+            if type is None:
+                row = self._conn.execute("SELECT 1 FROM entries WHERE txhash = ? LIMIT 1", (tx,)).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT 1 FROM entries WHERE txhash = ? AND type = ? LIMIT 1", (tx, type.strip().lower())
+                ).fetchone()
+        return row is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
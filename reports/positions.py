@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+reports/positions.py — open positions over the whole ledger, kept as a checkpoint.
+
+Replays ledger entries (token/token_addr/amount/price_usd) with average cost,
+like main.rebuild_open_positions_from_history used to do from scratch on
+every call. The result is persisted to POSITIONS_FILE with:
+
+    qty / cost / realized    per key (0x contract, else upper-case symbol)
+    stamps                   reports.ledger.day_stamps() of the replayed days
+    offset                   [last replayed day, offset after its last entry]
+    symbols / conflicts      symbol -> contract map used to key symbol-only entries
+
+`refresh()` reads only what was appended after `offset` (plus new days). A
+full replay runs when there is no checkpoint, on `rebuild()`, or when the
+checkpoint no longer describes the ledger: a replayed day changed other than
+by appending, a day appeared before the offset, or a symbol that keyed
+earlier entries gained (or lost) its contract mapping.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from reports import ledger
+
+logger = logging.getLogger("reports.positions")
+
+POSITIONS_FILE = ledger.LEDGER_DIR / "positions_checkpoint.json"
+_VERSION = 1
+
+
+class PositionCheckpoint:
+    def __init__(self, path: Optional[Path] = None, eps: float = 1e-12):
+        self.path = Path(path or POSITIONS_FILE)
+        self.eps = eps
+        self._lock = threading.Lock()
+        self.replays = 0  # full replays done by this instance
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self.qty: Dict[str, float] = defaultdict(float)
+        self.cost: Dict[str, float] = defaultdict(float)
+        self.realized: Dict[str, float] = defaultdict(float)
+        self.stamps: Dict[str, List[int]] = {}
+        self.offset: Optional[Tuple[str, Optional[int]]] = None
+        self.symbols: Dict[str, str] = {}
+        self.conflicts: Set[str] = set()
+        self.keyed_by_symbol: Set[str] = set()  # upper-case symbols whose map lookup keyed an entry
+
+    # ---------- persistence ----------
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _VERSION:
+                return
+            self.qty.update(data["qty"])
+            self.cost.update(data["cost"])
+            self.realized.update(data["realized"])
+            self.stamps = {d: list(s) for d, s in data["stamps"].items()}
+            self.offset = tuple(data["offset"]) if data.get("offset") else None
+            self.symbols = dict(data["symbols"])
+            self.conflicts = set(data["conflicts"])
+            self.keyed_by_symbol = set(data["keyed_by_symbol"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self._reset()
+
+    def _save(self) -> None:
+        data = {
+            "version": _VERSION,
+            "qty": self.qty, "cost": self.cost, "realized": self.realized,
+            "stamps": self.stamps, "offset": list(self.offset) if self.offset else None,
+            "symbols": self.symbols, "conflicts": sorted(self.conflicts),
+            "keyed_by_symbol": sorted(self.keyed_by_symbol),
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("positions checkpoint not saved: %s", e)
+
+    # ---------- replay ----------
+    def _learn_symbol(self, sym: str, addr: str) -> bool:
+        """Fold one sym/addr pair into the map; False if that changes how earlier entries were keyed."""
+        if sym in self.conflicts:
+            return True
+        known = self.symbols.get(sym)
+        if known == addr:
+            return True
+        if known is None:
+            self.symbols[sym] = addr
+        else:
+            self.conflicts.add(sym)
+            self.symbols.pop(sym, None)
+        return sym.upper() not in self.keyed_by_symbol
+
+    def _key(self, sym: str, addr: str) -> str:
+        if addr.startswith("0x"):
+            return addr
+        symU = sym.upper()
+        if sym:
+            self.keyed_by_symbol.add(symU)
+        mapped = self.symbols.get(sym) or self.symbols.get(symU)
+        return mapped if (mapped and mapped.startswith("0x")) else (symU or sym or "?")
+
+    def _apply(self, entries: Iterable[Dict[str, Any]]) -> bool:
+        """Learn the symbol map from `entries` first, then apply them. False: needs a full replay."""
+        entries = list(entries)
+        for e in entries:
+            sym = (e.get("token") or "").strip()
+            addr = (e.get("token_addr") or "").strip().lower()
+            if sym and addr.startswith("0x") and not self._learn_symbol(sym, addr):
+                return False
+        for e in entries:
+            key = self._key((e.get("token") or "").strip(), (e.get("token_addr") or "").strip().lower())
+            self.realized[key] += ledger.update_cost_basis(
+                self.qty, self.cost, key, float(e.get("amount") or 0.0), float(e.get("price_usd") or 0.0), eps=self.eps
+            )
+        return True
+
+    def _full_replay(self) -> None:
+        self._reset()
+        self.replays += 1
+        stamps = ledger.day_stamps()
+        days = ledger.ledger_days()
+        # the map is built over all of history before any entry is keyed
+        for day in days:
+            for e in ledger.iter_ledger(day):
+                sym = (e.get("token") or "").strip()
+                addr = (e.get("token_addr") or "").strip().lower()
+                if sym and addr.startswith("0x"):
+                    self._learn_symbol(sym, addr)
+        for day in days:
+            last = None
+            pending = []
+            for e, off in ledger.iter_ledger_since(day):
+                pending.append(e)
+                last = off
+            self._apply(pending)
+            self.offset = (day, last)
+            self.stamps[day] = stamps.get(day, [])
+
+    def _catch_up(self) -> bool:
+        """Apply what was appended since the checkpoint; False when it is invalid."""
+        stamps = ledger.day_stamps()
+        for day, old in self.stamps.items():
+            new = stamps.get(day)
+            if new is None:
+                return False
+            if self.offset and day == self.offset[0]:
+                if not ledger.appended_only(old, new):
+                    return False
+            elif new != old:
+                return False
+        last_day = self.offset[0] if self.offset else ""
+        fresh = sorted(d for d in stamps if d not in self.stamps)
+        if any(d < last_day for d in fresh):
+            return False
+        todo = ([last_day] if last_day else []) + fresh
+        for day in todo:
+            start = self.offset[1] if (self.offset and day == self.offset[0]) else None
+            got = list(ledger.iter_ledger_since(day, start))
+            if got and not self._apply(e for e, _ in got):
+                return False
+            self.offset = (day, got[-1][1] if got else start)
+            self.stamps[day] = stamps[day]
+        return True
+
+    def refresh(self) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+        """Bring the checkpoint up to date; returns (qty, cost, realized) per key."""
+        with self._lock:
+            before = (self.offset, dict(self.stamps), self.replays)
+            if not self.stamps or not self._catch_up():
+                self._full_replay()
+            if (self.offset, self.stamps, self.replays) != before:
+                self._save()
+            return self._result()
+
+    def rebuild(self) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+        """Full replay on demand."""
+        with self._lock:
+            self._full_replay()
+            self._save()
+            return self._result()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._reset()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _result(self) -> Tuple[Dict[str, float], Dict[str, float], Dict[str, float]]:
+        qty = defaultdict(float, {k: (0.0 if abs(v) < 1e-10 else v) for k, v in self.qty.items()})
+        return qty, defaultdict(float, self.cost), defaultdict(float, self.realized)
+
+
+_default: Optional[PositionCheckpoint] = None
+_default_lock = threading.Lock()
+
+
+def get_checkpoint(eps: float = 1e-12) -> PositionCheckpoint:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = PositionCheckpoint(eps=eps)
+    return _default
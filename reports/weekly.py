@@ -2,11 +2,11 @@ from __future__ import annotations
 
 from datetime import timedelta
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Optional
 
 from core.tz import now_gr, ymd
-from reports.aggregates import aggregate_per_asset, totals
-from reports.ledger import read_ledger
+from reports.aggregates import totals
+from reports.history_manifest import get_manifest
 
 
 def _fmt(value: Decimal) -> str:
@@ -18,23 +18,13 @@ def _fmt(value: Decimal) -> str:
     return f"{value:.6f}"
 
 
-def _collect_entries(days: int) -> List[Dict[str, object]]:
-    end = now_gr()
-    dates = [ymd(end - timedelta(days=offset)) for offset in range(days)]
-    entries: List[Dict[str, object]] = []
-    for day in dates[::-1]:
-        entries.extend(read_ledger(day))
-    return entries
-
-
 def build_weekly_report_text(days: int = 7, wallet: Optional[str] = None) -> str:
     days = max(1, min(31, int(days or 7)))
-    entries = _collect_entries(days)
-    rows = aggregate_per_asset(entries, wallet=wallet)
-    totals_row = totals(rows)
-
     end = now_gr()
     start = end - timedelta(days=days - 1)
+    rows = get_manifest().totals("entries", ymd(start), ymd(end), wallet=wallet)  # only new days are read
+    totals_row = totals(rows)
+
     title = f"🧾 Period Summary ({start.strftime('%Y-%m-%d')} → {end.strftime('%Y-%m-%d')})"
     lines = [title, ""]
 
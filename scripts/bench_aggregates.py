@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+format_totals("all"): the full aggregate_per_asset pass it used to make on every
+call vs the running totals kept in reports.history_manifest.
+
+Usage:
+  python scripts/bench_aggregates.py [--entries 100000] [--days 365] [--assets 200] [--repeat 5]
+
+A throwaway JSONL ledger (LEDGER_DIR in a temp dir) gets `entries` wallet rows
+spread over `days` days. Timed, each checked for identical rows (Decimal
+exponents included) against the full pass:
+
+  full pass   main._load_entries_for_totals + aggregate_per_asset, as before
+  cold        HistoryManifest().totals() with no manifest file: one read of every day
+  unchanged   the next call: one stat per day
+  appended    after one more row on the newest day: only that row is read
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def full_pass(ledger, aggregate_per_asset):
+    """main.format_totals("all") before the manifest kept its totals."""
+    entries = []
+    for e in ledger.iter_all_entries():
+        sym = (e.get("token") or "?").upper()
+        amt = float(e.get("amount") or 0.0)
+        usd = float(e.get("usd_value") or 0.0)
+        realized = float(e.get("realized_pnl") or 0.0)
+        side = "IN" if amt > 0 else "OUT"
+        entries.append({"asset": sym, "side": side, "qty": abs(amt), "usd": usd, "realized_usd": realized})
+    return aggregate_per_asset(entries)
+
+
+def write_ledger(ledger, n: int, days: int, assets: int, seed: int = 1) -> str:
+    rnd = random.Random(seed)
+    prices = {f"T{i}": [rnd.uniform(0.0001, 50) for _ in range(8)] for i in range(assets)}
+    t0 = time.mktime((2024, 1, 1, 12, 0, 0, 0, 0, -1))
+    for i in range(n):
+        sym = f"T{rnd.randrange(assets)}"
+        qty = round(rnd.uniform(0, 10_000), rnd.choice((0, 2, 6, 18)))
+        amount = qty if rnd.random() < 0.55 else -qty
+        price = rnd.choice(prices[sym])
+        ledger.append_ledger({
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t0 + 86400 * (i * days // n))),
+            "token": sym, "amount": amount, "price_usd": price, "usd_value": qty * price,
+            "realized_pnl": 0.0 if amount > 0 else rnd.uniform(-50, 50),
+        })
+    ledger._writer.close()
+    return max(ledger.ledger_days())
+
+
+def same(a, b) -> bool:
+    return len(a) == len(b) and all(str(x[k]) == str(y[k]) and x[k] == y[k] for x, y in zip(a, b) for k in x)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--entries", type=int, default=100_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--assets", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["LEDGER_DIR"] = tmp.name
+    os.environ.pop("LEDGER_BACKEND", None)
+    from reports import history_manifest, ledger  # noqa: E402  (LEDGER_DIR is read at import)
+    from reports.aggregates import aggregate_per_asset  # noqa: E402
+
+    last_day = write_ledger(ledger, a.entries, a.days, a.assets)
+    ref = full_pass(ledger, aggregate_per_asset)
+    t_full = min(timeit.repeat(lambda: full_pass(ledger, aggregate_per_asset), number=1, repeat=a.repeat))
+
+    def cold():
+        try:
+            os.remove(history_manifest.MANIFEST_FILE)
+        except OSError:
+            pass
+        return history_manifest.HistoryManifest(reuse_sec=0).totals()
+
+    m = history_manifest.HistoryManifest(reuse_sec=0)
+    results = {"cold": cold(), "unchanged": m.totals()}
+    t_cold = min(timeit.repeat(cold, number=1, repeat=a.repeat))
+    t_unchanged = min(timeit.repeat(m.totals, number=1, repeat=a.repeat))
+
+    t_appended = float("inf")
+    for i in range(a.repeat):
+        ledger.append_ledger(last_day, {"time": f"{last_day} 23:59:59", "token": "T0", "amount": 1.5 + i, "usd_value": 0.25})
+        ledger._writer.close()
+        start = time.perf_counter()
+        results["appended"] = m.totals()
+        t_appended = min(t_appended, time.perf_counter() - start)
+    ref_appended = full_pass(ledger, aggregate_per_asset)
+
+    print(f"{a.entries} entries, {a.days} days, {a.assets} assets")
+    print(f"  full pass  {t_full * 1000:8.1f} ms")
+    for name, t in (("cold", t_cold), ("unchanged", t_unchanged), ("appended", t_appended)):
+        expect = ref_appended if name == "appended" else ref
+        if not same(expect, results[name]):
+            print(f"  {name}: MISMATCH")
+            return 1
+        print(f"  {name:9s}  {t * 1000:8.1f} ms  x{t_full / t:7.1f}  (identical rows)")
+    tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory per tracked pair: compact store (core.pair_store / core.rolling) vs the
+original main.py layout (a set of slugs, last price / last tx dicts, a
+deque(maxlen=PRICE_WINDOW) of floats and the full Dexscreener search result
+per pair).
+
+Usage:
+  python scripts/bench_price_history.py [--pairs 2000] [--interval 60] [--minutes 60]
+
+Each pair gets `minutes` of prices at one sample per `interval` seconds, so
+every rolling window (1m/5m/15m/1h) is as full as it gets in production. The
+baseline deque keeps only the last PRICE_WINDOW of them; it had no windows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+from collections import deque
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from core.pair_store import PairStore  # noqa: E402
+
+PRICE_WINDOW = int(os.getenv("PRICE_WINDOW", "3"))  # main.py default before core.rolling
+
+
+def _payload(i: int) -> str:
+    """One Dexscreener search result as it comes off the wire (parsed per pair, like the HTTP response)."""
+    addr = f"0x{i:040x}"
+    return json.dumps({
+        "chainId": "cronos", "dexId": "vvs", "url": f"https://dexscreener.com/cronos/{addr}",
+        "pairAddress": addr, "labels": ["v2"],
+        "baseToken": {"address": addr, "name": f"Token {i}", "symbol": f"T{i}"},
+        "quoteToken": {"address": "0x5c7f8a570d578ed84e63fdfa7b1ee72deae1ae23", "name": "Wrapped CRO", "symbol": "WCRO"},
+        "priceNative": "0.0123", "priceUsd": "0.00123",
+        "txns": {k: {"buys": 10, "sells": 7} for k in ("m5", "h1", "h6", "h24")},
+        "volume": {"h24": 12345.6, "h6": 2345.6, "h1": 345.6, "m5": 45.6},
+        "priceChange": {"m5": 0.1, "h1": -1.2, "h6": 3.4, "h24": -5.6},
+        "liquidity": {"usd": 123456.7, "base": 1000000, "quote": 2000},
+        "fdv": 1234567, "marketCap": 1234567, "pairCreatedAt": 1700000000000,
+        "info": {"imageUrl": "https://example.invalid/x.png", "websites": [], "socials": []},
+    })
+
+
+def build_baseline(n, samples, interval):
+    """The layout before core.pair_store, as main.ensure_tracking_pair / update_price_history kept it."""
+    tracked_pairs, known_pairs_meta = set(), {}
+    last_prices, price_history, last_pair_tx = {}, {}, {}
+    rnd = random.Random(1)
+    for i in range(n):
+        s = f"cronos/0x{i:040x}"
+        tracked_pairs.add(s); last_prices[s] = None; last_pair_tx[s] = None
+        price_history[s] = deque(maxlen=PRICE_WINDOW)
+        known_pairs_meta[s] = json.loads(_payload(i))  # discovery kept the whole search result
+        for k in range(samples):
+            p = rnd.uniform(0.5, 1.5)
+            price_history[s].append(p); last_prices[s] = p
+        last_pair_tx[s] = f"0x{i:064x}"
+    return tracked_pairs, known_pairs_meta, last_prices, price_history, last_pair_tx
+
+
+def build_compact(n, samples, interval):
+    store = PairStore()
+    rnd = random.Random(1)
+    for i in range(n):
+        st = store.add(f"cronos/0x{i:040x}", json.loads(_payload(i)))
+        for k in range(samples):
+            p = rnd.uniform(0.5, 1.5)
+            st.stats.add(p, ts=k * interval)
+            st.last_price = p
+        st.last_tx = f"0x{i:064x}"
+    return store
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    obj = fn(*args)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    return obj, size
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--pairs", type=int, default=2000)
+    ap.add_argument("--interval", type=float, default=60.0)
+    ap.add_argument("--minutes", type=float, default=60.0)
+    a = ap.parse_args(argv)
+    samples = max(1, int(a.minutes * 60 / a.interval))
+    print(f"{a.pairs} pairs × {samples} samples ({a.interval:g}s interval)")
+    for name, fn in ((f"baseline (json meta + deque[{PRICE_WINDOW}])", build_baseline), ("compact (slots + array rings)", build_compact)):
+        _, size = measure(fn, a.pairs, samples, a.interval)
+        print(f"  {name:36s} {size / a.pairs / 1024:8.2f} KiB/pair  {size / 2**20:8.2f} MiB total")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
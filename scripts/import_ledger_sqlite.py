@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+One-shot import of the existing ledgers into the SQLite backend
+(reports.ledger_sqlite), for switching to LEDGER_BACKEND=sqlite.
+
+Sources:
+  - LEDGER_DIR/transactions_<day>.json   ({"entries": [...]}, pre-JSONL days)
+  - LEDGER_DIR/transactions_<day>.jsonl
+  - CSV ledgers with ts,symbol,qty,side,price_usd,tx columns (app.py /
+    realtime/monitor.py, data/ledger.csv); rows become main.py-shaped entries.
+
+Usage:
+  python scripts/import_ledger_sqlite.py [--db PATH] [--csv data/ledger.csv ...] [--dry-run]
+
+Re-running is safe: a day that is already in the database is skipped, and a
+CSV row whose (txhash, asset) is already there is skipped too.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from reports import ledger  # noqa: E402
+from reports.ledger_sqlite import SqliteLedger, entry_columns  # noqa: E402
+
+DEFAULT_CSVS = ("data/ledger.csv", os.path.join(str(ledger.LEDGER_DIR), "ledger.csv"))
+
+
+def _dec(value: Any) -> Decimal:
+    try:
+        return Decimal(str(value).strip() or "0")
+    except (InvalidOperation, ValueError):
+        return Decimal("0")
+
+
+def csv_entry(row: Dict[str, str]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(day, entry) for one CSV ledger row; None when it has no usable ts/symbol/side."""
+    ts = (row.get("ts") or "").strip()
+    sym = (row.get("symbol") or "").strip().upper()
+    side = (row.get("side") or "").strip().upper()
+    if len(ts) < 10 or not sym or side not in ("IN", "OUT"):
+        return None
+    qty = abs(_dec(row.get("qty")))
+    px = _dec(row.get("price_usd"))
+    sign = 1 if side == "IN" else -1
+    entry = {
+        "time": ts.replace("T", " ")[:19],
+        "txhash": (row.get("tx") or "").strip() or None,
+        "type": "csv",
+        "token": sym,
+        "side": side,
+        "qty": qty,
+        "amount": sign * qty,
+        "price_usd": px,
+        "usd_value": sign * qty * px,
+    }
+    return ts[:10], entry
+
+
+def iter_csv(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            got = csv_entry(row)
+            if got:
+                yield got
+
+
+def run(db: SqliteLedger, csv_paths: List[str], dry_run: bool = False) -> Dict[str, int]:
+    stats = {"days": 0, "day_entries": 0, "csv_rows": 0, "skipped": 0}
+    existing_days = set(db.days())
+    batch: List[Tuple[str, Dict[str, Any]]] = []
+    for day in ledger.ledger_days():  # day files: LEDGER_BACKEND is ignored here on purpose
+        if day in existing_days:
+            stats["skipped"] += 1
+            continue
+        entries = list(ledger._iter_legacy(ledger.legacy_path(day))) + list(ledger._iter_jsonl(ledger.ledger_path(day)))
+        batch.extend((day, e) for e in entries)
+        stats["days"] += 1
+        stats["day_entries"] += len(entries)
+    seen = {(entry_columns(e)[2], entry_columns(e)[0]) for _, e in batch}
+    for path in csv_paths:
+        if not os.path.isfile(path):
+            continue
+        for day, e in iter_csv(path):
+            asset, _, tx, _ = entry_columns(e)
+            if tx and ((tx, asset) in seen or db.has_tx(tx)):
+                stats["skipped"] += 1
+                continue
+            seen.add((tx, asset))
+            batch.append((day, e))
+            stats["csv_rows"] += 1
+    if not dry_run and batch:
+        batch.sort(key=lambda item: (item[0], str(item[1].get("time") or "")))
+        db.append_many(batch)
+    return stats
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--db", default=str(ledger.LEDGER_DB))
+    ap.add_argument("--csv", action="append", default=None, help="CSV ledger (repeatable)")
+    ap.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args(argv)
+    # Force reading the day files even if LEDGER_BACKEND=sqlite is already set.
+    ledger.LEDGER_BACKEND = "jsonl"
+    db = SqliteLedger(a.db, dumps=ledger._dumps, loads=ledger._loads)
+    stats = run(db, a.csv if a.csv is not None else list(DEFAULT_CSVS), dry_run=a.dry_run)
+    print(
+        f"{'would import' if a.dry_run else 'imported'}: {stats['days']} days / {stats['day_entries']} entries, "
+        f"{stats['csv_rows']} CSV rows; skipped {stats['skipped']}; db {a.db} now has {db.count()} entries"
+    )
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,7 @@ Notes:
 - Uses only the **public API** of reports/ledger.py:
     - update_cost_basis()  # bulk rebuild, writes annotated entries & basis file
     - iter_all_entries()   # to compute realized PnL totals for the summary
+- Also replays the open-positions checkpoint (reports/positions.py) in full.
 - Idempotent & safe to rerun.
 """
 
@@ -20,6 +21,7 @@ from collections import defaultdict
 from decimal import Decimal
 
 from reports.ledger import update_cost_basis, iter_all_entries
+from reports.positions import get_checkpoint
 
 
 def _fmt_dec(v: Decimal) -> str:
@@ -34,6 +36,7 @@ def main(argv: list[str] | None = None) -> int:
     # 1) Bulk rebuild (writes annotated entries per day + cost_basis.json)
     try:
         update_cost_basis()  # public bulk path; no args
+        get_checkpoint().rebuild()
     except Exception as e:
         print(f"ERROR: rebuild failed: {e}", file=sys.stderr)
         return 1
@@ -11,9 +11,10 @@ from typing import Any, Dict, List, Optional, Tuple
 from core.holdings import holdings_snapshot, holdings_text
 from core.runtime_state import get_state
 from core.tz import ymd
-from reports.aggregates import aggregate_per_asset, totals as totals_aggregated
+from reports.aggregates import totals as totals_aggregated
 from reports.day_report import build_day_report_text
-from reports.ledger import iter_all_entries, read_ledger
+from reports.history_manifest import get_manifest
+from reports.ledger import entries_for_asset, iter_all_entries, read_ledger
 from reports.weekly import build_weekly_report_text
 from core.holdings_adapters import build_holdings_snapshot
 try:
@@ -70,12 +71,7 @@ def _format_age(ts: Optional[float]) -> str:
 
 
 def _entries_for_asset(symbol: str) -> List[Dict[str, Any]]:
-    symbol = symbol.upper()
-    return [
-        entry
-        for entry in iter_all_entries() or []
-        if str(entry.get("asset") or "").upper() == symbol
-    ]
+    return entries_for_asset(symbol.upper())
 
 
 def _asset_usd(snapshot: Dict[str, Dict[str, Any]], symbol: str) -> Decimal:
@@ -136,7 +132,7 @@ def holdings(limit: int = 20) -> str:
 
 def totals() -> str:
     try:
-        rows = aggregate_per_asset(iter_all_entries())
+        rows = get_manifest().totals("entries")
         summary = totals_aggregated(rows)
     except Exception:
         return "Totals unavailable."
@@ -289,22 +285,21 @@ def weekly_report_for_date(target_date: Optional[str] = None, days: int = 7) ->
 
 
 def ledger_entries(symbol: Optional[str] = None, limit: int = 10) -> str:
-    try:
-        entries = list(iter_all_entries())
-    except Exception:
-        entries = []
-    if not entries:
-        return "No ledger entries available."
-
     if symbol:
         symbol = symbol.upper()
-        entries = [
-            entry
-            for entry in entries
-            if str(entry.get("asset") or "").upper() == symbol
-        ]
+        try:
+            entries = _entries_for_asset(symbol)
+        except Exception:
+            entries = []
         if not entries:
             return f"No ledger entries for {symbol}."
+    else:
+        try:
+            entries = list(iter_all_entries())
+        except Exception:
+            entries = []
+        if not entries:
+            return "No ledger entries available."
 
     entries = entries[:limit]
     lines = [f"Last {len(entries)} ledger entries:"]
@@ -29,3 +29,34 @@ def test_aggregate_and_format_simple():
     assert "Totals per Asset — Today" in txt
     assert "MCGA" in txt
     assert "TXs: 3" in txt
+
+
+def test_accumulate_in_pieces_and_ledger_rows_match_one_pass():
+    from reports.aggregates import accumulate, accumulate_ledger, dump_accumulator, load_accumulator, rows_from
+
+    entries = [
+        {"asset": "mcga", "side": "in", "qty": 1.1, "usd": 2.20, "wallet": "0xAA"},
+        {"asset": "MCGA", "side": "OUT", "qty": Decimal("0.10"), "usd": "0.3", "realized_usd": 0.1},
+        {"asset": "WAVE", "side": "SWAP", "qty": True, "usd": None, "realized_usd": Decimal("-2.50")},
+        {"asset": None, "side": "IN", "qty": 3, "usd": "x", "wallet": "0xbb"},
+        {"asset": "WAVE", "side": "IN", "qty": 1e-7, "usd": 5, "realized_usd": 1},
+        "not a dict",
+    ]
+    as_str = lambda rows: [{k: str(v) for k, v in r.items()} for r in rows]
+    for wallet in (None, "0xaa"):
+        acc = load_accumulator(dump_accumulator(accumulate({}, entries[:2], wallet=wallet)))
+        got = rows_from(accumulate(acc, entries[2:], wallet=wallet))
+        assert as_str(got) == as_str(aggregate_per_asset(entries, wallet=wallet))
+
+    ledger_rows = [
+        {"token": "cro", "amount": Decimal("12.5"), "usd_value": Decimal("1.25")},
+        {"token": "CRO", "amount": -2, "usd_value": 0.2, "realized_pnl": Decimal("0.05")},
+        {"token": None, "amount": 0, "usd_value": None},
+    ]
+    mapped = [
+        {"asset": (e.get("token") or "?").upper(), "side": "IN" if float(e["amount"]) > 0 else "OUT",
+         "qty": abs(float(e["amount"])), "usd": float(e.get("usd_value") or 0.0),
+         "realized_usd": float(e.get("realized_pnl") or 0.0)}
+        for e in ledger_rows
+    ]
+    assert as_str(rows_from(accumulate_ledger({}, ledger_rows))) == as_str(aggregate_per_asset(mapped))
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import pytest
+
+from core import block_follower as bf
+from core import logscan
+
+WALLET = "0x" + "ab" * 20
+_TOPIC = bytes.fromhex(logscan.TRANSFER_TOPIC[2:])
+_WALLET_TOPIC = bytes.fromhex(logscan.wallet_topic(WALLET)[2:])
+_OTHER_TOPIC = bytes.fromhex(logscan.wallet_topic("0x" + "cd" * 20)[2:])
+# fixed bit indexes instead of keccak, so the test runs without eth_hash
+_BITS = {_TOPIC: [1, 700, 2047], _WALLET_TOPIC: [5, 900, 1500], _OTHER_TOPIC: [6, 901, 1501]}
+
+
+@pytest.fixture(autouse=True)
+def _fixed_bloom_bits(monkeypatch):
+    monkeypatch.setattr(bf, "bloom_bits", lambda value: _BITS[value])
+
+
+def _bloom(*values: bytes) -> str:
+    raw = bytearray(256)
+    for v in values:
+        for b in bf.bloom_bits(v):
+            raw[255 - b // 8] |= 1 << (b % 8)
+    return "0x" + raw.hex()
+
+
+class _FakeClient:
+    def __init__(self, head, blooms):
+        self.head, self.blooms, self.batches = head, blooms, []
+
+    def block_number(self):
+        return self.head
+
+    def batch(self, calls):
+        self.batches.append(calls)
+        out = []
+        for method, params in calls:
+            if method == "eth_getBlockByNumber":
+                out.append({"logsBloom": self.blooms.get(int(params[0], 16), "0x" + "00" * 256)})
+            else:
+                out.append([{"transactionHash": "0x" + "11" * 32}])
+        return out
+
+
+def test_follower_only_flags_blocks_whose_bloom_may_match():
+    client = _FakeClient(100, {102: _bloom(_TOPIC, _WALLET_TOPIC), 103: _bloom(_TOPIC, _OTHER_TOPIC)})
+
+    f = bf.BlockFollower(client, WALLET)
+    assert f.poll() == []  # anchors at head
+    client.head = 104
+    assert f.poll() == [102]
+    assert f.last_block == 104 and f.headers_fetched == 4
+    assert len(f.transfer_logs([102])) == 2  # from + to filters in one batch
+    assert len(client.batches[-1]) == 2
+
+
+def test_failed_get_logs_block_is_requeued():
+    from core.jsonrpc import RpcError
+
+    class _Flaky(_FakeClient):
+        fail = True
+
+        def batch(self, calls):
+            out = super().batch(calls)
+            if self.fail and calls[0][0] == "eth_getLogs":
+                out[0] = RpcError("upstream timeout")
+            return out
+
+    client = _Flaky(100, {102: _bloom(_TOPIC, _WALLET_TOPIC)})
+    f = bf.BlockFollower(client, WALLET)
+    f.poll()
+    client.head = 104
+    hits = f.poll()
+    assert len(f.transfer_logs(hits)) == 1  # the "from" filter failed
+    assert f.retry_blocks == [102]
+    client.fail = False
+    assert f.poll() == [102]  # no new headers, the failed block comes back
+    assert len(f.transfer_logs([102])) == 2 and f.retry_blocks == []
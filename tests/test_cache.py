@@ -0,0 +1,44 @@
+from core.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_ttl_expiry_and_negative_ttl():
+    clock = Clock()
+    c = TTLCache(10, ttl=60, negative_ttl=5, clock=clock)
+    c.set("good", 1.5)
+    c.set("spam", None)
+    assert c.lookup("spam") == (True, None)
+    assert c.get("good") == 1.5
+    clock.t = 6
+    assert c.lookup("spam") == (False, None)
+    assert c.get("good") == 1.5
+    clock.t = 61
+    assert "good" not in c
+    s = c.stats()
+    assert s["negative_hits"] == 1 and s["expirations"] == 2
+
+
+def test_lru_eviction():
+    c = TTLCache(2)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")  # a is now most recently used
+    c.set("c", 3)
+    assert "b" not in c and c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+
+def test_add_is_set_if_absent():
+    clock = Clock()
+    c = TTLCache(10, ttl=30, clock=clock)
+    assert c.add("alert") is True
+    assert c.add("alert") is False
+    clock.t = 31
+    assert c.add("alert") is True
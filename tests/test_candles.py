@@ -0,0 +1,98 @@
+import os
+
+from core.candles import _REC, RECORD_SIZE, CandleStore
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1_000_020.0  # bucket starts: 1m 1_000_020, 5m 999_900, 1h 997_200
+
+    def __call__(self):
+        return self.t
+
+
+def _store(tmp_path, clock, **kw):
+    return CandleStore(str(tmp_path), clock=clock, flush_every=10**9, background=False, **kw)
+
+
+def test_builds_ohlcv_and_appends_closed_candles(tmp_path):
+    clock = Clock()
+    st = _store(tmp_path, clock)
+    for dt, p in [(0, 1.0), (10, 3.0), (20, 0.5), (30, 2.0), (60, 2.5)]:
+        st.record("CRO", p, ts=clock.t + dt, volume=1)
+    path = os.path.join(str(tmp_path), "1m", "cro.bin")
+    assert os.path.getsize(path) == RECORD_SIZE  # only the closed minute is on disk
+    c1, c2 = st.candles("cro", clock.t, clock.t + 120, "1m")
+    assert (c1.open, c1.high, c1.low, c1.close, c1.volume) == (1.0, 3.0, 0.5, 2.0, 4.0)
+    assert c2.open == 2.5
+    (five,) = st.candles("cro", clock.t, clock.t + 120, "5m")
+    assert (five.open, five.high, five.low, five.close) == (1.0, 3.0, 0.5, 2.5)
+
+
+def test_flush_then_restart_resumes_open_candle(tmp_path):
+    clock = Clock()
+    st = _store(tmp_path, clock)
+    st.record("0xabc", 1.0, ts=clock.t)
+    st.record("0xabc", 2.0, ts=clock.t + 5)
+    assert st.flush() == 3
+
+    again = _store(tmp_path, clock)
+    again.record("0xabc", 0.5, ts=clock.t + 10)
+    (c,) = again.candles("0xabc", clock.t, clock.t + 30, "1m")
+    assert (c.open, c.high, c.low, c.close) == (1.0, 2.0, 0.5, 0.5)
+    assert again.recent_price("0xABC") == 0.5
+
+
+def test_range_query_and_late_samples(tmp_path):
+    clock = Clock()
+    st = _store(tmp_path, clock)
+    for i in range(30):
+        st.record("cronos/0xpair", 1.0 + i, ts=clock.t + 60 * i)
+    st.record("cronos/0xpair", 999.0, ts=clock.t)  # late: its minute is closed
+    got = st.candles("cronos/0xpair", clock.t + 600, clock.t + 900, "1m")
+    assert [c.close for c in got] == [11.0, 12.0, 13.0, 14.0, 15.0, 16.0]
+    assert st.change_pct("cronos/0xpair", clock.t, now=clock.t + 60 * 29) == (30.0 - 1.0) / 1.0 * 100
+
+
+def test_compact_drops_expired_and_duplicate_records(tmp_path):
+    clock = Clock()
+    st = _store(tmp_path, clock, resolutions={"1m": 60}, retention={"1m": 3600})
+    st.record("cro", 1.0, ts=clock.t)
+    st.flush()
+    st.record("cro", 2.0, ts=clock.t + 1)
+    st.flush()
+    st.record("cro", 3.0, ts=clock.t + 7200)  # closes the first minute (already flushed)
+    path = os.path.join(str(tmp_path), "1m", "cro.bin")
+    assert os.path.getsize(path) == 2 * RECORD_SIZE
+    clock.t += 7200
+    assert st.compact() == 2
+    assert not os.path.exists(path)
+    assert st.candles("cro", clock.t - 60)[-1].close == 3.0
+    assert st.pick_resolution(clock.t - 10) == "1m"
+
+
+def test_sample_older_than_disk_is_dropped_after_restart(tmp_path):
+    clock = Clock()
+    st = _store(tmp_path, clock, resolutions={"1m": 60})
+    st.record("cro", 1.0, ts=clock.t)
+    st.record("cro", 2.0, ts=clock.t + 60)
+    st.flush()
+
+    again = _store(tmp_path, clock, resolutions={"1m": 60})
+    again.record("cro", 9.0, ts=clock.t + 5)  # its minute is already on disk and closed
+    again.flush()
+    with open(os.path.join(str(tmp_path), "1m", "cro.bin"), "rb") as f:
+        raw = f.read()
+    assert [_REC.unpack_from(raw, i)[0] for i in range(0, len(raw), RECORD_SIZE)] == [1_000_020, 1_000_080]
+    assert [c.close for c in again.candles("cro", clock.t, clock.t + 120, "1m")] == [1.0, 2.0]
+
+
+def test_record_leaves_flushing_to_maintenance(tmp_path):
+    clock = Clock()
+    st = CandleStore(str(tmp_path), clock=clock, flush_every=10, background=False)
+    st.record("cro", 1.0, ts=clock.t)
+    clock.t += 30
+    st.record("cro", 2.0, ts=clock.t)  # same 1h bucket: nothing closes, nothing is written
+    assert not os.path.exists(os.path.join(str(tmp_path), "1h", "cro.bin"))
+    st.maintain()
+    assert os.path.getsize(os.path.join(str(tmp_path), "1h", "cro.bin")) == RECORD_SIZE
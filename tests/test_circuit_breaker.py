@@ -0,0 +1,19 @@
+from core import circuit_breaker
+from core.circuit_breaker import CircuitBreaker
+
+
+def test_opens_after_max_failures_and_closes_after_open_sec(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "time", lambda: now[0])
+    cb = CircuitBreaker(2, 30)
+    cb.record_failure(404)  # client errors are not counted
+    cb.record_failure()
+    assert cb.allow()
+    cb.record_failure(503)
+    assert not cb.allow()
+    now[0] += 30
+    assert cb.allow()
+    cb.record_failure(429)  # one failure was kept: re-opens at once
+    assert not cb.allow()
+    cb.record_success()
+    assert cb.allow() and cb.fail_count == 0
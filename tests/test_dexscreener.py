@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from core import dexscreener
+
+A = "0x" + "0a" * 20
+B = "0x" + "0b" * 20
+
+
+def _pair(base, price, liq, chain="cronos"):
+    return {"chainId": chain, "baseToken": {"address": base}, "priceUsd": str(price), "liquidity": {"usd": liq}}
+
+
+def test_best_prices_chunks_and_picks_deepest_cronos_pair(monkeypatch):
+    urls = []
+
+    def fake_get_json(url, **kw):
+        urls.append(url)
+        return {"pairs": [
+            _pair(A.upper().replace("0X", "0x"), 1.0, 100),
+            _pair(A, 1.5, 5000),
+            _pair(A, 9.0, 10**9, chain="ethereum"),
+            _pair(B, 0, 10**6),  # no price
+        ]}
+
+    monkeypatch.setattr(dexscreener, "get_json", fake_get_json)
+    prices = dexscreener.best_prices([A, B, "0x" + "0c" * 20, "junk"])
+
+    assert prices == {A: 1.5, B: None, "0x" + "0c" * 20: None}
+    assert len(urls) == 1 and urls[0].endswith(",".join([A, B, "0x" + "0c" * 20]))
+
+    urls.clear()
+    dexscreener.fetch_pairs_bulk(["0x%040x" % i for i in range(61)])
+    assert len(urls) == 3
+
+
+def test_fetch_pairs_multi_batches_and_matches_by_pair_address(monkeypatch):
+    urls = []
+    pairs = ["0x%040x" % i for i in range(1, 36)]
+
+    def fake_get_json(url, **kw):
+        urls.append(url)
+        asked = url.rsplit("/", 1)[1].split(",")
+        return {"pairs": [{"pairAddress": a.upper().replace("0X", "0x")} for a in asked if a != pairs[3]]}
+
+    monkeypatch.setattr(dexscreener, "get_json", fake_get_json)
+    got = dexscreener.fetch_pairs_multi("cronos", pairs)
+
+    assert len(urls) == 2 and urls[0].startswith(dexscreener.DEX_PAIRS_URL + "/cronos/")
+    assert set(got) == set(pairs) - {pairs[3]}
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import importlib
+
+
+def _modules(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER_DIR", str(tmp_path))
+    monkeypatch.delenv("LEDGER_BACKEND", raising=False)
+    ledger = importlib.reload(importlib.import_module("reports.ledger"))
+    manifest = importlib.reload(importlib.import_module("reports.history_manifest"))
+    return ledger, manifest
+
+
+def _tx(day, token, addr, price):
+    return {"time": f"{day} 10:00:00", "token": token, "token_addr": addr, "amount": 1.0, "price_usd": price}
+
+
+def test_manifest_rereads_only_changed_days(tmp_path, monkeypatch):
+    ledger, manifest = _modules(tmp_path, monkeypatch)
+    for i in range(1, 6):
+        ledger.append_ledger(_tx(f"2024-06-0{i}", "VVS", "0xvvs", float(i)))
+    ledger.append_ledger(_tx("2024-06-02", "DUP", "0xd1", 1.0))
+    ledger.append_ledger(_tx("2024-06-03", "DUP", "0xd2", 1.0))
+    ledger.append_ledger(_tx("2024-06-03", "CRO", None, 0.1))
+    clock = [0.0]
+    m = manifest.HistoryManifest(reuse_sec=2, clock=lambda: clock[0])
+
+    first = m.maps()
+    assert m.reads == 5
+    assert first.symbol_to_contract == {"VVS": "0xvvs"}  # DUP has two contracts
+    assert first.contracts == {"0xvvs", "0xd1", "0xd2"}
+    assert first.last_price["0xvvs"] == 5.0 and first.last_price["CRO"] == 0.1
+    assert m.maps() is first  # same request window: no disk access
+
+    clock[0] = 10
+    assert m.maps() is first and m.reads == 5  # nothing changed
+    ledger.append_ledger(_tx("2024-06-05", "VVS", "0xvvs", 7.0))
+    clock[0] = 20
+    again = manifest.HistoryManifest(reuse_sec=0)  # persisted state: only the grown tail is read
+    assert again.maps().last_price["0xvvs"] == 7.0
+    assert again.reads == 1
+    ledger._writer.close()
+
+
+def test_manifest_rereads_a_past_day_edited_in_place(tmp_path, monkeypatch):
+    import time
+
+    ledger, manifest = _modules(tmp_path, monkeypatch)
+    ledger.append_ledger(_tx("2024-06-01", "VVS", "0xvvs", 1.0))
+    ledger.append_ledger(_tx("2024-06-02", "CRO", None, 0.1))
+    ledger._writer.close()
+    m = manifest.HistoryManifest(reuse_sec=0)
+    assert m.maps().last_price["0xvvs"] == 1.0
+
+    time.sleep(0.05)  # a later edit, past the filesystem's mtime granularity
+    path = ledger.ledger_path("2024-06-01")
+    path.write_text(path.read_text().replace('"price_usd":1.0', '"price_usd":2.0'))
+    assert m.maps().last_price["0xvvs"] == 2.0
+
+
+def test_manifest_totals_match_one_pass_and_add_only_new_rows(tmp_path, monkeypatch):
+    import time
+
+    from reports.aggregates import accumulate_ledger, rows_from
+
+    ledger, manifest = _modules(tmp_path, monkeypatch)
+    days = ["2024-06-01", "2024-06-02", "2024-06-03"]
+    for i in range(60):  # wide exponent spread, so a different order of additions would round differently
+        ledger.append_ledger({"time": f"{days[i % 3]} 10:00:00", "token": "VVS" if i % 2 else "DUST",
+                              "amount": (-1) ** i * (10 ** (i % 9)) / 7.0, "usd_value": 98765432.123 / 3 ** i,
+                              "realized_pnl": 1e-9 * i})
+    ledger._writer.close()
+    one_pass = lambda first=None, last=None: [
+        {k: str(v) for k, v in r.items()}
+        for r in rows_from(accumulate_ledger({}, (e for d in days if (first or d) <= d <= (last or d)
+                                                  for e in ledger.iter_ledger(d))))
+    ]
+    as_str = lambda rows: [{k: str(v) for k, v in r.items()} for r in rows]
+
+    m = manifest.HistoryManifest(reuse_sec=0)
+    assert as_str(m.totals()) == one_pass()
+    assert as_str(m.totals("ledger", "2024-06-02", "2024-06-02")) == one_pass("2024-06-02", "2024-06-02")
+
+    ledger.append_ledger({"time": "2024-06-03 11:00:00", "token": "VVS", "amount": 3.3, "usd_value": 1e-12})
+    ledger._writer.close()
+    again = manifest.HistoryManifest(reuse_sec=0)  # persisted accumulators: only the grown tail is read
+    assert as_str(again.totals()) == one_pass()
+    assert again.reads == 1
+
+    time.sleep(0.05)
+    path = ledger.ledger_path("2024-06-01")
+    path.write_text(path.read_text().replace('"token":"DUST"', '"token":"VVS"', 1))  # a past day edited in place
+    assert as_str(again.totals()) == one_pass()
+    assert as_str(again.totals("ledger", "2024-06-02", "2024-06-02")) == one_pass("2024-06-02", "2024-06-02")
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import core.jsonrpc as jr
+
+
+def test_batch_splits_and_maps_item_errors(monkeypatch):
+    posts = []
+
+    def fake_post(url, payload, timeout):
+        posts.append(len(payload))
+        if len(payload) > 3:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch limit exceeded"}}
+        out = []
+        for item in reversed(payload):  # providers may answer out of order
+            n = item["params"][0]
+            if n == 4:
+                out.append({"jsonrpc": "2.0", "id": item["id"], "error": {"code": 3, "message": "execution reverted"}})
+            else:
+                out.append({"jsonrpc": "2.0", "id": item["id"], "result": n * 10})
+        return out
+
+    monkeypatch.setattr(jr, "_post", fake_post)
+    res = jr.rpc_batch("http://rpc", [("echo", [n]) for n in range(7)], max_batch=7)
+
+    assert posts == [7, 3, 4, 2, 2]  # one array first, then halved until accepted
+    assert [r for i, r in enumerate(res) if i != 4] == [0, 10, 20, 30, 50, 60]
+    assert isinstance(res[4], jr.RpcError) and res[4].code == 3
+
+
+def test_batch_transport_error_marks_chunk(monkeypatch):
+    def boom(url, payload, timeout):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(jr, "_post", boom)
+    res = jr.rpc_batch("http://rpc", [("eth_blockNumber", [])] * 2)
+    assert len(res) == 2 and all(isinstance(r, jr.RpcError) for r in res)
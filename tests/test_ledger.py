@@ -38,3 +38,76 @@ def test_cost_basis_replay(tmp_path, monkeypatch):
 
     basis_file = ledger.COST_BASIS_FILE
     assert basis_file.exists()
+
+
+def test_append_is_one_line_and_fsync_is_grouped(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER_DIR", str(tmp_path))
+    monkeypatch.setenv("LEDGER_FSYNC_EVERY", "3")
+    monkeypatch.setenv("LEDGER_FSYNC_SEC", "60")
+    ledger = importlib.reload(importlib.import_module("reports.ledger"))
+    synced = []
+    monkeypatch.setattr(ledger.os, "fsync", lambda fd: synced.append(fd))
+
+    for i in range(4):
+        ledger.append_ledger({"time": "2024-01-02 10:00:00", "token": "CRO", "amount": i, "price_usd": Decimal("0.1")})
+    assert len(synced) == 1  # one group of three; the fourth waits for the timer
+    path = tmp_path / "transactions_2024-01-02.jsonl"
+    assert len(path.read_text().splitlines()) == 4
+    assert ledger.read_ledger("2024-01-02")[3]["price_usd"] == Decimal("0.1")
+    ledger._writer.close()
+
+
+def test_reads_legacy_json_days_and_skips_torn_line(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER_DIR", str(tmp_path))
+    ledger = importlib.reload(importlib.import_module("reports.ledger"))
+    (tmp_path / "transactions_2024-01-01.json").write_text('{"entries": [{"token": "OLD", "amount": 1}]}')
+    (tmp_path / "transactions_2024-01-02.jsonl").write_text('{"token": "A", "amount": 1}\n{"token": "B", "am')
+
+    assert ledger.ledger_days() == ["2024-01-01", "2024-01-02"]
+    assert [e["token"] for e in ledger.iter_all_entries()] == ["OLD", "A"]
+
+
+def test_running_average_cost_replay():
+    from reports.ledger import replay_cost_basis_over_entries
+
+    qty, cost = {}, {}
+    entries = [
+        {"token": "ABC", "amount": 10, "price_usd": 1.0},
+        {"token": "ABC", "amount": 10, "price_usd": 2.0},
+        {"token": "ABC", "amount": -5, "price_usd": 3.0},
+    ]
+    assert replay_cost_basis_over_entries(qty, cost, entries) == 7.5
+    assert entries[2]["realized_pnl"] == 7.5
+    assert qty["ABC"] == 15 and cost["ABC"] == 22.5
+
+
+def test_rewrite_holds_appends_and_skips_the_current_day(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setenv("LEDGER_DIR", str(tmp_path))
+    monkeypatch.delenv("LEDGER_BACKEND", raising=False)
+    ledger = importlib.reload(importlib.import_module("reports.ledger"))
+    ledger.append_ledger("2023-11-14", {"side": "IN", "asset": "ABC", "qty": "10", "usd": "100"})
+    today = ledger.ymd()
+    ledger.append_ledger(today, {"side": "OUT", "asset": "ABC", "qty": "4", "usd": "80"})
+    today_bytes = ledger.ledger_path(today).read_bytes()
+
+    late = threading.Thread(
+        target=ledger.append_ledger, args=("2023-11-14", {"side": "IN", "asset": "XYZ", "qty": "1", "usd": "1"})
+    )
+    real_iter = ledger.iter_ledger
+
+    def iter_and_race(day):
+        yield from real_iter(day)
+        if day == "2023-11-14" and late.ident is None:
+            late.start()  # an append that lands between the read and the replace
+            late.join(0.2)
+
+    monkeypatch.setattr(ledger, "iter_ledger", iter_and_race)
+    state = ledger.update_cost_basis()
+    late.join()
+
+    assert [e["asset"] for e in ledger.read_ledger("2023-11-14")] == ["ABC", "XYZ"]
+    assert ledger.ledger_path(today).read_bytes() == today_bytes  # not rewritten under a live writer
+    assert Decimal(state["assets"]["ABC"]["realized_usd"]) == Decimal("40")
+    ledger._writer.close()
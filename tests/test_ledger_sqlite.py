@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import importlib
+import sqlite3
+from decimal import Decimal
+
+
+def _reload(monkeypatch, tmp_path, backend):
+    monkeypatch.setenv("LEDGER_DIR", str(tmp_path))
+    monkeypatch.setenv("LEDGER_BACKEND", backend)
+    monkeypatch.delenv("LEDGER_DB", raising=False)
+    return importlib.reload(importlib.import_module("reports.ledger"))
+
+
+def test_sqlite_backend_queries(tmp_path, monkeypatch):
+    ledger = _reload(monkeypatch, tmp_path, "sqlite")
+    ledger.append_ledger({"time": "2024-01-31 23:00:00", "txhash": "0xA1", "token": "CRO", "amount": 10, "price_usd": Decimal("0.1")})
+    ledger.append_ledger({"time": "2024-02-01 09:00:00", "txhash": "0xb2", "token": "VVS", "token_addr": "0xVVS", "amount": 5})
+    ledger.append_ledger({"time": "2024-02-29 09:00:00", "txhash": "0xc3", "token": "CRO", "amount": -4})
+
+    assert ledger.ledger_days() == ["2024-01-31", "2024-02-01", "2024-02-29"]
+    assert [e["txhash"] for e in ledger.iter_days_between("2024-02-01", "2024-02-31")] == ["0xb2", "0xc3"]
+    assert [e["amount"] for e in ledger.entries_for_asset("cro")] == [10, -4]
+    assert [e["txhash"] for e in ledger.entries_for_asset("0xvvs")] == ["0xb2"]
+    assert ledger.has_tx("0xa1") and not ledger.has_tx("0xdead")
+    assert ledger.read_ledger("2024-01-31")[0]["price_usd"] == Decimal("0.1")
+    assert not list(tmp_path.glob("transactions_*"))
+
+    with sqlite3.connect(str(tmp_path / "ledger.sqlite3")) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        plan = " ".join(
+            r[-1] for r in conn.execute("EXPLAIN QUERY PLAN SELECT 1 FROM entries WHERE txhash = '0xa1' AND type = 'native'")
+        )
+    assert "ix_entries_tx_type" in plan
+
+    ledger.update_cost_basis()
+    assert ledger.read_ledger("2024-02-29")[0]["realized_usd"] == Decimal("-0.4")  # sold at no price
+
+
+def test_has_tx_by_type_ignores_other_legs_of_the_hash(tmp_path, monkeypatch):
+    for backend in ("jsonl", "sqlite"):
+        ledger = _reload(monkeypatch, tmp_path / backend, backend)
+        ledger.append_ledger({"time": "2024-01-02 10:00:00", "txhash": "0xSW", "type": "erc20", "token": "VVS", "amount": 5})
+        assert ledger.has_tx("0xsw") and not ledger.has_tx("0xsw", type="native")
+        ledger.append_ledger({"time": "2024-01-02 10:00:00", "txhash": "0xsw", "type": "native", "token": "CRO", "amount": -1})
+        assert ledger.has_tx("0xsw", type="native")
+        ledger._writer.close()
+
+
+def test_jsonl_backend_has_tx_and_asset_lookup(tmp_path, monkeypatch):
+    ledger = _reload(monkeypatch, tmp_path, "jsonl")
+    ledger.append_ledger({"time": "2024-01-02 10:00:00", "txhash": "0xAA", "asset": "ABC", "side": "IN", "qty": 1})
+    assert ledger.has_tx("0xaa")
+    ledger.append_ledger({"time": "2024-01-03 10:00:00", "txhash": "0xbb", "token": "ABC", "amount": -1})
+    assert ledger.has_tx("0xBB")  # appended after the index was built
+    assert len(ledger.entries_for_asset("abc")) == 2
+    ledger._writer.close()
+
+
+def test_importer_reads_day_files_and_csv_once(tmp_path, monkeypatch):
+    ledger = _reload(monkeypatch, tmp_path, "jsonl")
+    (tmp_path / "transactions_2024-03-01.json").write_text('{"entries": [{"time": "2024-03-01 08:00:00", "txhash": "0x1", "token": "CRO", "amount": 2}]}')
+    ledger.append_ledger({"time": "2024-03-02 08:00:00", "txhash": "0x2", "token": "CRO", "amount": -1})
+    ledger._writer.close()
+    csv_path = tmp_path / "ledger.csv"
+    csv_path.write_text(
+        "ts,symbol,qty,side,price_usd,tx\n"
+        "2024-03-02T08:00:00+02:00,CRO,1,OUT,0.1,0x2\n"
+        "2024-03-03T08:00:00+02:00,vvs,3,IN,0.5,0x3\n"
+    )
+    imp = importlib.import_module("scripts.import_ledger_sqlite")
+    db_path = str(tmp_path / "ledger.sqlite3")
+
+    assert imp.main(["--db", db_path, "--csv", str(csv_path)]) == 0
+    assert imp.main(["--db", db_path, "--csv", str(csv_path)]) == 0
+
+    db = imp.SqliteLedger(db_path, dumps=ledger._dumps, loads=ledger._loads)
+    assert db.count() == 3
+    assert db.days() == ["2024-03-01", "2024-03-02", "2024-03-03"]
+    (row,) = db.for_asset("VVS")
+    assert row["amount"] == Decimal("3") and row["usd_value"] == Decimal("1.5")
+    db.close()
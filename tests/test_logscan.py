@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from core import logscan
+
+WALLET = "0x" + "ab" * 20
+
+
+def test_bisects_limits_retries_and_reports_gaps():
+    calls = []
+    flaky = {"n": 0}
+
+    def get_logs(flt):
+        fb, tb = flt["fromBlock"], flt["toBlock"]
+        calls.append((fb, tb))
+        if tb - fb + 1 > 50:
+            raise ValueError("query returned more than 10000 results")
+        if fb <= 120 <= tb and flaky["n"] == 0:
+            flaky["n"] += 1
+            raise ConnectionError("reset by peer")
+        if fb <= 170 <= tb:
+            raise ConnectionError("still down")
+        return [{"address": "0x" + "%040x" % b} for b in range(fb, tb + 1) if b % 25 == 0]
+
+    res = logscan.scan_transfer_contracts(get_logs, WALLET, 0, 199, chunk=200, workers=3, retries=1, retry_delay=0)
+
+    assert [g[:2] for g in res.gaps] == [(150, 199), (150, 199)]  # one per topic filter
+    assert res.covered_until == 149 and res.covered_from == 200
+    assert {int(a, 16) for a in res.addresses()} == {0, 25, 50, 75, 100, 125}
+    assert any(tb - fb + 1 <= 50 for fb, tb in calls)
+
+
+def test_rate_limit_is_not_a_range_limit():
+    assert logscan.is_limit_error(ValueError("block range too large"))
+    assert not logscan.is_limit_error(ValueError("429 rate limit exceeded"))
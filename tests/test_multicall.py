@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from core import multicall
+
+
+def _word(n: int) -> bytes:
+    return n.to_bytes(32, "big")
+
+
+def _abi_string(s: str) -> bytes:
+    raw = s.encode()
+    return _word(32) + _word(len(raw)) + raw.ljust(32, b"\x00")
+
+
+TOKEN = "0x" + "11" * 20
+OWNER = "0x" + "22" * 20
+
+
+def _fake_token_call(to: str, data: str):
+    sel = data[2:10]
+    if sel == multicall.SEL_BALANCE_OF:
+        return "0x" + _word(5 * 10**6).hex()
+    if sel == multicall.SEL_DECIMALS:
+        return "0x" + _word(6).hex()
+    if sel == multicall.SEL_SYMBOL:
+        return "0x" + _abi_string("USDC").hex()
+    return None
+
+
+def _encode_results(results):
+    # (bool, bytes)[] encoder mirroring aggregate3's return layout
+    n = len(results)
+    heads, tails, offset = [], [], 32 * n
+    for ok, data in results:
+        tup = _word(1 if ok else 0) + _word(64) + _word(len(data)) + data.ljust(((len(data) + 31) // 32) * 32, b"\x00")
+        heads.append(_word(offset))
+        tails.append(tup)
+        offset += len(tup)
+    return "0x" + (_word(32) + _word(n) + b"".join(heads) + b"".join(tails)).hex()
+
+
+def test_read_batch_through_aggregate3():
+    calls_seen = []
+
+    def eth_call(to, data):
+        calls_seen.append(to)
+        assert to == multicall.MULTICALL3_DEFAULT
+        payload = bytes.fromhex(data[10:])
+        n = int.from_bytes(payload[32:64], "big")
+        results = []
+        for i in range(n):
+            tup = 64 + int.from_bytes(payload[64 + 32 * i:96 + 32 * i], "big")
+            target = "0x" + payload[tup + 12:tup + 32].hex()
+            blen = int.from_bytes(payload[tup + 96:tup + 128], "big")
+            inner = "0x" + payload[tup + 128:tup + 128 + blen].hex()
+            if target == multicall.MULTICALL3_DEFAULT.lower():
+                results.append((True, _word(3 * 10**18)))
+            else:
+                res = _fake_token_call(target, inner)
+                results.append((res is not None, bytes.fromhex(res[2:]) if res else b""))
+        return _encode_results(results)
+
+    rows = multicall.read_erc20_batch(
+        [TOKEN], OWNER, eth_call, include_native=True, multicall_address=multicall.MULTICALL3_DEFAULT
+    )
+    assert len(calls_seen) == 1
+    assert rows[TOKEN] == {"balance": 5 * 10**6, "decimals": 6, "symbol": "USDC"}
+    assert rows["CRO"]["balance"] == 3 * 10**18
+
+
+def test_read_batch_per_call_fallback_without_multicall():
+    rows = multicall.read_erc20_batch(
+        [TOKEN, TOKEN.upper().replace("0X", "0x")],
+        OWNER,
+        _fake_token_call,
+        include_native=True,
+        get_balance=lambda addr: 7,
+        multicall_address="",
+    )
+    assert list(rows) == [TOKEN, "CRO"]
+    assert rows[TOKEN]["symbol"] == "USDC"
+    assert rows["CRO"]["balance"] == 7
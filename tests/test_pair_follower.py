@@ -0,0 +1,69 @@
+from core.pair_follower import SWAP_TOPIC, SYNC_TOPIC, PairFollower, PairInfo, fold_logs
+
+PAIR = "0x" + "ab" * 20
+QUIET = "0x" + "cd" * 20
+
+
+def _sync(block, idx, r0, r1, pair=PAIR):
+    return {"address": pair, "blockNumber": hex(block), "logIndex": hex(idx),
+            "topics": [SYNC_TOPIC], "data": "0x" + format(r0, "064x") + format(r1, "064x")}
+
+
+def _swap(block, idx, tx, pair=PAIR):
+    return {"address": pair, "blockNumber": hex(block), "logIndex": hex(idx),
+            "topics": [SWAP_TOPIC, "0x0", "0x0"], "data": "0x", "transactionHash": tx}
+
+
+class FakeClient:
+    def __init__(self, logs):
+        self.head = 100
+        self.logs = logs
+        self.filters = []
+
+    def block_number(self):
+        return self.head
+
+    def get_logs(self, flt):
+        self.filters.append(flt)
+        return [lg for lg in self.logs if flt["fromBlock"] <= int(lg["blockNumber"], 16) <= flt["toBlock"]]
+
+
+def test_fold_keeps_last_sync_and_swap():
+    upd = fold_logs([_sync(12, 1, 5, 6), _swap(11, 0, "0xa"), _sync(11, 1, 1, 2), _swap(12, 0, "0xb")])[PAIR]
+    assert (upd.reserve0, upd.reserve1) == (5, 6)
+    assert upd.last_swap_tx == "0xb" and upd.swaps == 2 and upd.block == 12
+
+
+def test_poll_one_query_for_all_pairs_and_quiet_pairs_absent():
+    client = FakeClient([_sync(101, 0, 10, 20), _swap(101, 1, "0xt")])
+    f = PairFollower(client)
+    assert f.poll([PAIR, QUIET]) == {}  # anchors
+    client.head = 103
+    updates = f.poll([PAIR.upper().replace("0X", "0x"), QUIET])
+    assert list(updates) == [PAIR]
+    assert len(client.filters) == 1
+    flt = client.filters[0]
+    assert flt["address"] == sorted([PAIR, QUIET])
+    assert flt["topics"] == [[SYNC_TOPIC, SWAP_TOPIC]]
+    assert (flt["fromBlock"], flt["toBlock"]) == (101, 103)
+    assert f.last_block == 103
+    assert f.poll([PAIR]) == {}
+
+
+def test_pair_info_price_both_orientations():
+    info = PairInfo("0x01", "0x02", 18, 6)
+    r0, r1 = 1000 * 10**18, 250 * 10**6  # 1000 token0 vs 250 token1
+    assert info.price("0x01", r0, r1) == 0.25
+    assert info.price("0x02", r0, r1) == 4.0
+    assert info.price("0x03", r0, r1) is None
+    assert info.other("0x01") == "0x02"
+
+
+def test_swap_amounts_sum_to_volume():
+    data = "0x" + "".join(format(x, "064x") for x in (10 ** 18, 0, 0, 5 * 10 ** 6))
+    swap = dict(_swap(11, 0, "0xa"), data=data)
+    upd = fold_logs([swap, dict(swap, logIndex="0x1")])[PAIR]
+    assert (upd.volume0, upd.volume1) == (2 * 10 ** 18, 10 ** 7)
+    info = PairInfo(token0=PAIR, token1=QUIET, decimals0=18, decimals1=6)
+    assert info.base_volume(PAIR, upd.volume0, upd.volume1) == 2.0
+    assert info.base_volume(QUIET, 0, 0) is None
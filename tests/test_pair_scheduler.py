@@ -0,0 +1,97 @@
+from core.pair_scheduler import PairScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _sched(clock, **kw):
+    kw.setdefault("min_interval", 10)
+    kw.setdefault("max_interval", 480)
+    return PairScheduler(60, clock=clock, **kw)
+
+
+def test_new_pairs_due_immediately_and_heap_orders_by_due():
+    clock = Clock()
+    s = _sched(clock)
+    s.sync(["a", "b"])
+    assert sorted(s.pop_due()) == ["a", "b"]
+    assert s.pop_due() == []
+    s.observe("a", 1.0, vol_h1=0)  # first sample counts as active
+    s.observe("b", 1.0, vol_h1=0, move_pct=4.0)  # near the move threshold
+    assert s.seconds_until_next() < 60
+    clock.t = s.interval("b")
+    assert s.pop_due() == ["b"]
+
+
+def test_idle_pair_backs_off_exponentially_to_max():
+    clock = Clock()
+    s = _sched(clock)
+    s.add("dead")
+    s.pop_due()
+    s.observe("dead", 1.0)
+    ivs = []
+    for _ in range(5):
+        clock.t += s.interval("dead")
+        assert s.pop_due() == ["dead"]
+        ivs.append(s.observe("dead", 1.0))
+    assert ivs == [120, 240, 480, 480, 480]
+    clock.t += 480
+    s.pop_due()
+    assert abs(s.observe("dead", 1.1, move_pct=10.0) - 12) < 1e-9  # back to the fastest active rate
+
+
+def test_budget_limits_requests_and_delays_the_rest():
+    clock = Clock()
+    s = _sched(clock, budget_per_min=1, chunk=2)
+    s.sync(["a", "b", "c"])
+    assert len(s.pop_due()) == 2  # one request of two pairs
+    assert s.pop_due() == []
+    assert abs(s.seconds_until_next() - 60) < 1e-9
+    clock.t = 60
+    assert len(s.pop_due()) == 1
+
+
+def test_removed_pair_is_dropped():
+    clock = Clock()
+    s = _sched(clock)
+    s.sync(["a", "b"])
+    s.sync(["b"])
+    assert s.pop_due() == ["b"]
+    assert s.observe("a", 1.0) == 0.0
+
+
+def test_sync_tolerates_concurrent_add():
+    import threading
+
+    s = _sched(Clock())
+    errors = []
+
+    def adder():
+        for i in range(5000):
+            s.add(f"cronos/0x{i:040x}")
+
+    t = threading.Thread(target=adder)
+    t.start()
+    try:
+        while t.is_alive():
+            s.sync(["cronos/0xkeep"])
+    except RuntimeError as e:  # dictionary changed size during iteration
+        errors.append(e)
+    t.join()
+    assert not errors
+
+
+def test_spend_charges_extra_requests_to_the_budget():
+    clock = Clock()
+    s = _sched(clock, budget_per_min=3, chunk=2)
+    s.sync(["a", "b"])
+    assert len(s.pop_due()) == 2  # one multi-pair request
+    assert s.spend(5) == 2  # per-pair fallbacks: only what is left
+    assert s.spend(1) == 0
+    s.observe("a", 1.0, move_pct=10.0)  # due again at the fastest rate (12 s)...
+    assert abs(s.seconds_until_next() - 20) < 1e-9  # ...but the bucket refills first
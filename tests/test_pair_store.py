@@ -0,0 +1,35 @@
+from core.pair_store import PairStore
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+META = {"baseToken": {"symbol": "ABC", "address": "0xABC"}, "volume": {"h1": "12.5"}, "txns": {"h1": {}}}
+
+
+def test_keeps_only_used_meta_fields():
+    store = PairStore()
+    st = store.add("cronos/0x1", META)
+    assert (st.symbol, st.base_address, st.vol_h1) == ("ABC", "0xabc", 12.5)
+    assert not hasattr(st, "__dict__")
+    assert store.add("cronos/0x1", META) is None
+    assert list(store) == ["cronos/0x1"] and "cronos/0x1" in store
+
+
+def test_evicts_stale_unpinned_pairs_only():
+    clock = Clock()
+    store = PairStore(stale_after=60, clock=clock)
+    store.add("cronos/seed", pinned=True)
+    store.add("cronos/found")
+    store.add("cronos/busy")
+    clock.t += 50
+    store.touch("cronos/busy")
+    clock.t += 20
+    assert store.evict_stale() == ["cronos/found"]
+    assert sorted(store) == ["cronos/busy", "cronos/seed"]
+    assert store.remove("cronos/seed") and not store.remove("cronos/seed")
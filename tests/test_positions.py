@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import importlib
+import json
+from collections import defaultdict
+
+
+def _modules(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER_DIR", str(tmp_path))
+    monkeypatch.delenv("LEDGER_BACKEND", raising=False)
+    ledger = importlib.reload(importlib.import_module("reports.ledger"))
+    positions = importlib.reload(importlib.import_module("reports.positions"))
+    return ledger, positions
+
+
+def _scratch(ledger):
+    """The from-scratch replay main.rebuild_open_positions_from_history used to do."""
+    sym_map, conflict = {}, set()
+    for e in ledger.iter_all_entries():
+        sym, addr = (e.get("token") or "").strip(), (e.get("token_addr") or "").strip().lower()
+        if sym and addr.startswith("0x"):
+            if sym in sym_map and sym_map[sym] != addr:
+                conflict.add(sym)
+            else:
+                sym_map.setdefault(sym, addr)
+    for s in conflict:
+        sym_map.pop(s, None)
+    qty, cost = defaultdict(float), defaultdict(float)
+    for e in ledger.iter_all_entries():
+        sym, addr = (e.get("token") or "").strip(), (e.get("token_addr") or "").strip().lower()
+        key = addr if addr.startswith("0x") else (sym_map.get(sym) or sym_map.get(sym.upper()) or sym.upper())
+        ledger.update_cost_basis(qty, cost, key, float(e.get("amount") or 0), float(e.get("price_usd") or 0))
+    return {k: v for k, v in qty.items()}, dict(cost)
+
+
+def _tx(day, token, amount, price, addr=None):
+    return {"time": f"{day} 10:00:00", "token": token, "token_addr": addr, "amount": amount, "price_usd": price}
+
+
+def test_checkpoint_is_incremental_and_matches_full_replay(tmp_path, monkeypatch):
+    ledger, positions = _modules(tmp_path, monkeypatch)
+    ledger.append_ledger(_tx("2024-05-01", "CRO", 100.0, 0.1))
+    ledger.append_ledger(_tx("2024-05-01", "VVS", 50.0, 2.0, "0xvvs"))
+    ledger.append_ledger(_tx("2024-05-02", "CRO", -40.0, 0.15))
+
+    cp = positions.PositionCheckpoint()
+    qty, cost, realized = cp.refresh()
+    assert cp.replays == 1
+    assert (dict(qty), dict(cost)) == _scratch(ledger)
+    assert round(realized["CRO"], 9) == 2.0
+
+    ledger.append_ledger(_tx("2024-05-02", "VVS", -10.0, 3.0))  # symbol-only, keyed by the known contract
+    ledger.append_ledger(_tx("2024-05-03", "CRO", 5.0, 0.2))
+    reloaded = positions.PositionCheckpoint()  # resumes from the file
+    qty, cost, _ = reloaded.refresh()
+    assert reloaded.replays == 0
+    assert (dict(qty), dict(cost)) == _scratch(ledger)
+    assert qty["0xvvs"] == 40.0
+    assert json.loads(positions.POSITIONS_FILE.read_text())["offset"][0] == "2024-05-03"
+    ledger._writer.close()
+
+
+def test_checkpoint_replays_after_past_day_edit_or_new_mapping(tmp_path, monkeypatch):
+    ledger, positions = _modules(tmp_path, monkeypatch)
+    ledger.append_ledger(_tx("2024-05-01", "ABC", 10.0, 1.0))
+    ledger.append_ledger(_tx("2024-05-02", "CRO", 10.0, 1.0))
+    cp = positions.PositionCheckpoint()
+    cp.refresh()
+
+    ledger.append_ledger(_tx("2024-05-02", "ABC", 1.0, 1.0, "0xabc"))  # ABC keyed earlier entries by symbol
+    qty, cost, _ = cp.refresh()
+    assert cp.replays == 2
+    assert (dict(qty), dict(cost)) == _scratch(ledger)
+    assert qty["0xabc"] == 11.0
+
+    ledger._rewrite_day("2024-05-01", [_tx("2024-05-01", "ABC", 20.0, 1.0)])
+    qty, _, _ = cp.refresh()
+    assert cp.replays == 3 and qty["0xabc"] == 21.0
+    cp.refresh()
+    assert cp.replays == 3
+    ledger._writer.close()
+
+
+def test_same_size_edit_of_a_past_day_forces_a_replay(tmp_path, monkeypatch):
+    import time
+
+    ledger, positions = _modules(tmp_path, monkeypatch)
+    ledger.append_ledger(_tx("2024-05-01", "CRO", 5.0, 1.0))
+    ledger.append_ledger(_tx("2024-05-02", "CRO", 1.0, 1.0))
+    ledger._writer.close()
+    cp = positions.PositionCheckpoint()
+    assert cp.refresh()[0]["CRO"] == 6.0
+
+    time.sleep(0.05)  # a later edit, past the filesystem's mtime granularity
+    path = ledger.ledger_path("2024-05-01")
+    text = path.read_text()
+    path.write_text(text.replace('"amount":5.0', '"amount":4.0'))
+    assert len(path.read_text()) == len(text)
+    assert cp.refresh()[0]["CRO"] == 5.0 and cp.replays == 2
+
+
+def test_sqlite_update_of_a_past_row_forces_a_replay(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEDGER_BACKEND", "sqlite")
+    monkeypatch.setenv("LEDGER_DIR", str(tmp_path))
+    monkeypatch.delenv("LEDGER_DB", raising=False)
+    ledger = importlib.reload(importlib.import_module("reports.ledger"))
+    positions = importlib.reload(importlib.import_module("reports.positions"))
+    ledger.append_ledger(_tx("2024-05-01", "CRO", 5.0, 1.0))
+    ledger.append_ledger(_tx("2024-05-01", "CRO", 2.0, 1.0))
+    ledger.append_ledger(_tx("2024-05-02", "CRO", 1.0, 1.0))
+    cp = positions.PositionCheckpoint()
+    assert cp.refresh()[0]["CRO"] == 8.0
+
+    db = ledger._sqlite()
+    db._conn.execute("UPDATE entries SET data = replace(data, '\"amount\":5.0', '\"amount\":4.0') WHERE day = '2024-05-01'")
+    assert cp.refresh()[0]["CRO"] == 7.0 and cp.replays == 2
+    db._conn.execute("DELETE FROM entries WHERE id = 2")  # a middle row: first/last ids stay the same
+    assert cp.refresh()[0]["CRO"] == 5.0 and cp.replays == 3
@@ -0,0 +1,153 @@
+from core.price_service import PriceService, norm_key
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class FakeResolver:
+    def __init__(self, prices):
+        self.prices = dict(prices)
+        self.calls = []
+
+    def __call__(self, key):
+        self.calls.append(key)
+        return self.prices.get(key)
+
+
+def test_norm_key_folds_wrappers():
+    assert norm_key(" WCRO ") == "cro"
+    assert norm_key("tCRO") == "cro"
+    assert norm_key("0xABC") == "0xabc"
+
+
+def test_fresh_hit_does_not_resolve_again():
+    r = FakeResolver({"cro": 0.1})
+    svc = PriceService(r, bulk=lambda a: {}, fresh_ttl=60, stale_ttl=600, background=False)
+    assert svc.get("CRO") == 0.1
+    assert svc.get("wcro") == 0.1
+    assert r.calls == ["cro"]
+
+
+def test_stale_value_served_and_refreshed_in_background():
+    r = FakeResolver({"cro": 0.1})
+    clock = Clock()
+    svc = PriceService(r, bulk=lambda a: {}, fresh_ttl=60, stale_ttl=600, background=False, clock=clock)
+    svc.get("cro")
+    clock.t += 120
+    r.prices["cro"] = 0.2
+
+    assert svc.get("cro") == 0.1  # stale, no blocking lookup
+    assert r.calls == ["cro"]
+    assert svc.due_keys() == ["cro"]
+
+    svc.refresh(["cro"])
+    assert svc.get("cro") == 0.2
+
+
+def test_expired_entry_resolves_synchronously():
+    r = FakeResolver({"cro": 0.1})
+    clock = Clock()
+    svc = PriceService(r, bulk=lambda a: {}, fresh_ttl=60, stale_ttl=600, background=False, clock=clock)
+    svc.get("cro")
+    clock.t += 900
+    r.prices["cro"] = 0.3
+    assert svc.get("cro") == 0.3
+
+
+def test_history_fallback_and_failed_refresh_keeps_price():
+    r = FakeResolver({})
+    svc = PriceService(r, bulk=lambda a: {}, background=False)
+    svc.record_history("WCRO", 0.09)
+    assert svc.get("cro") == 0.09
+
+    r.prices["abc"] = 2.0
+    svc.get("abc")
+    del r.prices["abc"]
+    svc.refresh(["abc"])
+    assert svc.peek("abc") == 2.0
+
+
+def test_tracked_addresses_refresh_in_bulk():
+    a1, a2 = "0x" + "1" * 40, "0x" + "2" * 40
+    bulk_calls = []
+
+    def bulk(addrs):
+        bulk_calls.append(list(addrs))
+        return {a: 1.5 for a in addrs}
+
+    r = FakeResolver({"cro": 0.1})
+    svc = PriceService(r, bulk=bulk, refresh_interval=30, background=False, clock=Clock())
+    svc.track([a1, a2.upper().replace("0X", "0x"), "CRO"])
+    assert svc.due_keys() == sorted([a1, a2, "cro"])
+
+    assert svc.refresh(svc.due_keys()) == 3
+    assert bulk_calls == [[a1, a2]]
+    assert r.calls == ["cro"]
+    assert svc.get(a1) == 1.5
+    assert svc.due_keys() == []
+
+
+def test_track_expires():
+    clock = Clock()
+    svc = PriceService(FakeResolver({}), bulk=lambda a: {}, track_ttl=10, background=False, clock=clock)
+    svc.track(["cro"])
+    assert svc.tracked() == ["cro"]
+    clock.t += 11
+    assert svc.tracked() == []
+
+
+def test_failures_are_cached_for_negative_ttl():
+    r = FakeResolver({})
+    clock = Clock()
+    svc = PriceService(r, bulk=lambda a: {}, negative_ttl=300, background=False, clock=clock)
+    spam = "0x" + "5" * 40
+    assert svc.get(spam) is None
+    assert svc.get(spam) is None
+    assert svc.prefetch([spam]) == 0
+    assert r.calls == [spam]
+    clock.t += 301
+    svc.get(spam)
+    assert r.calls == [spam, spam]
+
+
+def test_prefetch_skips_fresh_addresses():
+    a1 = "0x" + "a" * 40
+    seen = []
+
+    def bulk(addrs):
+        seen.append(list(addrs))
+        return {a: 3.0 for a in addrs}
+
+    svc = PriceService(FakeResolver({}), bulk=bulk, background=False)
+    assert svc.prefetch([a1, a1, "cro"]) == 1
+    assert svc.prefetch([a1]) == 0
+    assert seen == [[a1]]
+
+
+def test_prices_feed_on_price_and_recent_beats_ledger_history():
+    seen = []
+    svc = PriceService(
+        FakeResolver({"cro": 0.1}), bulk=lambda a: {}, background=False, clock=Clock(),
+        on_price=lambda k, p, ts: seen.append((k, p, ts)), recent=lambda k: {"abc": 1.7}.get(k),
+    )
+    svc.get("cro")
+    svc.get("def")  # unpriced: not reported
+    assert seen == [("cro", 0.1, 1000.0)]
+    svc.record_history("abc", 1.2)
+    assert svc.get("abc") == 1.7
+
+
+def test_tracked_failure_is_retried_once_per_negative_ttl():
+    r = FakeResolver({})
+    clock = Clock()
+    svc = PriceService(r, bulk=lambda a: {}, negative_ttl=300, refresh_interval=30, background=False, clock=clock)
+    svc.track(["spam"])
+    for _ in range(20):  # 600 s of refresh ticks
+        svc.refresh(svc.due_keys())
+        clock.t += 30
+    assert len(r.calls) == 2
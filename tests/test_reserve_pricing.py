@@ -0,0 +1,91 @@
+from core import multicall
+from core.reserve_pricing import SEL_GET_PAIR, SEL_GET_RESERVES, ReservePricer
+
+FACTORY = "0x" + "f" * 40
+WCRO = "0x" + "5" * 40
+USDC = "0x" + "c" * 40
+TOKEN = "0x" + "1" * 40          # lower than WCRO -> token0 of TOKEN/WCRO
+SPAM = "0x" + "2" * 40
+P_CRO_USD = "0x" + "a1" * 20
+P_TOKEN_CRO = "0x" + "a2" * 20
+P_SPAM_CRO = "0x" + "a3" * 20
+
+
+def _word(n):
+    return format(n, "064x")
+
+
+class FakeChain:
+    """Answers plain eth_call(to, data) for a tiny V2 deployment."""
+
+    def __init__(self):
+        self.pairs = {(WCRO, USDC): P_CRO_USD, (TOKEN, WCRO): P_TOKEN_CRO, (SPAM, WCRO): P_SPAM_CRO}
+        self.decimals = {WCRO: 18, USDC: 6, TOKEN: 18, SPAM: 9}
+        self.reserves = {
+            # WCRO (0x55..) < USDC (0xcc..): reserve0 = WCRO, reserve1 = USDC -> CRO = 0.10
+            P_CRO_USD: (1_000_000 * 10**18, 100_000 * 10**6),
+            # TOKEN (0x11..) < WCRO: reserve0 = TOKEN, reserve1 = WCRO -> 2 CRO = 0.20 USD
+            P_TOKEN_CRO: (50_000 * 10**18, 100_000 * 10**18),
+            # SPAM < WCRO, only 10 CRO of liquidity
+            P_SPAM_CRO: (1_000 * 10**9, 10 * 10**18),
+        }
+        self.calls = []
+
+    def eth_call(self, to, data):
+        self.calls.append((to, data[:10]))
+        sel = data[2:10]
+        if sel == SEL_GET_PAIR:
+            a, b = "0x" + data[10 + 24:74], "0x" + data[74 + 24:138]
+            pair = self.pairs.get((a, b)) or self.pairs.get((b, a))
+            return "0x" + (pair[2:] if pair else "").rjust(64, "0")
+        if sel == multicall.SEL_DECIMALS:
+            return "0x" + _word(self.decimals[to])
+        if sel == SEL_GET_RESERVES:
+            r0, r1 = self.reserves[to]
+            return "0x" + _word(r0) + _word(r1) + _word(0)
+        raise AssertionError(data)
+
+
+def _pricer(chain):
+    return ReservePricer(chain, factories=[FACTORY], wcro=WCRO, stable=USDC, min_liq_usd=100, multicall_address="")
+
+
+def test_prices_route_through_wcro_and_stable():
+    chain = FakeChain()
+    prices = _pricer(chain).prices([TOKEN, WCRO.upper().replace("0X", "0x")])
+    assert abs(prices[WCRO] - 0.10) < 1e-12
+    assert abs(prices[TOKEN] - 0.20) < 1e-12
+
+
+def test_thin_pool_and_unknown_token_get_no_price():
+    chain = FakeChain()
+    unknown = "0x" + "3" * 40
+    prices = _pricer(chain).prices([SPAM, unknown])
+    assert prices == {SPAM: None, unknown: None}
+
+
+def test_discovery_is_cached_between_ticks():
+    chain = FakeChain()
+    pricer = _pricer(chain)
+    pricer.prices([TOKEN])
+    chain.calls.clear()
+    chain.reserves[P_TOKEN_CRO] = (50_000 * 10**18, 200_000 * 10**18)
+    assert abs(pricer.prices([TOKEN])[TOKEN] - 0.40) < 1e-12
+    assert {sel for _, sel in chain.calls} == {"0x" + SEL_GET_RESERVES}
+
+
+def test_failed_pair_lookup_is_retried_not_cached():
+    chain = FakeChain()
+    real = chain.eth_call
+    failures = {"left": 1}
+
+    def flaky(to, data):
+        if data[2:10] == SEL_GET_PAIR and failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("rpc blip")
+        return real(to, data)
+
+    chain.eth_call = flaky
+    pricer = _pricer(chain)
+    assert pricer.prices([TOKEN])[TOKEN] is None
+    assert abs(pricer.prices([TOKEN])[TOKEN] - 0.20) < 1e-12
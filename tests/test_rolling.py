@@ -0,0 +1,69 @@
+from core.rolling import RollingStats, RollingWindow
+
+
+def test_window_evicts_by_age_not_count():
+    w = RollingWindow(60)
+    for t, p in [(0, 1.0), (30, 3.0), (59, 2.0)]:
+        w.add(t, p)
+    assert (w.first, w.last, w.min, w.max, len(w)) == (1.0, 2.0, 1.0, 3.0, 3)
+    w.add(91, 2.5)  # drops t=0 and t=30
+    assert (w.first, w.min, w.max, len(w)) == (2.0, 2.0, 2.5, 2)
+    w.refresh(200)
+    assert len(w) == 0 and w.min is None and w.change_pct() is None
+
+
+def test_min_max_match_brute_force():
+    import random
+
+    rnd = random.Random(7)
+    w = RollingWindow(10)
+    seen = []
+    for t in range(500):
+        p = rnd.uniform(1, 2)
+        w.add(t, p)
+        seen.append((t, p))
+        live = [x for ts, x in seen if ts >= t - 10]
+        assert w.min == min(live) and w.max == max(live) and w.first == live[0]
+
+
+def test_swing_catches_intra_window_reversal():
+    w = RollingWindow(300)
+    for t, p in [(0, 100.0), (60, 120.0), (120, 101.0)]:
+        w.add(t, p)
+    assert abs(w.change_pct() - 1.0) < 1e-9  # first -> last hides the round trip
+    assert abs(w.swing_pct() - (101.0 - 120.0) / 120.0 * 100) < 1e-9
+
+
+def test_vwap_only_counts_samples_with_volume():
+    w = RollingWindow(60)
+    w.add(0, 1.0)
+    assert w.vwap is None
+    w.add(1, 2.0, 3.0)
+    w.add(2, 4.0, 1.0)
+    assert w.vwap == (2.0 * 3 + 4.0 * 1) / 4
+    w.add(62, 5.0)  # the t=1 sample ages out
+    assert w.vwap == 4.0
+
+
+def test_stats_feed_all_windows_and_clamp_clock():
+    st = RollingStats()
+    st.add(1.0, ts=1000)
+    st.add(2.0, ts=1100)
+    st.add(3.0, ts=1050)  # backwards clock: treated as t=1100
+    assert st.window("1m").first == 2.0
+    assert st.window("1h").first == 1.0
+    snap = st.snapshot(now=1100)
+    assert snap["5m"]["max"] == 3.0 and snap["5m"]["samples"] == 3.0
+    assert st.last == 3.0
+
+
+def test_ring_grows_then_caps_history():
+    st = RollingStats({"1h": 3600}, max_samples=16)
+    for t in range(10):
+        st.add(float(t), ts=t)
+    assert st.ring.cap == 16 and len(st.window("1h")) == 10
+    for t in range(10, 40):
+        st.add(float(40 - t), ts=t)  # falling prices; only the last 16 are kept
+    w = st.window("1h")
+    assert len(w) == 16 and st.ring.cap == 16
+    assert (w.first, w.min, w.max) == (16.0, 1.0, 16.0)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from core import rpc
+
+TOKEN = "0x" + "Ab" * 20
+
+
+class _Client:
+    def __init__(self):
+        self.known = []
+        self.fail = False
+
+    def healthy(self):
+        return True
+
+    def read_erc20_batch(self, contracts, owner, known_meta=()):
+        self.known.append(sorted(known_meta))
+        if self.fail:
+            raise ConnectionError("down")
+        return {c: {"symbol": "TKN", "decimals": 6, "balance": 2_500_000} for c in contracts}
+
+
+def test_checksummed_single_read_fills_the_batch_cache(monkeypatch):
+    client = _Client()
+    monkeypatch.setattr(rpc, "_client", lambda: client)
+    monkeypatch.setattr(rpc, "_RPC_CONFIG", dict(rpc.DEFAULT_CONFIG, rpc_url="http://rpc"))
+    monkeypatch.setattr(rpc, "_meta_cache", rpc.TTLCache(16, ttl=None, negative_ttl=600, is_negative=lambda m: m[0] is None))
+
+    assert rpc.get_symbol_decimals(TOKEN) == ("TKN", 6)
+    assert rpc.get_symbol_decimals(TOKEN.lower()) == ("TKN", 6)
+    assert rpc.erc20_balances([TOKEN], "0xowner") == {TOKEN.lower(): 2.5}
+    assert client.known == [[], [TOKEN.lower()]]  # one metadata read, then the batch skips it
+
+    other = "0x" + "Cd" * 20
+    client.fail = True
+    assert rpc.get_symbol_decimals(other) == (other[:8].upper(), 18)  # failed read, cached for 10 min
+    client.fail = False
+    rpc.erc20_balances([other], "0xowner")
+    assert client.known[-1] == [other.lower()]  # the batch sees that entry too
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import core.jsonrpc as jr
+from core.rpc_client import RpcClient
+
+
+def test_health_is_tracked_from_traffic(monkeypatch):
+    posts = []
+
+    def fake_post(url, payload, timeout):
+        posts.append(payload)
+        if payload["method"] == "eth_getLogs":
+            return {"jsonrpc": "2.0", "id": 1, "result": [payload["params"][0]]}
+        return {"jsonrpc": "2.0", "id": 1, "result": "0x10"}
+
+    monkeypatch.setattr(jr, "_post", fake_post)
+    client = RpcClient("http://rpc")
+
+    assert client.healthy() and len(posts) == 1  # one probe
+    assert client.healthy() and len(posts) == 1  # answered recently: no round trip
+    (flt,) = client.get_logs({"fromBlock": 16, "toBlock": 32, "topics": []})
+    assert (flt["fromBlock"], flt["toBlock"]) == ("0x10", "0x20")
+
+
+def test_unreachable_endpoint_backs_off(monkeypatch):
+    calls = []
+
+    def down(url, payload, timeout):
+        calls.append(1)
+        raise ConnectionError("refused")
+
+    monkeypatch.setattr(jr, "_post", down)
+    client = RpcClient("http://rpc")
+    assert not client.healthy()
+    assert not client.healthy()
+    assert len(calls) == 1
+
+
+def test_pool_fails_over_and_hedges(monkeypatch):
+    import time
+
+    from core.rpc_client import RpcPool
+
+    def fake_post(url, payload, timeout):
+        if url == "http://down":
+            raise ConnectionError("refused")
+        if url == "http://slow":
+            time.sleep(0.6)
+        return {"jsonrpc": "2.0", "id": 1, "result": url}
+
+    monkeypatch.setattr(jr, "_post", fake_post)
+
+    down, ok = RpcClient("http://down"), RpcClient("http://ok")
+    pool = RpcPool([down, ok], hedge=False)
+    assert pool.call("web3_clientVersion") == "http://ok"
+    assert down.error_rate > 0 and pool.ranked()[0] is ok
+
+    slow, fast = RpcClient("http://slow"), RpcClient("http://fast")
+    slow._samples.extend([0.01] * 20)  # p95 says it is usually fast
+    fast.latency_ewma = 1.0            # ranked second
+    pool = RpcPool([slow, fast], hedge=True)
+    assert pool.ranked()[0] is slow
+    assert pool.call("web3_clientVersion") == "http://fast"
+
+
+def test_json_rpc_errors_do_not_fail_over(monkeypatch):
+    import pytest
+
+    from core.rpc_client import RpcPool
+
+    seen = []
+
+    def fake_post(url, payload, timeout):
+        seen.append(url)
+        return {"jsonrpc": "2.0", "id": 1, "error": {"code": 3, "message": "execution reverted"}}
+
+    monkeypatch.setattr(jr, "_post", fake_post)
+    pool = RpcPool([RpcClient("http://a"), RpcClient("http://b")], hedge=False)
+    with pytest.raises(jr.RpcError):
+        pool.call("eth_call", [])
+    assert len(seen) == 1
+
+
+def test_batch_time_does_not_feed_the_hedge_p95(monkeypatch):
+    import time
+
+    def slow_batch(url, calls, timeout):
+        time.sleep(0.05)
+        return ["0x1"] * len(calls)
+
+    monkeypatch.setattr(jr, "rpc_batch", slow_batch)
+    monkeypatch.setattr(jr, "_post", lambda url, payload, timeout: {"jsonrpc": "2.0", "id": 1, "result": "0x1"})
+    client = RpcClient("http://rpc")
+    client.batch([("eth_call", [])] * 100)
+    assert client.p95() is None and client.healthy()
+    client.call("eth_blockNumber")
+    assert client.p95() < 0.05
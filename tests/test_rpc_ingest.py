@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import pytest
+
+from core import logscan
+from core.rpc_ingest import RpcIngestor
+
+WALLET = "0x" + "ab" * 20
+OTHER = "0x" + "cd" * 20
+TOKEN = "0x" + "0a" * 20
+
+
+class _FakeClient:
+    def __init__(self, head):
+        self.head = head
+
+    def block_number(self):
+        return self.head
+
+    def batch(self, calls):
+        out = []
+        for method, params in calls:
+            if method == "eth_getBlockByNumber":
+                n = int(params[0], 16)
+                txs = []
+                if n == 102:
+                    txs = [
+                        {"hash": "0xAA", "from": OTHER, "to": WALLET, "value": hex(10**18)},
+                        {"hash": "0xbb", "from": OTHER, "to": OTHER, "value": hex(5)},
+                        {"hash": "0xcc", "from": WALLET, "to": OTHER, "value": hex(7)},
+                    ]
+                out.append({"number": hex(n), "timestamp": hex(1_700_000_000 + n), "transactions": txs})
+            elif method == "eth_getTransactionReceipt":
+                out.append({"status": "0x0" if params[0] == "0xcc" else "0x1"})
+        return out
+
+    def get_logs(self, flt):
+        if flt["fromBlock"] <= 103 <= flt["toBlock"] and flt["topics"][1:] == [None, logscan.wallet_topic(WALLET)]:
+            return [{
+                "address": TOKEN, "blockNumber": hex(103), "logIndex": "0x2", "transactionHash": "0xDD",
+                "topics": [logscan.TRANSFER_TOPIC, logscan.wallet_topic(OTHER), logscan.wallet_topic(WALLET)],
+                "data": hex(2500),
+            }]
+        return []
+
+    def call(self, method, params):
+        assert method == "eth_getBlockByNumber"
+        return {"timestamp": hex(1_700_000_000 + int(params[0], 16))}
+
+    def read_erc20_batch(self, contracts, owner):
+        return {c: {"symbol": "TKN", "decimals": 2} for c in contracts}
+
+
+def test_poll_builds_explorer_shaped_events(tmp_path):
+    client = _FakeClient(100)
+    ing = RpcIngestor(client, WALLET, cursor_file=str(tmp_path / "cur.json"))
+    assert ing.poll() == ([], [])  # first run anchors at head
+
+    client.head = 104
+    native, tokens = ing.poll()
+    assert native == [{
+        "hash": "0xaa", "from": OTHER, "to": WALLET, "value": str(10**18),
+        "timeStamp": str(1_700_000_102), "blockNumber": "102",
+    }]  # 0xcc reverted, 0xbb not ours
+    (t,) = tokens
+    assert (t["contractAddress"], t["value"], t["tokenSymbol"], t["tokenDecimal"]) == (TOKEN, "2500", "TKN", "2")
+    assert t["to"] == WALLET and t["timeStamp"] == str(1_700_000_103)
+    assert ing.load_cursor() == 104
+    assert ing.poll() == ([], [])
+
+
+def test_failed_token_meta_is_retried_and_holds_the_transfer(tmp_path):
+    from core.cache import TTLCache
+
+    class _Flaky(_FakeClient):
+        fail = True
+
+        def read_erc20_batch(self, contracts, owner):
+            if self.fail:
+                raise RuntimeError("multicall down")
+            return super().read_erc20_batch(contracts, owner)
+
+    client, now = _Flaky(100), [0.0]
+    ing = RpcIngestor(client, WALLET, cursor_file=str(tmp_path / "cur.json"))
+    ing._meta = TTLCache(16, None, 600, clock=lambda: now[0])
+    ing.poll()
+    client.head = 104
+    assert ing.poll()[1] == []  # no guessed 18 decimals: the transfer waits
+    client.fail = False
+    client.head = 105
+    assert ing.poll()[1] == []  # failure still cached
+    now[0] = 601
+    client.head = 106
+    (t,) = ing.poll()[1]
+    assert (t["blockNumber"], t["tokenDecimal"]) == ("103", "2")
+
+
+def test_held_transfers_survive_a_restart(tmp_path):
+    class _NoMeta(_FakeClient):
+        def read_erc20_batch(self, contracts, owner):
+            raise RuntimeError("multicall down")
+
+    cur = str(tmp_path / "cur.json")
+    client = _NoMeta(100)
+    ing = RpcIngestor(client, WALLET, cursor_file=cur)
+    ing.poll()
+    client.head = 104
+    assert ing.poll()[1] == []
+    assert ing.load_cursor() == 104  # cursor moved past block 103, the log went with it
+
+    restarted = RpcIngestor(_FakeClient(105), WALLET, cursor_file=cur)
+    (t,) = restarted.poll()[1]
+    assert (t["blockNumber"], t["tokenDecimal"]) == ("103", "2")
+    assert RpcIngestor(_FakeClient(105), WALLET, cursor_file=cur)._held == []
+
+
+def test_held_transfers_survive_a_failed_timestamp_read(tmp_path):
+    class _NoMeta(_FakeClient):
+        def read_erc20_batch(self, contracts, owner):
+            raise RuntimeError("multicall down")
+
+    class _FlakyTs(_FakeClient):
+        fail = True
+
+        def call(self, method, params):
+            if self.fail:
+                self.fail = False
+                raise RuntimeError("rpc timeout")
+            return super().call(method, params)
+
+    cur = str(tmp_path / "cur.json")
+    client = _NoMeta(100)
+    ing = RpcIngestor(client, WALLET, cursor_file=cur)
+    ing.poll()
+    client.head = 104
+    assert ing.poll()[1] == []  # held: no decimals
+
+    restarted = RpcIngestor(_FlakyTs(105), WALLET, cursor_file=cur)
+    with pytest.raises(RuntimeError):
+        restarted.poll()  # block 103's timestamp is not cached and the read fails
+    assert len(restarted._held) == 1
+    (t,) = restarted.poll()[1]
+    assert (t["blockNumber"], t["tokenDecimal"]) == ("103", "2")
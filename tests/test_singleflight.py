@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+from core.singleflight import Group
+
+
+def test_concurrent_callers_share_one_call():
+    g = Group()
+    calls = []
+    gate = threading.Event()
+
+    def fn():
+        calls.append(1)
+        gate.wait(2)
+        return {"price": 1.0}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(g.do(("pair", "x"), fn))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    deadline = time.time() + 2
+    while g.stats["shared"] < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    for t in threads:
+        t.join(2)
+
+    assert len(calls) == 1
+    assert len(results) == 5 and all(r is results[0] for r in results)
+    assert g.in_flight() == 0
+
+
+def test_sequential_calls_are_not_cached():
+    g = Group()
+    n = []
+    g.do("k", lambda: n.append(1))
+    g.do("k", lambda: n.append(1))
+    assert len(n) == 2
+
+
+def test_error_propagates_and_key_is_released():
+    g = Group()
+
+    def boom():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        g.do("k", boom)
+    assert g.do("k", lambda: 7) == 7
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from core import logscan
+from core.transfer_index import TransferIndex
+
+WALLET = "0x" + "ab" * 20
+OTHER = "0x" + "cd" * 20
+TOKEN_A = "0x" + "0a" * 20
+TOKEN_B = "0x" + "0b" * 20
+
+
+def _log(block, idx, token, frm, to, value):
+    return {
+        "address": token,
+        "blockNumber": block,
+        "transactionHash": "0x%064x" % block,
+        "logIndex": idx,
+        "topics": [logscan.TRANSFER_TOPIC, logscan.wallet_topic(frm), logscan.wallet_topic(to)],
+        "data": "0x%064x" % value,
+    }
+
+
+CHAIN = [
+    _log(10, 0, TOKEN_A, OTHER, WALLET, 5 * 10**30),  # > int64, stored as text
+    _log(20, 1, TOKEN_A, WALLET, OTHER, 2 * 10**30),
+    _log(120, 0, TOKEN_B, OTHER, WALLET, 7),
+]
+
+
+def _fake_get_logs(seen):
+    def get_logs(flt):
+        seen.append((flt["fromBlock"], flt["toBlock"]))
+        t1 = flt["topics"][1] if len(flt["topics"]) > 1 else None
+        t2 = flt["topics"][2] if len(flt["topics"]) > 2 else None
+        return [
+            lg for lg in CHAIN
+            if flt["fromBlock"] <= lg["blockNumber"] <= flt["toBlock"]
+            and (t1 is None or lg["topics"][1] == t1) and (t2 is None or lg["topics"][2] == t2)
+        ]
+    return get_logs
+
+
+def test_sync_tails_and_answers_locally():
+    idx = TransferIndex(":memory:")
+    seen = []
+    assert idx.sync(WALLET, _fake_get_logs(seen), 100, 100, chunk=1000) == 2
+    assert idx.contracts(WALLET) == {TOKEN_A}
+
+    seen.clear()
+    assert idx.sync(WALLET, _fake_get_logs(seen), 150, 100, chunk=1000) == 1
+    assert {fb for fb, _ in seen} == {101}  # only the new blocks
+    assert idx.contracts(WALLET) == {TOKEN_A, TOKEN_B}
+    assert idx.net_flow(WALLET) == {TOKEN_A: 3 * 10**30, TOKEN_B: 7}  # GROUP BY past int64
+    assert [r["block"] for r in idx.transfers(WALLET, contract=TOKEN_A)] == [10, 20]
+    assert [r["value"] for r in idx.transfers(WALLET, since_block=100)] == [7]
+    assert idx.coverage(WALLET) == {"first_block": 0, "last_block": 150}
+
+    assert idx.sync(WALLET, _fake_get_logs(seen), 150, 200, full=True) == 0  # idempotent
+
+
+def test_sync_holds_back_at_scan_gap(monkeypatch):
+    idx = TransferIndex(":memory:")
+    gap = logscan.ScanResult(900, 1000, logs=[_log(920, 0, TOKEN_A, OTHER, WALLET, 1)],
+                             gaps=[(951, 1000, "down")], covered=[[(900, 950)]])
+    monkeypatch.setattr(logscan, "scan_transfer_contracts", lambda *a, **k: gap)
+    idx.sync(WALLET, None, 1000, 100)
+    assert idx.coverage(WALLET)["last_block"] == 950
+    assert idx.contracts(WALLET) == {TOKEN_A}
+
+    seen = []
+    monkeypatch.setattr(logscan, "scan_transfer_contracts",
+                        lambda gl, w, fb, tb, chunk: seen.append((fb, tb)) or logscan.ScanResult(fb, tb, covered=[[(fb, tb)]]))
+    idx.sync(WALLET, None, 1000, 300)  # gap tail plus the deeper lookback
+    assert sorted(seen) == [(700, 899), (951, 1000)]
+    assert idx.coverage(WALLET) == {"first_block": 700, "last_block": 1000}